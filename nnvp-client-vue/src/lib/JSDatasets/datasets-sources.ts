@@ -25,6 +25,29 @@ export interface TextDatasetSourceConfig {
   kind: 'text';
   textPath: string;
   textChecksum: string | null;
+  /**
+   * The same corpus pre-encoded to vocab indices (the script's .tokens);
+   * preferred when served, the .txt is the fallback when it cannot be
+   * fetched. Add it together with its checksum once the file is hosted.
+   */
+  tokensPath?: string;
+  tokensChecksum?: string | null;
+  /**
+   * The large tiers' shard manifest (the script's --shard-mb .shards.json):
+   * preferred over both files above — training starts on the first shard
+   * while the rest streams in; the shards carry their own SRI strings.
+   * Add it together with its checksum once the shards are hosted.
+   */
+  shardsPath?: string;
+  shardsChecksum?: string | null;
+  /**
+   * Pre-shuffled train/test window starts for `seqLen` (the script's
+   * --window-seq-lens .windows-<seqLen>.bin), used instead of building the
+   * index tables at load; absent or unreachable, the loader builds them.
+   * Add it together with its checksum once the table is hosted.
+   */
+  windowsPath?: string;
+  windowsChecksum?: string | null;
   /** Model context window: text templates' Input shape must equal [seqLen]. */
   seqLen: number;
 }
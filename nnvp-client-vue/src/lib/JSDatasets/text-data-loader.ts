@@ -10,17 +10,125 @@
  * one-hot over VOCAB_SIZE). The corpus is split contiguously into train/test
  * regions and windows are drawn through pre-shuffled index tables, mirroring
  * the image loader's batching discipline.
+ *
+ * When the corpus is also published pre-encoded (the prep script's .tokens
+ * file) the loader takes that instead: the vocab indices are used in place,
+ * as a view over the fetched buffer, with no per-character encode pass.
+ * A sharded corpus (its .shards.json manifest) goes further: load() resolves
+ * once the first shard and the test region are in, and the train region
+ * grows as the remaining shards stream in (shardsLoaded settles at the end).
+ * A published window table for this seqLen (.windows-<seqLen>.bin) replaces
+ * the index tables load() would otherwise build and shuffle in the tab.
  */
 
 import { loadTf, getTf } from '../tf/loadTf';
 import LabelEncoder from './label-encoder';
+import type { TextDatasetSourceConfig } from './datasets-sources';
 import {
-  VOCAB_SIZE, SPACE_INDEX, encodeText, decodeIndices,
+  VOCAB_SIZE, VOCAB_HASH, SPACE_INDEX, encodeText, decodeIndices,
 } from './text-vocab';
 
 /** Train-region share of the corpus (the remainder is the test region). */
 const TRAIN_FRACTION = 0.9;
 
+// .tokens layout (scripts/prepare_poetry_datasets.py write_tokens): magic,
+// then little-endian uint32 vocab size, vocab hash, corpus length and
+// test-region offset, then one vocab index byte per character.
+const TOKENS_MAGIC = 'NNVPTOK1';
+const TOKENS_HEADER_BYTES = 24;
+
+/** A corpus's optional pre-encoded forms, as datasets-sources lists them. */
+export type EncodedCorpusSources = Partial<Pick<
+  TextDatasetSourceConfig,
+  'tokensPath' | 'tokensChecksum' | 'shardsPath' | 'shardsChecksum' | 'windowsPath' | 'windowsChecksum'
+>>;
+
+/**
+ * scripts/prepare_poetry_datasets.py write_shards: the .tokens header fields,
+ * then [offset, length, file (next to the manifest), SRI] per shard — the
+ * SpriteEntry idea for text — and each book's start offset.
+ */
+interface ShardManifest {
+  vocabSize: number;
+  vocabHash: number;
+  length: number;
+  testStart: number;
+  shards: [number, number, string, string | null][];
+  books: number[];
+}
+
+// .windows-<seqLen>.bin layout (write_windows): magic, then little-endian
+// uint32 seqLen, corpus length, test-region offset, seed, flags, train and
+// test counts, then those uint32 window starts (test ones region-relative).
+const WINDOWS_MAGIC = 'NNVPWIN1';
+const WINDOWS_HEADER_BYTES = 36;
+
+/** The train/test tables of a window file; throws unless it was built for this corpus and seqLen. */
+function parseWindows(
+  buffer: ArrayBuffer,
+  path: string,
+  expected: { seqLen: number; length: number; testStart: number },
+): { train: Uint32Array; test: Uint32Array } {
+  if (buffer.byteLength < WINDOWS_HEADER_BYTES
+    || String.fromCharCode(...new Uint8Array(buffer, 0, WINDOWS_MAGIC.length)) !== WINDOWS_MAGIC) {
+    throw `${path} is not a window table`;
+  }
+  const header = new DataView(buffer);
+  if (header.getUint32(8, true) !== expected.seqLen
+    || header.getUint32(12, true) !== expected.length
+    || header.getUint32(16, true) !== expected.testStart) {
+    throw `${path} was built for another corpus or seqLen`;
+  }
+  const trainCount = header.getUint32(28, true);
+  const testCount = header.getUint32(32, true);
+  if (buffer.byteLength !== WINDOWS_HEADER_BYTES + 4 * (trainCount + testCount)) {
+    throw `${path} is truncated or its header is inconsistent`;
+  }
+  return {
+    train: new Uint32Array(buffer, WINDOWS_HEADER_BYTES, trainCount),
+    test: new Uint32Array(buffer, WINDOWS_HEADER_BYTES + 4 * trainCount, testCount),
+  };
+}
+
+/** The corpus view + split of a .tokens buffer; throws on a foreign or damaged file. */
+function parseTokens(buffer: ArrayBuffer, path: string): { corpus: Uint8Array; testStart: number } {
+  if (buffer.byteLength < TOKENS_HEADER_BYTES
+    || String.fromCharCode(...new Uint8Array(buffer, 0, TOKENS_MAGIC.length)) !== TOKENS_MAGIC) {
+    throw `${path} is not a pre-encoded text corpus`;
+  }
+  const header = new DataView(buffer);
+  const vocabSize = header.getUint32(8, true);
+  const vocabHash = header.getUint32(12, true);
+  const length = header.getUint32(16, true);
+  const testStart = header.getUint32(20, true);
+  if (vocabSize !== VOCAB_SIZE || vocabHash !== VOCAB_HASH) {
+    throw `${path} was encoded against another vocabulary`;
+  }
+  if (buffer.byteLength !== TOKENS_HEADER_BYTES + length || testStart > length) {
+    throw `${path} is truncated or its header is inconsistent`;
+  }
+  return { corpus: new Uint8Array(buffer, TOKENS_HEADER_BYTES, length), testStart };
+}
+
+/**
+ * read(response) for one of a corpus's optional pre-encoded forms, or null
+ * when it cannot be had: a non-ok response, or a fetch or body read that
+ * rejects (network error, CORS, integrity mismatch). The loader then falls
+ * back to the next form instead of failing the whole load.
+ */
+async function fetchOptional<T>(
+  path: string,
+  integrity: string | null,
+  read: (response: Response) => Promise<T>,
+): Promise<T | null> {
+  try {
+    const response = await fetch(path, integrity ? { integrity } : {});
+    return response.ok ? await read(response) : null;
+  } catch {
+    return null;
+  }
+}
+
 // Per-fit slice sizes advertised to engines (TrainingDataset seam): a char-LM
 // sees one tiny fact per window, so the historical 500-sample image slice
 // would starve it — these ask for as much as the corpus can serve, capped so
@@ -32,6 +140,12 @@ export default class TextDataset {
   readonly kind = 'text';
   textPath: string;
   textChecksum: string | null;
+  tokensPath: string | null;
+  tokensChecksum: string | null;
+  shardsPath: string | null;
+  shardsChecksum: string | null;
+  windowsPath: string | null;
+  windowsChecksum: string | null;
   seqLen: number;
   shape: number[];
   numClasses: number;
@@ -48,10 +162,24 @@ export default class TextDataset {
   declare testIndices: Uint32Array;
   declare trainSliceSize: number;
   declare testSliceSize: number;
+  declare shardsLoaded: Promise<void>;
+  // The window table's train starts, swapped in once the whole train region is loaded.
+  declare precomputedTrainIndices: Uint32Array | null;
 
-  constructor(textPath: string, textChecksum: string | null, seqLen: number) {
+  constructor(
+    textPath: string,
+    textChecksum: string | null,
+    seqLen: number,
+    encoded: EncodedCorpusSources = {},
+  ) {
     this.textPath = textPath;
     this.textChecksum = textChecksum;
+    this.tokensPath = encoded.tokensPath ?? null;
+    this.tokensChecksum = encoded.tokensChecksum ?? null;
+    this.shardsPath = encoded.shardsPath ?? null;
+    this.shardsChecksum = encoded.shardsChecksum ?? null;
+    this.windowsPath = encoded.windowsPath ?? null;
+    this.windowsChecksum = encoded.windowsChecksum ?? null;
     this.seqLen = seqLen;
     this.shape = [seqLen];
     this.numClasses = VOCAB_SIZE;
@@ -62,29 +190,136 @@ export default class TextDataset {
 
   async load(progressionCallback?: ((fraction: number) => void) | null) {
     const tf = await loadTf();
-    const response = await fetch(
-      this.textPath, this.textChecksum ? { integrity: this.textChecksum } : {},
-    );
-    if (!response.ok) throw `Failed GET of ${this.textPath}`;
-    const text = await response.text();
+    const sharded = await this.loadShards();
+    if (!sharded) {
+      const encoded = await this.fetchTokens();
+      if (encoded) {
+        this.corpus = encoded.corpus;
+        this.testStart = encoded.testStart;
+      } else {
+        const response = await fetch(
+          this.textPath, this.textChecksum ? { integrity: this.textChecksum } : {},
+        );
+        if (!response.ok) throw `Failed GET of ${this.textPath}`;
+        const text = await response.text();
+        this.corpus = encodeText(text);
+        this.testStart = Math.floor(this.corpus.length * TRAIN_FRACTION);
+      }
+    }
     if (progressionCallback) progressionCallback(0.5);
-    this.corpus = encodeText(text);
 
     // Contiguous split; each region must hold at least one full window + label.
     this.trainStart = 0;
-    this.testStart = Math.floor(this.corpus.length * TRAIN_FRACTION);
     const trainWindows = this.testStart - this.seqLen;
     const testWindows = this.corpus.length - this.testStart - this.seqLen;
     if (trainWindows < 1 || testWindows < 1) {
       throw `Corpus at ${this.textPath} is too short for seqLen ${this.seqLen}`;
     }
-    this.trainIndices = tf.util.createShuffledIndices(trainWindows);
-    this.testIndices = tf.util.createShuffledIndices(testWindows);
-    this.trainSliceSize = Math.min(TRAIN_SLICE_CAP, trainWindows);
-    this.testSliceSize = Math.min(TEST_SLICE_CAP, testWindows);
+    const windows = await this.fetchWindows();
+    this.precomputedTrainIndices = windows ? windows.train : null;
+    this.setTrainRegion(sharded ? sharded.loadedEnd : this.corpus.length);
+    this.testIndices = windows ? windows.test : tf.util.createShuffledIndices(testWindows);
+    this.testSliceSize = Math.min(TEST_SLICE_CAP, this.testIndices.length);
+    this.shardsLoaded = sharded ? sharded.streamRest() : Promise.resolve();
+    // Training goes on over the prefix it has if a later shard fails;
+    // whoever awaits shardsLoaded still sees the error.
+    this.shardsLoaded.catch(() => {});
     if (progressionCallback) progressionCallback(1);
   }
 
+  /**
+   * (Re)build the train index table over the windows inside corpus[0, end)
+   * — the whole train region once the corpus is complete, a growing prefix
+   * while shards stream in. Reshuffles and restarts the train cursor; the
+   * published window table is used as soon as it is fully drawable.
+   */
+  private setTrainRegion(end: number) {
+    if (this.precomputedTrainIndices && end >= this.testStart) {
+      this.trainIndices = this.precomputedTrainIndices;
+    } else {
+      this.trainIndices = getTf().util.createShuffledIndices(Math.min(end, this.testStart) - this.seqLen);
+    }
+    this.shuffledTrainIndex = 0;
+    this.trainSliceSize = Math.min(TRAIN_SLICE_CAP, this.trainIndices.length);
+  }
+
+  /**
+   * The published window table for this corpus and seqLen, or null to
+   * build the index tables here (none configured, or not to be had:
+   * fetchOptional). A table built for another corpus or seqLen throws.
+   */
+  private async fetchWindows(): Promise<{ train: Uint32Array; test: Uint32Array } | null> {
+    if (!this.windowsPath) return null;
+    const buffer = await fetchOptional(this.windowsPath, this.windowsChecksum, response => response.arrayBuffer());
+    return buffer ? parseWindows(buffer, this.windowsPath, {
+      seqLen: this.seqLen, length: this.corpus.length, testStart: this.testStart,
+    }) : null;
+  }
+
+  /**
+   * Sharded load: fetch the manifest, then the leading shard(s) holding at
+   * least one window and every shard overlapping the test region. Returns
+   * the loaded prefix's end plus streamRest, which fetches the remaining
+   * shards in order, widening the train region after each — or null to fall
+   * back to the .tokens / .txt: no shardsPath, or the manifest or an upfront
+   * shard cannot be had (fetchOptional, or a short shard). A later shard
+   * that fails rejects streamRest; training goes on over the prefix. A
+   * foreign vocabulary throws, like a .tokens encoded against one.
+   */
+  private async loadShards(): Promise<{ loadedEnd: number; streamRest: () => Promise<void> } | null> {
+    if (!this.shardsPath) return null;
+    const manifest = await fetchOptional(
+      this.shardsPath, this.shardsChecksum, response => response.json() as Promise<ShardManifest>,
+    );
+    if (!manifest) return null;
+    if (manifest.vocabSize !== VOCAB_SIZE || manifest.vocabHash !== VOCAB_HASH) {
+      throw `${this.shardsPath} was encoded against another vocabulary`;
+    }
+    const corpus = new Uint8Array(manifest.length);
+    const baseDir = this.shardsPath.slice(0, this.shardsPath.lastIndexOf('/') + 1);
+    // Whether the shard arrived whole (and is now in corpus).
+    const fetchShard = async ([offset, length, file, integrity]: ShardManifest['shards'][number]) => {
+      const bytes = await fetchOptional(
+        baseDir + file, integrity, async response => new Uint8Array(await response.arrayBuffer()),
+      );
+      if (!bytes || bytes.length !== length) return false;
+      corpus.set(bytes, offset);
+      return true;
+    };
+
+    let leading = 0;
+    while (leading < manifest.shards.length && manifest.shards[leading]![0] <= this.seqLen) leading += 1;
+    const upfront = manifest.shards.filter(
+      ([offset, length], i) => i < leading || offset + length > manifest.testStart,
+    );
+    const streamed = manifest.shards.filter(shard => !upfront.includes(shard));
+    if (!(await Promise.all(upfront.map(fetchShard))).every(Boolean)) return null;
+    this.corpus = corpus;
+    this.testStart = manifest.testStart;
+    // The in-memory prefix always ends where the next missing shard starts.
+    const prefixEnd = (missing: number) => streamed[missing]?.[0] ?? manifest.length;
+    return {
+      loadedEnd: prefixEnd(0),
+      streamRest: async () => {
+        for (let i = 0; i < streamed.length; i += 1) {
+          if (!(await fetchShard(streamed[i]!))) throw `Failed GET of ${baseDir + streamed[i]![2]}`;
+          this.setTrainRegion(prefixEnd(i + 1));
+        }
+      },
+    };
+  }
+
+  /**
+   * The pre-encoded corpus, or null to fall back to the .txt: no tokensPath
+   * configured, or not to be had (fetchOptional). A file that IS served but
+   * does not parse throws — that is a publishing error, not a fallback.
+   */
+  private async fetchTokens(): Promise<{ corpus: Uint8Array; testStart: number } | null> {
+    if (!this.tokensPath) return null;
+    const buffer = await fetchOptional(this.tokensPath, this.tokensChecksum, response => response.arrayBuffer());
+    return buffer ? parseTokens(buffer, this.tokensPath) : null;
+  }
+
   // The shuffled-cursor advance shared by the tensor and raw draw paths —
   // both walk the SAME cursor, so mixing them never replays a window.
   private nextTrainIndex(): number {
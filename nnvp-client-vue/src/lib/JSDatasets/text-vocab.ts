@@ -39,3 +39,16 @@ export function decodeIndices(indices: ArrayLike<number>): string {
   for (let i = 0; i < indices.length; i += 1) text += indexToChar(indices[i]!);
   return text;
 }
+
+/**
+ * 32-bit FNV-1a over the vocabulary's characters in index order. Stamped
+ * into every pre-encoded .tokens corpus by the prep script (vocab_hash), so
+ * a file encoded against another vocabulary is refused at load.
+ */
+export const VOCAB_HASH = (() => {
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < VOCAB_SIZE; i += 1) {
+    hash = Math.imul(hash ^ indexToChar(i).charCodeAt(0), 0x01000193) >>> 0;
+  }
+  return hash;
+})();
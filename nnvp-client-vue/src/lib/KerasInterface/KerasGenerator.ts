@@ -17,6 +17,8 @@ import { planUnroll } from './unrollPlan';
 import { orderGraph, CyclicGraphError } from './orderGraph';
 import { assertKnownIdentifier } from './codegenSafety';
 import { isKnownLayerName, knownParameterNames } from './catalogMembership';
+import { estimateGraphCost } from './layerCost';
+import type { GraphCost } from './layerCost';
 import type { KerasLayerJSON, NnvpLayer, NnvpLayerId, NnvpModel } from '../../types/model';
 
 export { CyclicGraphError };
@@ -244,4 +246,10 @@ export default class KerasGenerator {
       this.graph, this.inputs, this.outputs, this.list, this.sequential,
     ).generate();
   }
+
+  /** Per-sample parameter, FLOP and activation totals (layerCost.ts). */
+  estimateCostFromGraph(): GraphCost {
+    this.assertAcyclic('cost estimation');
+    return estimateGraphCost(this.graph, this.list);
+  }
 }
@@ -10,7 +10,11 @@
 // Conv2D and 2-D pooling compute their spatial output shape (valid/same padding,
 // strides) so a downstream Flatten's in-features is derivable — that is what lets
 // the generators emit a correct Linear after a conv stack. The 1-D/3-D variants
-// still only track the channel count.
+// only track the channel count here; their shape comes from the catalog rule.
+//
+// Layers without a case here fall back to the catalog's introspected shape rule
+// (shapeRules.ts), as does any case that left the shape unknown — so every layer
+// Keras could be probed for keeps the full shape flowing downstream.
 //
 // Anything not derivable is null; the generators fall back to their documented
 // defaults with a loud TODO comment so the user cannot miss the guess.
@@ -21,6 +25,7 @@
 
 import type { NnvpLayerId, ParameterValue } from '../../types/model';
 import type { GeneratorGraph } from './KerasGenerator';
+import { applyShapeRule, shapeRuleOf, shapeRuleParams } from './shapeRules';
 
 export interface InferredDims {
   shape: number[] | null;
@@ -189,6 +194,12 @@ export default function inferFeatureDims(
         // Unknown/unsupported layer: its output dims cannot be trusted.
         break;
     }
+    const rule = shape === null ? shapeRuleOf(name) : undefined;
+    const sourceShapes = sources.map(s => dimsOf(s).shape);
+    if (rule && sourceShapes.length > 0 && sourceShapes.every(s => s !== null)) {
+      shape = applyShapeRule(rule, sourceShapes as number[][], shapeRuleParams(name, p));
+      if (shape && features === null) features = shape[shape.length - 1]!;
+    }
     dims[node] = { shape, features };
   });
   return dims;
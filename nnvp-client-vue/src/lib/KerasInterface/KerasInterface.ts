@@ -1,5 +1,6 @@
 import KerasLayer from './KerasLayer';
 import KerasGenerator from './KerasGenerator';
+import type { GraphCost } from './layerCost';
 import type {
   KerasLayerCatalog, KerasLayerCatalogEntry, NnvpModel, ParameterDef,
 } from '../../types/model';
@@ -7,7 +8,8 @@ import type {
 /* eslint class-methods-use-this: ["error", { "exceptMethods": ["generatePython",
                                                                 "generateJavascript",
                                                                 "generatePyTorch",
-                                                                "generateTinygrad"] }] */
+                                                                "generateTinygrad",
+                                                                "estimateCost"] }] */
 // class KerasInterface {
 export default class {
   layerList: Record<string, KerasLayer>;
@@ -94,4 +96,11 @@ export default class {
     else graphJson = d3Json;
     return new KerasGenerator(graphJson).generateTinygradFromGraph();
   }
+
+  estimateCost(d3Json: NnvpModel | string): GraphCost {
+    let graphJson: NnvpModel;
+    if (typeof d3Json === 'string') graphJson = JSON.parse(d3Json);
+    else graphJson = d3Json;
+    return new KerasGenerator(graphJson).estimateCostFromGraph();
+  }
 }
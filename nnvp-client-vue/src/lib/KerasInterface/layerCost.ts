@@ -0,0 +1,197 @@
+// Layer and model cost estimates from the catalog: every generated entry with
+// a shape rule also carries a `cost` rule (scripts/generate_keras_layers_json.py
+// checks its parameter count against Keras' count_params()), and this module
+// evaluates it — the TypeScript twin of the script's layer_cost. Keep the two
+// in step, like shapeRules.ts and apply_shape_rule.
+//
+// Counts are per sample (batch axis excluded): parameters, forward FLOPs
+// (multiply-add = 2) and activation bytes (float32 outputs, plus recurrent
+// gate activations). Views of their source (VIEW_LAYERS) and the Output
+// marker allocate nothing, so their outputs add no bytes. estimateGraphCost
+// sums them over a generator graph on the shapes dim inference derives; a
+// layer whose rule or shapes are unknown is listed instead of guessed, so a
+// partial total is never passed off as the whole model.
+//
+// Pure module: no Vue, no DOM — runs identically under bun.
+
+import inferFeatureDims from './KerasGeneratorDimInference';
+import type { GeneratorGraph } from './KerasGenerator';
+import { catalogEntryOf, perAxis, shapeRuleParams } from './shapeRules';
+import type { Params } from './shapeRules';
+import type { LayerCostRule, NnvpLayerId, ParameterValue } from '../../types/model';
+
+export interface LayerCost {
+  params: number;
+  flops: number;
+  activationBytes: number;
+}
+
+export interface GraphCost extends LayerCost {
+  /** Layers left out of the totals: no cost rule, or shapes dim inference could not derive. */
+  unknown: NnvpLayerId[];
+}
+
+const BYTES_PER_ELEMENT = 4;
+
+// Layers whose output is their source reshaped or passed through at
+// inference: the bytes are already counted once, on the source.
+const VIEW_LAYERS = new Set(['Flatten', 'Reshape', 'Dropout', 'Identity', 'Output']);
+
+function product(shape: number[]): number {
+  return shape.reduce((acc, d) => acc * d, 1);
+}
+
+function kernelVolume(params: Params, kernel: string, spatial: number): number | null {
+  const sizes = perAxis(params[kernel], spatial);
+  return sizes ? product(sizes) : null;
+}
+
+function num(params: Params, name: string): number | null {
+  const value = params[name];
+  return typeof value === 'number' ? value : null;
+}
+
+/** Cost of `rule` for these input shapes and output shape, or null. */
+export function applyCostRule(
+  rule: LayerCostRule, shapes: number[][], out: number[], params: Params,
+): LayerCost | null {
+  const shape = shapes[0];
+  if (!shape) return null;
+  const c = shape[shape.length - 1]!;
+  const [sizeIn, sizeOut] = [product(shape), product(out)];
+  const b = params.use_bias === false ? 0 : 1;
+  let activationBytes = BYTES_PER_ELEMENT * sizeOut;
+  let weights: number;
+  let flops: number;
+  switch (rule.kind) {
+    case 'dense': {
+      const u = num(params, rule.param);
+      if (u === null) return null;
+      [weights, flops] = [c * u + b * u, 2 * sizeIn * u];
+      break;
+    }
+    case 'conv': {
+      const k = kernelVolume(params, rule.kernel, rule.spatial);
+      const f = num(params, rule.channels);
+      const groups = num(params, 'groups') ?? 1;
+      if (k === null || f === null || c % groups !== 0) return null;
+      weights = (k * c / groups) * f + b * f;
+      flops = rule.transposed ? 2 * k * f * sizeIn : 2 * (k * c / groups) * sizeOut;
+      break;
+    }
+    case 'depthwise': {
+      const k = kernelVolume(params, rule.kernel, rule.spatial);
+      const m = num(params, rule.multiplier);
+      if (k === null || m === null) return null;
+      [weights, flops] = [k * c * m + b * c * m, 2 * k * sizeOut];
+      break;
+    }
+    case 'separable': {
+      const k = kernelVolume(params, rule.kernel, rule.spatial);
+      const [m, f] = [num(params, rule.multiplier), num(params, rule.channels)];
+      if (k === null || m === null || f === null) return null;
+      weights = k * c * m + c * m * f + b * f;
+      flops = 2 * (k + f) * c * m * (sizeOut / out[out.length - 1]!);
+      break;
+    }
+    case 'embedding': {
+      const [inputDim, outputDim] = [num(params, rule.input), num(params, rule.output)];
+      if (inputDim === null || outputDim === null) return null;
+      [weights, flops] = [inputDim * outputDim, 0];
+      break;
+    }
+    case 'recurrent': {
+      const u = num(params, rule.param);
+      if (u === null) return null;
+      const [g, steps] = [rule.gates, shape[0]!];
+      const reset = rule.resetAfter && params[rule.resetAfter] === true ? 1 : 0;
+      weights = g * (c * u + u * u) + g * u * b * (1 + reset);
+      flops = 2 * steps * g * (c * u + u * u);
+      activationBytes += BYTES_PER_ELEMENT * steps * g * u;
+      break;
+    }
+    case 'perChannel':
+      weights = c * (rule.fixed + rule.flags.filter(flag => params[flag] !== false).length);
+      flops = 2 * sizeIn;
+      break;
+    case 'perElement':
+      [weights, flops] = [sizeIn, 2 * sizeIn];
+      break;
+    case 'pool': {
+      const k = kernelVolume(params, rule.kernel, rule.spatial);
+      if (k === null) return null;
+      [weights, flops] = [0, k * sizeOut];
+      break;
+    }
+    case 'reduce':
+      [weights, flops] = [0, sizeIn];
+      break;
+    case 'merge':
+      [weights, flops] = [0, (shapes.length - 1) * sizeOut];
+      break;
+    case 'activation':
+      [weights, flops] = [0, sizeOut];
+      break;
+    case 'free':
+      [weights, flops] = [0, 0];
+      break;
+    default:
+      return null;
+  }
+  return { params: weights, flops, activationBytes };
+}
+
+/** The catalog's cost rule for a layer name (aliases resolve), if it has one. */
+export function costRuleOf(name: string): LayerCostRule | undefined {
+  return catalogEntryOf(name)?.cost;
+}
+
+/**
+ * Per-sample totals over a generator graph in treatment order. Input layers
+ * count their own activations; every other layer needs a cost rule and the
+ * shapes of its sources and output.
+ */
+export function estimateGraphCost(graph: GeneratorGraph, list: NnvpLayerId[]): GraphCost {
+  const dims = inferFeatureDims(graph, list);
+  const total: GraphCost = {
+    params: 0, flops: 0, activationBytes: 0, unknown: [],
+  };
+  list.forEach((node) => {
+    const { name, parameterValues } = graph[node]!.keras_data!;
+    const out = dims[node]?.shape ?? null;
+    if (name === 'Input') {
+      if (out) total.activationBytes += BYTES_PER_ELEMENT * product(out);
+      else total.unknown.push(node);
+      return;
+    }
+    const rule = costRuleOf(name);
+    const shapes = (graph[node]!.sources || []).map(source => dims[source]?.shape ?? null);
+    const p: Record<string, ParameterValue> = parameterValues || {};
+    const cost = rule && out && shapes.length > 0 && shapes.every(s => s !== null)
+      ? applyCostRule(rule, shapes as number[][], out, shapeRuleParams(name, p))
+      : null;
+    if (!cost) {
+      total.unknown.push(node);
+      return;
+    }
+    total.params += cost.params;
+    total.flops += cost.flops;
+    if (!VIEW_LAYERS.has(name)) total.activationBytes += cost.activationBytes;
+  });
+  return total;
+}
+
+function compact(value: number): string {
+  if (value >= 1e9) return `${(value / 1e9).toFixed(1)}G`;
+  if (value >= 1e6) return `${(value / 1e6).toFixed(1)}M`;
+  if (value >= 1e3) return `${(value / 1e3).toFixed(1)}k`;
+  return String(value);
+}
+
+/** One line for the board: the totals, and how many layers they leave out. */
+export function describeCost(cost: GraphCost): string {
+  const line = `${compact(cost.params)} params · ${compact(cost.flops)} FLOPs`
+    + ` · ${compact(cost.activationBytes)}B activations per sample`;
+  const n = cost.unknown.length;
+  return n ? `${line} (${n} layer${n === 1 ? '' : 's'} not estimated)` : line;
+}
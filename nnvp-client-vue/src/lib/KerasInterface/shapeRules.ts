@@ -0,0 +1,176 @@
+// Shape propagation by table lookup: every generated catalog entry carries a
+// `shapeRule` (scripts/generate_keras_layers_json.py probes Keras'
+// compute_output_shape and keeps the rule kind that reproduces it), and this
+// module evaluates it — the TypeScript twin of the script's apply_shape_rule.
+// Keep the two in step: a kind added there needs its case here.
+//
+// Shapes exclude the batch axis and are channels-last. Parameters are the
+// layer's parameterValues over the catalog defaults (shapeRuleParams); the
+// catalog's Python-flavored "None" counts as unset. Anything the rule cannot
+// answer — unknown kind, unset parameter, a rank it rejects, a window larger
+// than its input — is null, like the rest of dim inference.
+//
+// Pure module: no Vue, no DOM — runs identically under bun.
+
+import generatedKerasLayers from './generatedKerasLayers.json';
+import type {
+  KerasLayerCatalog, KerasLayerCatalogEntry, ParameterValue, ShapeRule,
+} from '../../types/model';
+
+export type Params = Record<string, ParameterValue | undefined>;
+
+const catalog = generatedKerasLayers as unknown as KerasLayerCatalog;
+const catalogLayers: Record<string, KerasLayerCatalogEntry> = catalog.layers ?? {};
+const aliasToCanonical: Record<string, string> = catalog.aliasToCanonical ?? {};
+
+// The highest input rank the generator probes; `ranks` says nothing beyond it.
+const MAX_PROBED_RANK = 4;
+
+function isUnset(value: ParameterValue | undefined): value is null | undefined | 'None' {
+  return value === null || value === undefined || value === 'None';
+}
+
+function intParam(params: Params, name: string): number | null {
+  const value = params[name];
+  return typeof value === 'number' && Number.isInteger(value) ? value : null;
+}
+
+/** An int-or-tuple parameter as one int per spatial axis. */
+export function perAxis(value: ParameterValue | undefined, spatial: number): number[] | null {
+  if (typeof value === 'number') return Array<number>(spatial).fill(value);
+  if (Array.isArray(value) && value.length === spatial) return value.slice();
+  return null;
+}
+
+// ZeroPadding/Cropping amounts as one [before, after] pair per axis. The
+// editor stores tuples flat, so a 1-D pair is (before, after) and a flat
+// 2*spatial tuple is read as pairs.
+function padPairs(value: ParameterValue | undefined, spatial: number): [number, number][] | null {
+  if (typeof value === 'number') return Array.from({ length: spatial }, () => [value, value] as [number, number]);
+  if (!Array.isArray(value)) return null;
+  if (spatial === 1 && value.length === 2) return [[value[0]!, value[1]!]];
+  if (value.length === spatial) return value.map(v => [v, v] as [number, number]);
+  if (value.length === 2 * spatial) {
+    return Array.from({ length: spatial }, (_, i) => [value[2 * i]!, value[2 * i + 1]!] as [number, number]);
+  }
+  return null;
+}
+
+function product(shape: number[]): number {
+  return shape.reduce((acc, d) => acc * d, 1);
+}
+
+/** Output shape of `rule` for the input `shapes` (one per input), or null. */
+export function applyShapeRule(rule: ShapeRule, shapes: number[][], params: Params): number[] | null {
+  const shape = shapes[0];
+  if (!shape) return null;
+  if (rule.ranks && shapes.some(s => s.length <= MAX_PROBED_RANK && !rule.ranks!.includes(s.length))) return null;
+  const last = shape[shape.length - 1]!;
+  switch (rule.kind) {
+    case 'identity':
+      return shape.slice();
+    case 'lastAxis':
+    case 'appendAxis':
+    case 'recurrent': {
+      const size = intParam(params, rule.param);
+      if (size === null) return null;
+      if (rule.kind === 'appendAxis') return [...shape, size];
+      if (rule.kind === 'recurrent' && params.return_sequences !== true) return [size];
+      return [...shape.slice(0, -1), size];
+    }
+    case 'flatten':
+      return [product(shape)];
+    case 'window': {
+      if (shape.length !== rule.spatial + 1) return null;
+      const kernel = perAxis(params[rule.kernel], rule.spatial);
+      const strides = isUnset(params.strides) ? kernel : perAxis(params.strides, rule.spatial);
+      const dilation = isUnset(params.dilation_rate) ? Array<number>(rule.spatial).fill(1)
+        : perAxis(params.dilation_rate, rule.spatial);
+      if (!kernel || !strides || !dilation) return null;
+      if (rule.transposed && !isUnset(params.output_padding)) return null;
+      const same = String(params.padding ?? 'valid').toLowerCase() === 'same';
+      const out = shape.slice(0, -1).map((size, i) => {
+        const [k, s, d] = [kernel[i]!, strides[i]!, dilation[i]!];
+        if (rule.transposed) return same ? size * s : (size - 1) * s + d * (k - 1) + 1;
+        return same ? Math.ceil(size / s) : Math.floor((size - d * (k - 1) - 1) / s) + 1;
+      });
+      if (out.some(d => d < 1)) return null;
+      let channels = rule.channels ? intParam(params, rule.channels) : last;
+      if (channels !== null && rule.multiplier) {
+        const multiplier = intParam(params, rule.multiplier);
+        channels = multiplier === null ? null : channels * multiplier;
+      }
+      return channels === null ? null : [...out, channels];
+    }
+    case 'global':
+      if (shape.length !== rule.spatial + 1) return null;
+      return params.keepdims === true ? [...Array<number>(rule.spatial).fill(1), last] : [last];
+    case 'upsample': {
+      const size = perAxis(params[rule.param], rule.spatial);
+      if (shape.length !== rule.spatial + 1 || !size) return null;
+      return [...shape.slice(0, -1).map((d, i) => d * size[i]!), last];
+    }
+    case 'pad': {
+      const pairs = padPairs(params[rule.param], rule.spatial);
+      if (shape.length !== rule.spatial + 1 || !pairs) return null;
+      const out = shape.slice(0, -1).map((d, i) => d + rule.sign * (pairs[i]![0] + pairs[i]![1]));
+      return out.some(d => d < 1) ? null : [...out, last];
+    }
+    case 'repeat': {
+      const n = intParam(params, rule.param);
+      return n === null ? null : [n, ...shape];
+    }
+    case 'reshape': {
+      const target = params[rule.param];
+      if (!Array.isArray(target)) return null;
+      const out = target.slice();
+      const free = out.indexOf(-1);
+      if (free >= 0) out[free] = product(shape) / product(out.filter(d => d !== -1));
+      return Number.isInteger(out[free] ?? 0) && product(out) === product(shape) ? out : null;
+    }
+    case 'permute': {
+      const dims = params[rule.param];
+      if (!Array.isArray(dims) || dims.length !== shape.length
+          || [...dims].sort((a, b) => a - b).some((d, i) => d !== i + 1)) return null;
+      return dims.map(d => shape[d - 1]!);
+    }
+    case 'resize': {
+      const [height, width] = [intParam(params, rule.height), intParam(params, rule.width)];
+      return height === null || width === null ? null : [height, width, last];
+    }
+    case 'elementwise':
+      return shapes.every(s => s.length === shape.length && s.every((d, i) => d === shape[i]))
+        ? shape.slice() : null;
+    case 'concat': {
+      // Keras counts the batch axis: axis 1 is the first axis here.
+      const keras = intParam(params, rule.param) ?? -1;
+      const axis = (((keras % (shape.length + 1)) + shape.length + 1) % (shape.length + 1)) - 1;
+      if (axis < 0 || shapes.some(s => s.length !== shape.length
+          || s.some((d, i) => i !== axis && d !== shape[i]))) return null;
+      return shape.map((d, i) => (i === axis ? shapes.reduce((acc, s) => acc + s[axis]!, 0) : d));
+    }
+    case 'table':
+      return rule.table[shape.join(',')]?.slice() ?? null;
+    default:
+      return null;
+  }
+}
+
+/** The catalog entry of a layer name (aliases resolve), if it has one. */
+export function catalogEntryOf(name: string): KerasLayerCatalogEntry | undefined {
+  const canonical = Object.prototype.hasOwnProperty.call(aliasToCanonical, name) ? aliasToCanonical[name]! : name;
+  return Object.prototype.hasOwnProperty.call(catalogLayers, canonical) ? catalogLayers[canonical] : undefined;
+}
+
+/** The catalog's rule for a layer name (aliases resolve), if it has one. */
+export function shapeRuleOf(name: string): ShapeRule | undefined {
+  return catalogEntryOf(name)?.shapeRule;
+}
+
+/** A layer's parameterValues over its catalog defaults — what the rule reads. */
+export function shapeRuleParams(name: string, values: Record<string, ParameterValue>): Params {
+  const defs = catalogEntryOf(name)?.parameters ?? {};
+  const params: Params = {};
+  for (const [param, def] of Object.entries(defs)) params[param] = def.default as ParameterValue | undefined;
+  return { ...params, ...values };
+}
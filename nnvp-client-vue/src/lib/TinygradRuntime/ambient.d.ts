@@ -25,6 +25,11 @@ interface GPUBuffer {
   unmap(): void;
 }
 
+// Opaque here: only cached and handed back to the runner (runtime.ts).
+interface GPUComputePipeline {
+  readonly label?: string;
+}
+
 interface GPUCommandEncoder {
   copyBufferToBuffer(
     source: GPUBuffer,
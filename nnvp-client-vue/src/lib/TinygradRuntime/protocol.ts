@@ -6,13 +6,15 @@
  *
  * Requests carry a caller-chosen id; every request is answered by exactly one
  * response with the same id ('cancel' excepted — it answers as the trace it
- * cancels). A cancelled trace cannot interrupt Python mid-exec; the worker
- * just drops its result instead of posting it.
+ * cancels). A 'weights' request first gets one `tensor` message per tensor,
+ * then that response. A cancelled trace cannot interrupt Python mid-exec; the
+ * worker just drops its result instead of posting it.
  */
 
 /** What a trace needs: the generated tinygrad model source plus the knobs
  *  that are baked into the trace (batch size and loss are fixed by driver.py;
- *  lr lands in the `opt.lr` weight buffer so it stays editable live). */
+ *  lr and momentum land in the `opt.lr` / `opt.momentum` weight buffers so
+ *  they stay editable live — changing them never re-traces). */
 export interface TraceRequest {
   /** KerasGenerator.generateTinygradFromGraph output (driver strips the final .softmax()). */
   modelSource: string;
@@ -22,20 +24,142 @@ export interface TraceRequest {
   learningRate: number;
   momentum: number;
   nesterov: boolean;
+  /** The batch the steps are traced at, the most one takes; default driver.MAX_BATCH_SIZE. */
+  maxBatchSize?: number;
+  /**
+   * Export runners that allocate their weight buffers and take the bytes
+   * tensor by tensor (RunnerStep.uploadTensor) instead of copying the whole
+   * blob at setupNet; default false. The result then carries no blob: the
+   * tensors come one by one from a WeightsRequest for meta.weightsKey.
+   */
+  streamWeights?: boolean;
+  /**
+   * >1 ships the fused training runner: one step() call takes up to this
+   * many stacked batches, runs them in one submit and resolves to their mean
+   * loss (driver.patch_runner_multi_step); default 1. A single batch per
+   * call still works.
+   */
+  fusedSteps?: number;
+  /** Encode the training step's kernels as one compute pass (driver.patch_runner_single_pass). */
+  singlePass?: boolean;
 }
 
 /** driver.build's meta dict, as JSON-parsed by the worker. */
 export interface TraceMeta {
+  /** The traced batch — the MAXIMUM a step takes (same value as maxBatchSize). */
   batchSize: number;
+  /**
+   * Steps accept any count up to this: the training step pads short label
+   * arrays with `padLabel` (ignored by the loss) and their inputs with copies
+   * of the real rows (what BatchNorm's statistics see); the eval step, when
+   * `evalSymbolicBatch`, takes the count from the input length.
+   */
+  maxBatchSize?: number;
+  padLabel?: number;
+  evalSymbolicBatch?: boolean;
+  /** Why the eval runner fell back to the fixed max batch (driver.build_eval). */
+  evalFallback?: string;
+  /** The runners were exported with TraceRequest.streamWeights. */
+  streamWeights?: boolean;
+  /** What a WeightsRequest for this trace's tensors names (streamWeights only). */
+  weightsKey?: string;
+  /** Batches one training step() call accepts (TraceRequest.fusedSteps). */
+  fusedSteps?: number;
+  /**
+   * device.createBindGroup calls per training step: `before` is what the
+   * unpatched export made (one per pass), `after` what the runner makes now
+   * that setupNet prebuilds them (driver.patch_runner_bind_groups).
+   */
+  bindGroupsPerStep?: { before: number; after: number };
+  computePassesPerStep?: number;
+  /** Content hash per pass, in the runner's `kernels` order (driver.kernel_hashes). */
+  kernelHashes?: string[];
+  /**
+   * Distinct kernels of this trace's runners (training + eval) that no earlier
+   * trace of this worker produced (`new`) vs that one did (`reused` — already
+   * compiled in the page's per-device pipeline cache).
+   */
+  pipelines?: { new: number; reused: number };
+  /**
+   * Reuse report: the model's layers (the generated `self.<name>` attributes)
+   * in forward-pass order, each flagged reused when neither it nor anything
+   * before it in the forward pass changed since an earlier trace of this
+   * worker (driver.layer_fingerprints). The step is still traced whole.
+   */
+  layerReuse?: { name: string; reused: boolean }[];
+  /** Kernel programs this trace generated (0 on a trace-cache hit). */
+  programsCompiled?: number;
+  /**
+   * The training export's to_program calls (driver._timed_to_program): one
+   * per kernel CALL, answered by tinygrad's per-AST cache (`hit`) or
+   * rendered, plus duplicate function bodies the runner no longer carries.
+   */
+  compile?: {
+    calls: number;
+    cacheHits: number;
+    renderMs: number;
+    perKernel: { name: string; ms: number; hit: boolean }[];
+    functionsDeduplicated: number;
+  };
+  /**
+   * Intermediate buffers of the training runner that share pooled GPU
+   * buffers (driver.pool_buffers): `bytesBefore` one buffer each, `bytesAfter`
+   * the pools; `unpooledBytes` the ones read before written (step-to-step
+   * state such as an RNG counter), which keep their own.
+   */
+  memory?: {
+    buffers: number;
+    pools: number;
+    bytesBefore: number;
+    bytesAfter: number;
+    unpooledBytes: number;
+  };
   inputShape: number[];
   numClasses: number;
   learningRate: number;
+  /** The value written into the `opt.momentum` buffer (driver.RuntimeSGD). */
+  momentum?: number;
   /** Safetensors entry names — the weightBufs keys (opt.params.* / opt.b.* / opt.lr). */
   stateEntries: string[];
   stateShapes: Record<string, number[]>;
   /** Alias name (opt.params.N) -> canonical model.* name for the same tensor. */
   aliases: Record<string, string>;
   kernels: number;
+  /** The pre-flight check run before the trace (driver.preflight); absent on a trace-cache hit. */
+  preflight?: PreflightResult;
+  /**
+   * Weights blob footprint: aliased tensors (model.* / opt.params.N) are
+   * stored once, so storedBytes < logicalBytes (driver.weights_footprint).
+   */
+  weights?: { logicalBytes: number; storedBytes: number; dedupRatio: number };
+  /**
+   * driver.TraceCache bookkeeping: whether THIS trace was served from the
+   * worker's content-addressed cache, plus its running counters.
+   */
+  traceCache?: {
+    key: string;
+    hit: boolean;
+    hits: number;
+    misses: number;
+    entries: number;
+    bytes: number;
+    budget: number;
+  };
+}
+
+/**
+ * driver.preflight: the model instantiated and run forward on a lazy batch,
+ * nothing realized or compiled. A model that fails it fails the trace with
+ * the reason, in milliseconds instead of seconds into the export.
+ */
+export interface PreflightResult {
+  /** Trainable parameters (BatchNorm running stats excluded). */
+  params: number;
+  /** Per-sample output shape, i.e. [numClasses]. */
+  outputShape: number[];
+  /** Kernels of the forward pass alone — a training step is roughly ten times that. */
+  forwardKernels: number;
+  ms: number;
 }
 
 export interface TraceResult {
@@ -43,16 +167,38 @@ export interface TraceResult {
   runnerJs: string;
   /** Forward-only runner (logits out, dropout inactive) for evaluation. */
   evalJs: string;
-  /** Safetensors blob with the real initial state (Glorot weights, zero momentum, lr). */
-  weights: Uint8Array;
+  /**
+   * Safetensors blob with the real initial state (Glorot weights, zero
+   * momentum, lr). Alias entries share data_offsets with their canonical
+   * tensor — read it by offsets, never assume one region per entry. null
+   * for a streamWeights trace (see WeightsRequest).
+   */
+  weights: Uint8Array | null;
   meta: TraceMeta;
 }
 
+/** The initial tensors of a streamWeights trace, streamed one at a time. */
+export interface WeightsRequest {
+  weightsKey: string;
+}
+
+/**
+ * One stored tensor of a streamed trace (driver.streamed_tensors): its bytes
+ * and every state name they belong to (the model.* name and its opt.params.N
+ * alias share one tensor) — a runner holds it under one of them, if at all.
+ */
+export interface StreamedTensor {
+  names: string[];
+  bytes: Uint8Array;
+}
+
 export type WorkerRequest =
   | { id: number; type: 'init' }
   | ({ id: number; type: 'trace' } & TraceRequest)
+  | ({ id: number; type: 'weights' } & WeightsRequest)
   | { id: number; type: 'cancel'; targetId: number };
 
 export type WorkerResponse =
   | { id: number; ok: true; result?: TraceResult }
-  | { id: number; ok: false; error: string };
+  | { id: number; ok: false; error: string }
+  | { id: number; tensor: StreamedTensor };
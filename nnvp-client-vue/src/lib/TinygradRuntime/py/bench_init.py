@@ -0,0 +1,97 @@
+# Benchmark of driver.build_safetensors (the weight initializer) against the
+# original per-value implementation, on a synthetic ~5M-parameter state dict
+# aliased exactly like a traced TrainStep's (model.* + opt.params.* + opt.b.*).
+# Also the differential check: every path must produce the SAME tensor bytes
+# (the blob layouts differ — the new writer stores aliased tensors once).
+# Usage:
+#   PYTHONPATH=/path/to/unpacked-tinygrad-wheel python3 bench_init.py
+import os
+
+os.environ["DEV"] = "NULL:WGSL"
+
+import sys  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import json  # noqa: E402
+import math  # noqa: E402
+import random  # noqa: E402
+import struct  # noqa: E402
+import time  # noqa: E402
+
+import driver  # noqa: E402
+
+LAYERS = [(2048, 2048), (400, 2048), (10, 400)]  # ~5.0M weights
+
+
+def synthetic_recipe():
+    recipe, params = [], []
+    for i, (fan_out, fan_in) in enumerate(LAYERS):
+        for suffix, shape in (("weight", [fan_out, fan_in]), ("bias", [fan_out])):
+            params.append(len(recipe))
+            recipe.append([f"model.layer_{i}.{suffix}", shape, "dtypes.float", len(recipe)])
+    for n, group in enumerate(params):
+        recipe.append([f"opt.params.{n}", recipe[group][1], "dtypes.float", group])
+    recipe.append(["opt.lr", [1], "dtypes.float", len(recipe)])
+    recipe.append(["opt.momentum", [1], "dtypes.float", len(recipe)])
+    for n, group in enumerate(params):
+        recipe.append([f"opt.b.{n}", recipe[group][1], "dtypes.float", len(recipe)])
+    return recipe
+
+
+def legacy_build_safetensors(recipe, seed=1337, lr=driver.LEARNING_RATE, momentum=0.9):
+    """The pre-vectorization implementation, verbatim but for the recipe
+    input: one rng.uniform per value, a list per tensor, struct.pack(*values)."""
+    rng = random.Random(seed)
+    header, blobs, offset, generated = {}, [], 0, {}
+    for name, shape, _dtype, group in recipe:
+        count = math.prod(shape)
+        is_param = name.endswith(".weight") or name.endswith(".bias") or ".params." in name
+        if group in generated:
+            values = generated[group]
+        elif is_param and len(shape) >= 2:
+            limit = math.sqrt(6.0 / (math.prod(shape[1:]) + shape[0]))
+            values = [rng.uniform(-limit, limit) for _ in range(count)]
+        elif name.endswith(".lr"):
+            values = [lr] * count
+        elif name == "opt.momentum":
+            values = [momentum] * count
+        else:
+            values = [0.0] * count
+        generated[group] = values
+        blob = struct.pack(f"<{count}f", *values)
+        header[name] = {"dtype": "F32", "shape": shape, "data_offsets": [offset, offset + len(blob)]}
+        blobs.append(blob)
+        offset += len(blob)
+    header_json = json.dumps(header).encode("utf8")
+    return struct.pack("<Q", len(header_json)) + header_json + b"".join(blobs)
+
+
+def tensors(blob):
+    """{name: raw bytes} of a safetensors blob, whatever its layout."""
+    header_len = struct.unpack("<Q", blob[:8])[0]
+    header = json.loads(bytes(blob[8:8 + header_len]))
+    data = blob[8 + header_len:]
+    return {name: bytes(data[info["data_offsets"][0]:info["data_offsets"][1]])
+            for name, info in header.items()}
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    out = fn()
+    print(f"  {label:<28} {time.perf_counter() - started:7.3f}s")
+    return out
+
+
+recipe = synthetic_recipe()
+params = sum(math.prod(shape) for name, shape, _dtype, _group in recipe if name.startswith("model."))
+print(f"{params / 1e6:.2f}M parameters, {len(recipe)} state entries")
+legacy = timed("legacy (per-value)", lambda: legacy_build_safetensors(recipe))
+reference = tensors(legacy)
+paths = [("array('f') fill", False)] + ([("numpy fill", True)] if driver.numpy_or_none() is not None else [])
+for label, use_numpy in paths:
+    blob = timed(label, lambda use_numpy=use_numpy: driver.build_safetensors(recipe, use_numpy=use_numpy))
+    assert tensors(blob) == reference, f"{label}: tensors differ from the legacy initializer"
+print(f"blob: {len(legacy) / 1e6:.1f}MB legacy -> {len(blob) / 1e6:.1f}MB deduplicated"
+      f" (meta.weights: {driver.weights_footprint(recipe)})")
+print("OK — every path is bit-identical to the legacy initializer")
@@ -62,7 +62,8 @@ const fakeDevice = {
   createPipelineLayout: () => ({}),
   createShaderModule: () => ({}),
   createComputePipelineAsync: async () => ({}),
-  createBindGroup: () => ({}),
+  bindGroups: 0,
+  createBindGroup() { this.bindGroups += 1; return {}; },
   createCommandEncoder: () => ({
     beginComputePass: () => ({ setPipeline() {}, setBindGroup() {}, dispatchWorkgroups() {}, end() {} }),
     // Executed immediately instead of on queue.submit — equivalent here,
@@ -75,7 +76,8 @@ const fakeDevice = {
     finish: () => ({}),
   }),
   queue: {
-    submit(_commandBuffers: unknown[]) {},
+    submits: 0,
+    submit(_commandBuffers: unknown[]) { this.submits += 1; },
     // The optimized runner uploads inputs this way (patch_runner_optimize_io).
     writeBuffer(buf: FakeBuffer, offset: number, data: ArrayBufferView | ArrayBuffer) {
       if (!(buf.usage & USAGE.COPY_DST)) throw new Error('writeBuffer target lacks COPY_DST usage');
@@ -168,9 +170,79 @@ console.log('weight write round-trips new bytes through a weight buffer');
 const batchSize = 32;
 const x = new Float32Array(batchSize * 28 * 28).fill(0.5);
 const y = new Int32Array(batchSize);
+const bindGroupsBefore = fakeDevice.bindGroups;
 const outputs = await step(x, y);
 if (outputs.length !== 1 || !(outputs[0] instanceof Float32Array)) {
   throw new Error(`step() returned ${outputs.length} outputs, expected [Float32Array]`);
 }
 console.log(`step() ran the full command flow, returned ${outputs[0].length} loss value(s)`);
+// setupNet prebuilt every bind group (driver.patch_runner_bind_groups).
+if (fakeDevice.bindGroups !== bindGroupsBefore) {
+  throw new Error(`step() created ${fakeDevice.bindGroups - bindGroupsBefore} bind groups, expected 0`);
+}
+
+// A short batch runs on the same runner: the step pads the labels with the
+// ignored PAD_LABEL (driver.patch_runner_for_partial_batch).
+const short = await step(x.subarray(0, 5 * 28 * 28), y.subarray(0, 5));
+if (short.length !== 1 || !(short[0] instanceof Float32Array)) {
+  throw new Error(`short-batch step() returned ${short.length} outputs, expected [Float32Array]`);
+}
+console.log('step() accepts a batch below the traced maximum');
+
+// The stream_weights export (driver.patch_runner_for_weight_streaming):
+// setupNet without weights allocates the buffers, each tensor is then
+// uploaded on its own and must land in the buffer its name maps to.
+const streamPath = prefix.startsWith('/') ? `${prefix}.stream.js` : `${process.cwd()}/${prefix}.stream.js`;
+const streamMod = await import(streamPath);
+const streamStep = await streamMod.default.setupNet(fakeDevice);
+if (typeof streamStep.uploadTensor !== 'function') throw new Error('streaming runner lacks uploadTensor');
+for (const name of Object.keys(streamStep.weightBufs)) streamStep.uploadTensor(name, expected[name]!);
+for (const name of Object.keys(streamStep.weightBufs)) {
+  const got = await readback(fakeDevice, streamStep.weightBufs[name]); // eslint-disable-line no-await-in-loop
+  for (let i = 0; i < got.length; i += 1) {
+    if (got[i] !== expected[name]![i]) throw new Error(`streamed ${name}[${i}] = ${got[i]}, expected ${expected[name]![i]}`);
+  }
+}
+await streamStep(x, y);
+console.log('streaming runner takes its weights tensor by tensor, then steps');
+
+// A shared pipeline cache (driver.patch_runner_pipeline_cache): a second
+// runner of the same trace compiles nothing.
+const pipelineCache = new Map();
+const first = await mod.default.setupNet(fakeDevice, weights, pipelineCache);
+const second = await mod.default.setupNet(fakeDevice, weights, pipelineCache);
+if (first.pipelineStats.compiled !== pipelineCache.size || second.pipelineStats.compiled !== 0) {
+  throw new Error(`pipeline cache: ${JSON.stringify([first.pipelineStats, second.pipelineStats])}`);
+}
+console.log(`pipeline cache: ${second.pipelineStats.reused} kernels reused, none recompiled`);
+
+// The fused runner (driver.patch_runner_multi_step, built with fused_steps=4):
+// up to 4 stacked batches per call, one submit, the mean loss back.
+const fusedPath = prefix.startsWith('/') ? `${prefix}.fused.js` : `${process.cwd()}/${prefix}.fused.js`;
+const fusedStep = await (await import(fusedPath)).default.setupNet(fakeDevice, weights);
+const fusedSteps = 4;
+const xs = new Float32Array(fusedSteps * x.length).fill(0.5);
+const ys = new Int32Array(fusedSteps * batchSize);
+const fusedLoss = await fusedStep(xs, ys);
+if (fusedLoss.length !== 1 || fusedLoss[0].length !== outputs[0].length) throw new Error('fused step() did not return one mean loss');
+await fusedStep(xs.subarray(0, 70 * 28 * 28), ys.subarray(0, 70)); // 3 batches, the last one short
+console.log('fused step() runs 1 to 4 batches per call');
+
+// steps/sec, optimized vs fused, readback on every call. The fake device
+// has no GPU and no fences, so this measures JS + encoding overhead only;
+// submits/step is what the fused runner saves on a real device.
+const optPath = prefix.startsWith('/') ? `${prefix}.opt.js` : `${process.cwd()}/${prefix}.opt.js`;
+const optStep = await (await import(optPath)).default.setupNet(fakeDevice, weights);
+const benchSteps = 2000;
+for (const [label, run, perCall] of [
+  ['optimized', () => optStep(x, y), 1],
+  [`fused x${fusedSteps}`, () => fusedStep(xs, ys), fusedSteps],
+] as const) {
+  const submitsBefore = fakeDevice.queue.submits;
+  const started = performance.now();
+  for (let i = 0; i < benchSteps / perCall; i += 1) await run(); // eslint-disable-line no-await-in-loop
+  const seconds = (performance.now() - started) / 1000;
+  console.log(`${label}: ${(benchSteps / seconds).toFixed(0)} steps/s,`
+    + ` ${(fakeDevice.queue.submits - submitsBefore) / benchSteps} submits/step`);
+}
 console.log('OK — patched runner works against the fake WebGPU device');
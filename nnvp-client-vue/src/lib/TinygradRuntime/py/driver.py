@@ -9,18 +9,27 @@
 # IMPORTANT: os.environ must be set BEFORE tinygrad is imported (worker.ts
 # does it in Pyodide; ./run_local.py shows the CPython way).
 
+import hashlib
+import importlib.metadata
+import inspect
 import json
 import math
 import os
 import random
 import re
 import struct
+import sys
+import time
+from array import array
+from collections import OrderedDict
 
 assert os.environ.get("DEV") == "NULL:WGSL", "set DEV=NULL:WGSL before importing tinygrad"
 
 import contextlib  # noqa: E402
 
-from tinygrad import Tensor, nn  # noqa: E402
+from tinygrad import Tensor, Variable, dtypes, nn  # noqa: E402
+from tinygrad.engine.realize import get_call_outs_ins  # noqa: E402
+from tinygrad.uop.ops import Ops  # noqa: E402
 from tinygrad.nn.state import get_parameters, get_state_dict  # noqa: E402
 
 
@@ -39,8 +48,207 @@ import export_model as em  # noqa: E402  (vendored from tinygrad master extra/)
 if "NULL" not in em.EXPORT_SUPPORTED_DEVICE:
     em.EXPORT_SUPPORTED_DEVICE.append("NULL")
 
-BATCH_SIZE = 32
+# tinygrad memoizes to_program per kernel AST, so a backward pass repeating
+# one layer's kernels, or a re-trace of a mostly unchanged model, renders each
+# distinct kernel once per worker. That cache is tinygrad's to manage; the
+# driver only records which ASTs its exports rendered (least recently used
+# first) to tell the log's cache hits from its misses.
+RENDERED_PROGRAMS = OrderedDict()
+RENDERED_PROGRAMS_MAX = 4096
+
+
+class CompileLog:
+    """What compile_net did during the current export: per kernel CALL,
+    (function_name, seconds in to_program, whether the AST cache answered),
+    plus how many duplicate function bodies _dedup_compile_net dropped. Also
+    holds the argument indices each kernel writes (for _pooled_export_model_webgpu)
+    and that function's pool_buffers summary."""
+
+    def __init__(self):
+        self.calls = []
+        self.deduplicated = 0
+        self.kernel_outs = {}
+        self.memory = None
+
+    def report(self):
+        """The summary trace puts in meta.compile (plus meta.memory, under
+        "memory"); starts a fresh log."""
+        calls, deduplicated, memory = self.calls, self.deduplicated, self.memory
+        self.__init__()
+        return {
+            "memory": memory,
+            "calls": len(calls),
+            "cacheHits": sum(1 for _name, _seconds, hit in calls if hit),
+            "renderMs": round(sum(seconds for _name, seconds, _hit in calls) * 1000, 3),
+            "perKernel": [{"name": name, "ms": round(seconds * 1000, 3), "hit": hit}
+                          for name, seconds, hit in calls],
+            "functionsDeduplicated": deduplicated,
+        }
+
+
+COMPILE_LOG = CompileLog()
+_to_program = em.to_program
+_compile_net = em.compile_net
+_export_model_webgpu = em.export_model_webgpu
+
+
+def _timed_to_program(ast, renderer):
+    """em.to_program, logged into COMPILE_LOG. A call counts as a cache hit
+    when an earlier export rendered the same AST for the same target
+    (RENDERED_PROGRAMS); a record that aged out reads as a miss, so the log
+    never overstates the hits."""
+    key = (ast.key, type(renderer).__name__, str(renderer.target))
+    hit = key in RENDERED_PROGRAMS
+    started = time.perf_counter()
+    program = _to_program(ast, renderer)
+    COMPILE_LOG.calls.append((program.arg.function_name, time.perf_counter() - started, hit))
+    RENDERED_PROGRAMS[key] = True
+    RENDERED_PROGRAMS.move_to_end(key)
+    while len(RENDERED_PROGRAMS) > RENDERED_PROGRAMS_MAX:
+        RENDERED_PROGRAMS.popitem(last=False)
+    return program
+
+
+def _dedup_compile_net(linear, output_bufs):
+    """em.compile_net, with kernels whose WGSL differs only by function name
+    emitted once: statements call the first such name and `functions` keeps
+    only it (export_model_webgpu renames every function to `main` anyway).
+    Only the name as a whole word is masked, so a body that merely contains
+    it (a longer identifier) still compares as different."""
+    functions, statements, bufs, bufs_to_save = _compile_net(linear, output_bufs)
+    for call in em.iter_kernel_calls(linear):
+        COMPILE_LOG.kernel_outs[call.src[0].arg.function_name] = get_call_outs_ins(call)
+    canonical, by_body = {}, {}
+    for name, code in functions.items():
+        canonical[name] = by_body.setdefault(re.sub(rf"\b{re.escape(name)}\b", "main", code), name)
+    COMPILE_LOG.deduplicated += len(functions) - len(by_body)
+    functions = {name: code for name, code in functions.items() if canonical[name] == name}
+    statements = [(canonical[name], args, global_size, local_size)
+                  for name, args, global_size, local_size in statements]
+    return functions, statements, bufs, bufs_to_save
+
+
+def pool_buffers(statements, bufs, poolable, kernel_outs):
+    """Liveness pass over an export's statements: (statements, bufs, summary)
+    with the `poolable` buffers (names in `bufs`) sharing `pool_N` buffers.
+    export_model gives every intermediate its own buffer, so a backward pass
+    holds all its activations and gradients at once. A poolable buffer lives
+    from the statement that first writes it to the last that uses it, and
+    buffers of one dtype whose lives do not overlap share a pool, sized to
+    the largest (a pool keeps one dtype: the runner types it by its buffer).
+    One the step READS before writing it carries a value over from the last
+    step (an RNG counter, say) and keeps its own buffer, as do buffers no
+    kernel reads or writes. kernel_outs: function name -> (written, read)
+    argument indices. Assignment is greedy in order of first write: the
+    smallest free pool that fits, else the largest free one (grown), else a
+    new pool."""
+    first, last, read_first = {}, {}, set()
+    for i, (function_name, args, _global_size, _local_size) in enumerate(statements):
+        outs, ins = kernel_outs[function_name]
+        for j, name in enumerate(args):
+            if name not in poolable:
+                continue
+            if name not in first:
+                first[name] = i
+                if j in ins or j not in outs:
+                    read_first.add(name)
+            elif first[name] == i and j in ins:
+                read_first.add(name)
+            last[name] = i
+    live = sorted((name for name in first if name not in read_first), key=lambda name: first[name])
+    pools, assigned = [], {}  # pools: [size, free after statement, index, dtype]
+    for name in live:
+        size, dtype = bufs[name][0], bufs[name][1]
+        free = [pool for pool in pools if pool[1] < first[name] and pool[3] == dtype]
+        fits = [pool for pool in free if pool[0] >= size]
+        pool = min(fits, key=lambda pool: pool[0]) if fits else max(free, key=lambda pool: pool[0], default=None)
+        if pool is None:
+            pool = [0, -1, len(pools), dtype]
+            pools.append(pool)
+        pool[0], pool[1] = max(pool[0], size), last[name]
+        assigned[name] = pool[2]
+    pooled_bufs = {}
+    for name, (size, dtype, key) in bufs.items():
+        if name not in assigned:
+            pooled_bufs[name] = (size, dtype, key)
+        elif f"pool_{assigned[name]}" not in pooled_bufs:
+            size, dtype, index = pools[assigned[name]][0], pools[assigned[name]][3], assigned[name]
+            pooled_bufs[f"pool_{index}"] = (size, dtype, ("pool", index))
+    statements = [(function_name, [f"pool_{assigned[name]}" if name in assigned else name for name in args],
+                   global_size, local_size)
+                  for function_name, args, global_size, local_size in statements]
+    summary = {
+        "buffers": len(assigned),
+        "pools": len(pools),
+        "bytesBefore": sum(bufs[name][0] for name in assigned),
+        "bytesAfter": sum(pool[0] for pool in pools),
+        "unpooledBytes": sum(bufs[name][0] for name in poolable if name not in assigned),
+    }
+    return statements, pooled_bufs, summary
+
+
+DISPATCH_BINARY_JS = {
+    "ADD": "({} + {})", "SUB": "({} - {})", "MUL": "({} * {})", "MAX": "Math.max({}, {})",
+    "CDIV": "Math.trunc({} / {})", "CMOD": "({} % {})", "FLOORDIV": "Math.floor({} / {})",
+    "SHL": "({} << {})", "SHR": "({} >> {})", "AND": "({} & {})", "OR": "({} | {})", "XOR": "({} ^ {})",
+    "CMPLT": "Number({} < {})",
+}
+
+
+def dispatch_dim_js(dim):
+    """A dispatch dimension as JS: ints and strings (export_model already
+    renders `var + const`) unchanged, a symbolic integer UOp as the JS
+    expression of its tree, each variable read from its uploaded uniform
+    (`_batch[0]`). Raises ValueError naming the op it cannot render — the
+    runner would otherwise carry the UOp's Python repr."""
+    if isinstance(dim, (int, str)):
+        return dim
+    if not dtypes.is_int(dim.dtype):
+        raise ValueError(f"symbolic dispatch dimension of dtype {dim.dtype} cannot be rendered to JS")
+    if dim.op is Ops.CONST:
+        return str(int(dim.arg))
+    if dim.op is Ops.DEFINE_VAR:
+        return f"_{dim.arg[0]}[0]"
+    if dim.op in (Ops.BIND, Ops.CAST, Ops.BITCAST):  # int -> int: the value itself
+        return dispatch_dim_js(dim.src[0])
+    if dim.op is Ops.NEG:
+        return f"(-{dispatch_dim_js(dim.src[0])})"
+    if dim.op is Ops.WHERE:
+        return "({} ? {} : {})".format(*(dispatch_dim_js(src) for src in dim.src))
+    if dim.op.name in DISPATCH_BINARY_JS and len(dim.src) == 2:
+        return DISPATCH_BINARY_JS[dim.op.name].format(*(dispatch_dim_js(src) for src in dim.src))
+    raise ValueError(f"symbolic dispatch dimension with {dim.op} cannot be rendered to JS")
+
+
+def _pooled_export_model_webgpu(functions, statements, bufs, weight_names, input_names, output_names,
+                                model_name, symbolic_vars={}, stream_weights=False):
+    """em.export_model_webgpu with its intermediate buffers pooled
+    (pool_buffers): everything but the weights, inputs, outputs and the
+    symbolic-variable uniforms. Symbolic dispatch dimensions are rendered to
+    JS first (dispatch_dim_js); export_model only handles `var + const`."""
+    fixed = set(input_names) | set(output_names) | set(symbolic_vars.values())
+    poolable = {name for name, (_size, _dtype, key) in bufs.items() if name not in fixed and key not in weight_names}
+    statements, bufs, COMPILE_LOG.memory = pool_buffers(statements, bufs, poolable, COMPILE_LOG.kernel_outs)
+    statements = [(function_name, args, global_size and [dispatch_dim_js(dim) for dim in global_size], local_size)
+                  for function_name, args, global_size, local_size in statements]
+    return _export_model_webgpu(functions, statements, bufs, weight_names, input_names, output_names,
+                                model_name, symbolic_vars, stream_weights)
+
+
+em.to_program = _timed_to_program
+em.compile_net = _dedup_compile_net
+em.export_model_webgpu = _pooled_export_model_webgpu
+
+# Traces run at this many samples; smaller batches reuse the same runner (the
+# training step pads its labels with PAD_LABEL, the eval step is symbolic).
+MAX_BATCH_SIZE = 32
+# Label of padding rows: the loss ignores them (sparse_categorical_crossentropy
+# ignore_index — tinygrad reserves -1 for "ignore nothing").
+PAD_LABEL = -100
 LEARNING_RATE = 0.01
+# Byte budget of the in-worker trace cache (runner sources + meta + recipe;
+# a traced backward pass is ~100KB-1MB of JS, so this holds dozens).
+TRACE_CACHE_BUDGET = 32 * 1024 * 1024
 
 
 class Model:
@@ -54,13 +262,38 @@ class Model:
         return self.layer_2(x)  # logits; softmax folded into the loss
 
 
+class RuntimeSGD(nn.optim.LARS):
+    """tinygrad's SGD (LARS with tcoef=0, no weight decay) with the momentum
+    held in a state tensor (`opt.momentum`) instead of a Python float baked
+    into the kernels — like `opt.lr` already is. Both are plain weight
+    buffers of the runner, so one trace serves every lr/momentum value and a
+    schedule just writes them between steps (the runner's setLearningRate /
+    setMomentum, see patch_runner_for_weight_readback). The momentum buffers
+    `opt.b.N` therefore always exist: momentum 0 makes them pass-throughs."""
+
+    def __init__(self, params, lr=LEARNING_RATE, momentum=0.0, nesterov=False):
+        # momentum=1.0 only so LARS allocates self.b; replaced right below.
+        super().__init__(params, lr, momentum=1.0, weight_decay=0.0, nesterov=nesterov,
+                         classic=False, tcoef=0.0)
+        self.momentum = Tensor([momentum], device=self.device, dtype=self.lr.dtype)
+
+    def _step(self, params, grads):
+        # LARS._step's popular-momentum branch, minus the `if self.momentum`
+        # test a tensor cannot answer at trace time.
+        ret = []
+        for i, (t, g) in enumerate(zip(params, grads)):
+            self.b[i].assign(self.momentum * self.b[i] + g)
+            g = (g + self.momentum * self.b[i]) if self.nesterov else self.b[i]
+            ret.append((g * self.lr).cast(t.dtype))
+        return ret, self.b
+
+
 class TrainStep:
     """One SGD step (forward + cross-entropy + backward + update) per call."""
 
     def __init__(self, model_cls=Model, lr=LEARNING_RATE, momentum=0.9, nesterov=False):
         self.model = model_cls()
-        self.opt = nn.optim.SGD(
-            get_parameters(self.model), lr=lr, momentum=momentum, nesterov=nesterov)
+        self.opt = RuntimeSGD(get_parameters(self.model), lr=lr, momentum=momentum, nesterov=nesterov)
 
     def __call__(self, x, y):
         # BatchNorm running mean/var: their per-step update assigns are NOT
@@ -78,7 +311,9 @@ class TrainStep:
         ]
         with training_context():
             self.opt.zero_grad()
-            loss = self.model(x).sparse_categorical_crossentropy(y)
+            # Padding rows (label PAD_LABEL) are masked out of the loss and so
+            # out of every gradient: one trace trains any batch <= the max.
+            loss = self.model(x).sparse_categorical_crossentropy(y, ignore_index=PAD_LABEL)
             loss.backward()
             # realize the loss WITH the update, or the scheduler recomputes
             # the loss after the weights moved (see experiments/README).
@@ -86,62 +321,188 @@ class TrainStep:
             return loss
 
 
-def build_safetensors(state, seed=1337, lr=LEARNING_RATE):
-    """Hand-rolled safetensors with real values: Glorot-uniform weights,
-    zero biases/momentum, ONE for BatchNorm running_var (unit variance, like
-    every framework's init — zero would divide the eval pass by sqrt(eps)),
-    the actual learning rate for the lr tensor."""
-    rng = random.Random(seed)
-    header = {}
-    blobs = []
-    offset = 0
-    # The state dict aliases each weight under TWO names (model.layer_N.weight
-    # and opt.params.N — same tensor object), and the emitted runner loads
-    # from the opt.params.* ones. Key generated values by tensor identity so
-    # every alias carries the same bytes and it cannot matter which one wins.
-    generated = {}
+def weights_recipe(state):
+    """What build_safetensors needs from a state dict, as plain JSON data:
+    one [name, shape, dtype, group] per entry, where `group` is the index of
+    the first entry holding the SAME tensor object. The trace cache stores
+    this instead of the blob — regenerating the values is cheap and
+    deterministic, the tensors themselves do not outlive the trace."""
+    recipe, first_index = [], {}
     for name, tensor in state.items():
-        shape = list(tensor.shape)
-        count = 1
-        for dim in shape:
-            count *= dim
-        # BatchNorm's num_batches_tracked is an int64 step counter (unused by
-        # the stats math unless momentum=None): zeros of the right byte width.
-        if str(tensor.dtype) in ("dtypes.long", "dtypes.int64"):
-            blob = struct.pack(f"<{count}q", *([0] * count))
-            header[name] = {"dtype": "I64", "shape": shape,
-                            "data_offsets": [offset, offset + len(blob)]}
-            blobs.append(blob)
-            offset += len(blob)
-            continue
-        assert str(tensor.dtype) in ("dtypes.float", "dtypes.float32"), (
-            f"unexpected dtype for {name}: {tensor.dtype}")
-        is_param = name.endswith(".weight") or name.endswith(".bias") or ".params." in name
-        if id(tensor) in generated:
-            values = generated[id(tensor)]
-        elif is_param and len(shape) >= 2:  # weight tensor (Linear 2-D, Conv 4-D): Glorot
-            fan_out = shape[0]
-            fan_in = 1
-            for dim in shape[1:]:
-                fan_in *= dim
-            limit = math.sqrt(6.0 / (fan_in + fan_out))
-            values = [rng.uniform(-limit, limit) for _ in range(count)]
-        elif name.endswith(".lr"):
-            values = [lr] * count
-        elif name.endswith(".running_var"):
-            values = [1.0] * count
-        elif is_param and len(shape) == 1 and name.endswith(".weight"):
-            # A 1-D .weight is BatchNorm's gamma: ones (zero would null the layer).
-            values = [1.0] * count
-        else:  # biases, running_mean and optimizer MOMENTUM buffers (2-D too!) start at zero
-            values = [0.0] * count
-        generated[id(tensor)] = values
-        blob = struct.pack(f"<{count}f", *values)
-        header[name] = {"dtype": "F32", "shape": shape, "data_offsets": [offset, offset + len(blob)]}
-        blobs.append(blob)
-        offset += len(blob)
+        group = first_index.setdefault(id(tensor), len(recipe))
+        recipe.append([name, list(tensor.shape), str(tensor.dtype), group])
+    return recipe
+
+
+# Glorot values are drawn this many at a time: bounded temporaries (a
+# float64 per value on the NumPy path) however large the tensor.
+INIT_CHUNK = 1 << 18
+
+
+def init_rule(name, shape, dtype, lr=LEARNING_RATE, momentum=0.9):
+    """(kind, value) of one state entry's initial values: kind is "i64"
+    (int64 zeros), "zeros", "fill" (every element = value) or "glorot"
+    (uniform in [-value, value])."""
+    # BatchNorm's num_batches_tracked is an int64 step counter (unused by
+    # the stats math unless momentum=None): zeros of the right byte width.
+    if dtype in ("dtypes.long", "dtypes.int64"):
+        return "i64", 0
+    assert dtype in ("dtypes.float", "dtypes.float32"), (
+        f"unexpected dtype for {name}: {dtype}")
+    is_param = name.endswith(".weight") or name.endswith(".bias") or ".params." in name
+    if is_param and len(shape) >= 2:  # weight tensor (Linear 2-D, Conv 4-D): Glorot
+        fan_in = math.prod(shape[1:])
+        return "glorot", math.sqrt(6.0 / (fan_in + shape[0]))
+    if name.endswith(".lr"):
+        return "fill", lr
+    if name == "opt.momentum":
+        return "fill", momentum
+    if name.endswith(".running_var"):
+        return "fill", 1.0
+    if is_param and len(shape) == 1 and name.endswith(".weight"):
+        # A 1-D .weight is BatchNorm's gamma: ones (zero would null the layer).
+        return "fill", 1.0
+    # biases, running_mean and optimizer MOMENTUM buffers (2-D too!) start at zero
+    return "zeros", 0
+
+
+def _fill_python(view, count, kind, value, rng):
+    """Fill `view` (a float32 memoryview) without NumPy: C-speed repeats for
+    constants; Glorot still draws per value, but into array('f') chunks —
+    no list of Python floats, no struct.pack(*values)."""
+    if kind == "fill":
+        view[:] = array("f", [value]) * count
+        return
+    draw = rng.random
+    low, span = -value, 2 * value  # rng.uniform(-limit, limit), inlined
+    for begin in range(0, count, INIT_CHUNK):
+        end = min(begin + INIT_CHUNK, count)
+        chunk = array("f", [low + span * draw() for _ in range(end - begin)])
+        if sys.byteorder != "little":
+            chunk.byteswap()
+        view[begin:end] = chunk
+
+
+def numpy_or_none():
+    """numpy, or None where it is not installed (build_safetensors then fills
+    with array('f')). Imported per call, not with this module: the worker
+    only loads Pyodide's numpy with its first trace, after importing driver."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _fill_numpy(view, count, kind, value, rng):
+    import numpy as np
+
+    target = np.frombuffer(view, dtype="<f4", count=count)
+    if kind == "fill":
+        target[:] = value
+        return
+    for begin in range(0, count, INIT_CHUNK):
+        end = min(begin + INIT_CHUNK, count)
+        target[begin:end] = -value + (2 * value) * rng.random_sample(end - begin)
+
+
+def _weights_plan(recipe, lr, momentum):
+    """build_safetensors' layout of `recipe`: (plan, header, data bytes), with
+    one (kind, value, count, offset, size, names) per STORED tensor — names
+    every alias entry sharing it — in blob order."""
+    plan, header, offset, placed = [], {}, 0, {}
+    for name, shape, dtype, group in recipe:
+        kind, value = init_rule(name, shape, dtype, lr=lr, momentum=momentum)
+        count = math.prod(shape)
+        size = count * (8 if kind == "i64" else 4)
+        if group not in placed:
+            placed[group] = (offset, [])
+            plan.append((kind, value, count, offset, size, placed[group][1]))
+            offset = (offset + size + 7) & ~7
+        placed[group][1].append(name)
+        header[name] = {"dtype": "I64" if kind == "i64" else "F32", "shape": shape,
+                        "data_offsets": [placed[group][0], placed[group][0] + size]}
+    return plan, header, offset
+
+
+def _weights_fill(seed, use_numpy):
+    """(fill, rng) drawing the Glorot values of build_safetensors: _fill_numpy
+    on a RandomState carrying random.Random(seed)'s Mersenne Twister state
+    when numpy is there, else _fill_python on that random.Random."""
+    rng = random.Random(seed)
+    np = numpy_or_none() if use_numpy else None
+    if np is None:
+        return _fill_python, rng
+    _version, mt_state, _gauss = rng.getstate()
+    state = np.random.RandomState()
+    state.set_state(("MT19937", np.array(mt_state[:624], dtype=np.uint32), mt_state[624]))
+    return _fill_numpy, state
+
+
+def build_safetensors(recipe, seed=1337, lr=LEARNING_RATE, momentum=0.9, use_numpy=True):
+    """Hand-rolled safetensors with real values: Glorot-uniform weights,
+    zero biases/momentum buffers, ONE for BatchNorm running_var (unit
+    variance, like every framework's init — zero would divide the eval pass
+    by sqrt(eps)), the actual learning rate and momentum for the `opt.lr` /
+    `opt.momentum` scalars (see init_rule). `recipe` is weights_recipe's
+    output for the traced state dict.
+
+    The state dict aliases each weight under TWO names (model.layer_N.weight
+    and opt.params.N — same tensor object; the recipe's group): the bytes
+    are stored ONCE and every alias's header entry points at the same
+    data_offsets (our readers — the runner's getTensorBuffer, ../weightIO.ts,
+    Training/safetensors.ts — only slice by offsets; the reference
+    `safetensors` library would reject the overlap). The header is
+    space-padded and every tensor starts 8-byte aligned, like the reference
+    writer.
+
+    Every value is written straight into one preallocated bytearray (zeros
+    are free — it starts zeroed). With NumPy the Glorot draws are vectorized
+    on a RandomState carrying the SAME Mersenne Twister state as
+    random.Random(seed), and the float64 -> float32 rounding matches
+    struct's: the values are bit-identical with or without NumPy."""
+    plan, header, data_size = _weights_plan(recipe, lr, momentum)
     header_json = json.dumps(header).encode("utf8")
-    return struct.pack("<Q", len(header_json)) + header_json + b"".join(blobs)
+    header_json += b" " * (-(8 + len(header_json)) % 8)
+    start = 8 + len(header_json)
+    blob = bytearray(start + data_size)
+    struct.pack_into("<Q", blob, 0, len(header_json))
+    blob[8:start] = header_json
+    data = memoryview(blob)[start:]
+
+    fill, rng = _weights_fill(seed, use_numpy)
+    for kind, value, count, at, size, _names in plan:
+        if kind not in ("i64", "zeros"):
+            fill(data[at:at + size].cast("f"), count, kind, value, rng)
+    return blob
+
+
+def iter_tensors(recipe, seed=1337, lr=LEARNING_RATE, momentum=0.9, use_numpy=True):
+    """build_safetensors' tensors one at a time, without the blob: (names,
+    bytes) per stored tensor, in blob order — names are all its alias
+    entries, the bytes exactly its data in the blob (same draws, same
+    order). Only the tensor being yielded is held."""
+    plan, _header, _size = _weights_plan(recipe, lr, momentum)
+    fill, rng = _weights_fill(seed, use_numpy)
+    for kind, value, count, _at, size, names in plan:
+        data = bytearray(size)
+        if kind not in ("i64", "zeros"):
+            fill(memoryview(data).cast("f"), count, kind, value, rng)
+        yield list(names), data
+
+
+def weights_footprint(recipe):
+    """Logical (every alias counted) vs stored (each tensor once, aligned)
+    data bytes of build_safetensors' blob for `recipe`."""
+    logical, stored, seen = 0, 0, set()
+    for name, shape, dtype, group in recipe:
+        size = math.prod(shape) * (8 if init_rule(name, shape, dtype)[0] == "i64" else 4)
+        logical += size
+        if group not in seen:
+            seen.add(group)
+            stored += (size + 7) & ~7
+    return {"logicalBytes": logical, "storedBytes": stored,
+            "dedupRatio": round(logical / stored, 3) if stored else 1.0}
 
 
 class EvalWrap:
@@ -169,6 +530,9 @@ def patch_runner_for_weight_readback(js):
     2. setupNet's returned step function gets `.weightBufs`, a
        {stateName: GPUBuffer} map (names are the safetensors keys, i.e. the
        opt.params.* / opt.b.* / opt.lr aliases — see build_safetensors).
+    3. The training runner also gets `.setLearningRate(v)` / `.setMomentum(v)`
+       (queue.writeBuffer into the opt.lr / opt.momentum scalars, see
+       RuntimeSGD): hyperparameter schedules and sweeps without a re-trace.
     """
     def replace_once(source, old, new):
         assert source.count(old) == 1, (
@@ -176,49 +540,382 @@ def patch_runner_for_weight_readback(js):
             "export_model output changed, re-derive the patches")
         return source.replace(old, new)
 
-    js = replace_once(
-        js,
-        "usage: GPUBufferUsage.STORAGE, mappedAtCreation: true",  # createWeightBuf only
-        "usage: GPUBufferUsage.STORAGE | GPUBufferUsage.COPY_SRC | GPUBufferUsage.COPY_DST,"
-        " mappedAtCreation: true",
-    )
+    if "state_dict['" not in js:
+        js = replace_once(
+            js,
+            "usage: GPUBufferUsage.STORAGE, mappedAtCreation: true",  # createWeightBuf only
+            "usage: GPUBufferUsage.STORAGE | GPUBufferUsage.COPY_SRC | GPUBufferUsage.COPY_DST,"
+            " mappedAtCreation: true",
+        )
+    else:  # stream_weights=True export: COPY_DST already, see patch_runner_for_weight_streaming
+        js = replace_once(
+            js,
+            "usage: GPUBufferUsage.STORAGE | GPUBufferUsage.COPY_DST }",  # createWeightBuf only
+            "usage: GPUBufferUsage.STORAGE | GPUBufferUsage.COPY_SRC | GPUBufferUsage.COPY_DST }",
+        )
     pairs = re.findall(
         r"const (\w+) = createWeightBuf\(device, \d+, "
-        r"getTensorBuffer\(safetensor, metadata\['([^']+)'\]\)\);", js)
+        r"(?:getTensorBuffer\(safetensor, metadata|state_dict)\['([^']+)'\]\)?\);", js)
     assert pairs, "no createWeightBuf(...) lines found in the emitted runner"
     mapping = ", ".join(f"'{state_name}': {var}" for var, state_name in pairs)
-    # The training step takes (x, y); the eval export takes only (x).
-    signature = ("    return async (_input0,_input1) => {"
-                 if "return async (_input0,_input1) => {" in js
-                 else "    return async (_input0) => {")
-    args = "_input0,_input1" if "_input1" in signature else "_input0"
+    # The training step takes (x, y); the eval export takes (x) — plus the
+    # `batch` uniform when it was traced with a symbolic batch.
+    signatures = re.findall(r"    return async \((_input0[\w,]*)\) => \{", js)
+    assert len(signatures) == 1, f"expected one step signature in the emitted runner, got {signatures!r}"
+    args = signatures[0]
     js = replace_once(
         js,
-        signature,
+        f"    return async ({args}) => {{",
         f"    const weightBufs = {{{mapping}}};\n"
         f"    const _step = async ({args}) => {{",
     )
+    state_names = {state_name for _var, state_name in pairs}
+    setters = "".join(
+        f"    _step.{setter} = (value) => device.queue.writeBuffer("
+        f"weightBufs['{state_name}'], 0, new Float32Array([value]));\n"
+        for setter, state_name in (("setLearningRate", "opt.lr"), ("setMomentum", "opt.momentum"))
+        if state_name in state_names)
     js = replace_once(
         js,
         "        return [resultBuffer0];\n    }\n}",
         "        return [resultBuffer0];\n    };\n"
         "    _step.weightBufs = weightBufs;\n"
+        f"{setters}"
         "    return _step;\n}",
     )
     return js
 
 
-def build_eval(model_cls, input_shape):
-    """Trace the forward pass only (batch baked like the training step) and
-    emit its runner. Its weight buffers load from the SAME safetensors blob as
-    the training runner (the blob carries the model.* alias entries), and get
-    the COPY flags so current training weights can be copied in before each
-    evaluation."""
+def patch_runner_for_weight_streaming(js):
+    """Runner exported with stream_weights=True: setupNet only ALLOCATES the
+    weight buffers, and the bytes are queue-written afterwards, one tensor
+    at a time. The mapped export instead needs the whole safetensors blob in
+    hand before setupNet starts, plus a mapped staging copy of each buffer.
+    Applied after the weight-readback patch (its `.weightBufs` is the upload
+    target); same fail-loud matching.
+
+    1. setupNet(device, weights?) builds the {name: {}} state_dict the
+       emitted createWeightBuf calls fill in, so callers pass no state_dict.
+    2. The step gets `.uploadTensor(name, bytes)` (one weightBufs entry,
+       e.g. as each tensor of a fetch arrives) and `.uploadWeights(blob)`
+       (every entry from a safetensors blob — alias entries are skipped,
+       since only canonical names own a buffer).
+    3. When `weights` is given, setupNet uploads it before resolving, so
+       instantiateRunner(js, device, weights) behaves exactly as for the
+       mapped export.
+    """
+    names = re.findall(r"createWeightBuf\(device, \d+, state_dict\['([^']+)'\]\);", js)
+    assert names, "weight-streaming patch: no state_dict createWeightBuf(...) lines in the emitted runner"
+    signature = "const setupNet = async (device, state_dict) => {"
+    assert js.count(signature) == 1, f"weight-streaming patch target not found exactly once: {signature!r}"
+    js = js.replace(
+        signature,
+        "const setupNet = async (device, weights = null) => {\n"
+        f"    const state_dict = Object.fromEntries({json.dumps(names)}.map((name) => [name, {{}}]));")
+    tail = "    _step.weightBufs = weightBufs;\n"
+    assert js.count(tail) == 1, f"weight-streaming patch target not found exactly once: {tail!r}"
+    return js.replace(
+        tail,
+        f"{tail}"
+        "    _step.uploadTensor = (name, bytes) => device.queue.writeBuffer(weightBufs[name], 0, bytes);\n"
+        "    _step.uploadWeights = (blob) => {\n"
+        "        const headerLength = Number(new DataView(blob.buffer, blob.byteOffset, 8).getBigUint64(0, true));\n"
+        "        const header = JSON.parse(new TextDecoder().decode(blob.subarray(8, 8 + headerLength)));\n"
+        "        for (const name of Object.keys(weightBufs)) {\n"
+        "            const [begin, end] = header[name].data_offsets;\n"
+        "            _step.uploadTensor(name, blob.subarray(8 + headerLength + begin, 8 + headerLength + end));\n"
+        "        }\n"
+        "    };\n"
+        "    if (weights) _step.uploadWeights(weights);\n")
+
+
+def patch_runner_for_weights(js, stream_weights):
+    """The weight patches every runner gets: readback, plus streaming uploads
+    when it was exported with stream_weights=True."""
+    js = patch_runner_for_weight_readback(js)
+    return patch_runner_for_weight_streaming(js) if stream_weights else js
+
+
+def pad_rows_js(rows, max_batch, indent):
+    """JS padding _input0 (float rows, as many as _input1 has labels) to
+    `rows` rows by replicating the rows of its last, short batch of
+    max_batch. The padding rows are masked out of the loss by their labels,
+    but BatchNorm's batch statistics (and so its running mean/var) do see
+    them: real rows keep those statistics on the data, at the cost of
+    weighting the replicated rows more than once; stale or zero rows would
+    drag the mean and variance of every short batch towards them."""
+    return "".join(f"{indent}{line}\n" for line in (
+        "const _sample = _input0.length / _input1.length;",
+        f"const _first = Math.floor((_input1.length - 1) / {max_batch}) * {max_batch};",
+        f"const _rows = new Float32Array({rows} * _sample);",
+        "_rows.set(_input0);",
+        f"for (let _row = _input1.length; _row < {rows}; _row++) {{",
+        "    const _from = _first + (_row - _first) % (_input1.length - _first);",
+        "    _rows.copyWithin(_row * _sample, _from * _sample, (_from + 1) * _sample);",
+        "}",
+        "_input0 = _rows;",
+    ))
+
+
+def patch_runner_for_partial_batch(js, max_batch):
+    """Training runner: a step with fewer than max_batch labels pads them with
+    PAD_LABEL, so the loss ignores the rows the short batch did not fill,
+    and fills those rows with copies of its real ones (pad_rows_js — what
+    BatchNorm's batch statistics see). Applied after the weight-readback
+    patch; same fail-loud matching."""
+    signature = "    const _step = async (_input0,_input1) => {"
+    assert js.count(signature) == 1, f"partial-batch patch target not found exactly once: {signature!r}"
+    return js.replace(
+        signature,
+        f"{signature}\n"
+        f"        if (_input1.length < {max_batch}) {{\n"
+        f"{pad_rows_js(max_batch, max_batch, ' ' * 12)}"
+        f"            const _padded = new Int32Array({max_batch}).fill({PAD_LABEL});\n"
+        f"            _padded.set(_input1);\n"
+        f"            _input1 = _padded;\n"
+        f"        }}",
+    )
+
+
+def patch_runner_symbolic_batch(js, sample_size, max_batch):
+    """Eval runner traced with a symbolic `batch` variable (build_eval):
+    default the uploaded count from the input length, so callers keep
+    calling step(x), and return only the logits of the real rows. The
+    dispatch dimensions read the count as `_batch[0]` (dispatch_dim_js).
+    Raises ValueError when a UOp repr is left in the runner anyway, so
+    build_eval falls back to the fixed batch instead of emitting bad JS."""
+    if "UOp(" in js:
+        raise ValueError("symbolic-batch patch: a UOp repr is left in the emitted runner")
+    assert "_batch[0]" in js, "symbolic-batch patch: no dispatch dimension reads the batch"
+    signature = "    const _step = async (_input0,_batch) => {"
+    assert js.count(signature) == 1, f"symbolic-batch patch target not found exactly once: {signature!r}"
+    js = js.replace(signature,
+                    f"    const _step = async (_input0,_batch=Int32Array.of(_input0.length / {sample_size})) => {{")
+    result = "        return [resultBuffer0];\n    };"
+    assert js.count(result) == 1, f"symbolic-batch patch target not found exactly once: {result!r}"
+    return js.replace(
+        result,
+        f"        return [resultBuffer0.subarray(0, _batch[0] * resultBuffer0.length / {max_batch})];\n    }};")
+
+
+# One addComputePass(...) call of a runner's step, over as many lines as it spans.
+PASS_CALL = re.compile(
+    r"^ *addComputePass\(device, commandEncoder, (pipelines\[\d+\]), (layouts\[\d+\]), infinityBuf, "
+    r"(\[[^\]]*\]), (\[.*?\])\);$", flags=re.M | re.S)
+
+
+def patch_runner_bind_groups(js):
+    """addComputePass creates a bind group per kernel per step, although a
+    runner's buffers never change after setupNet — hundreds of allocations
+    per training step. Build them ALL once in setupNet (`bindGroups`, one
+    per pass, in step order) and encode each pass with its prebuilt group.
+    Returns (js, passes): passes is the bind groups per step this removed.
+    Applied after the weight-readback patch (it inserts before `weightBufs`);
+    workgroup sizes stay per-call, so the symbolic eval's `_batch[0]` keeps
+    working. Same fail-loud matching."""
+    helper = "const addComputePass = (device, commandEncoder, pipeline, layout, infinityUniformBuf, bufs, workgroup) => {"
+    assert js.count(helper) == 1, f"bind-group patch target not found exactly once: {helper!r}"
+    calls = PASS_CALL.findall(js)
+    assert calls, "bind-group patch: no addComputePass(...) calls in the emitted runner"
+    js = js.replace(
+        helper,
+        "const createBindGroup = (device, layout, infinityUniformBuf, bufs) => device.createBindGroup({\n"
+        "  layout: layout,\n"
+        "  entries: [\n"
+        "    { binding: 0, resource: { buffer: infinityUniformBuf } },\n"
+        "    ...bufs.map((buffer, index) => ({ binding: index + 1, resource: { buffer } }))\n"
+        "  ]\n"
+        "});\n\n"
+        "const encodeComputePass = (commandEncoder, pipeline, bindGroup, workgroup) => {\n"
+        "  const passEncoder = commandEncoder.beginComputePass();\n"
+        "  passEncoder.setPipeline(pipeline);\n"
+        "  passEncoder.setBindGroup(0, bindGroup);\n"
+        "  passEncoder.dispatchWorkgroups(...workgroup);\n"
+        "  passEncoder.end();\n"
+        "};\n\n"
+        f"{helper}")
+    groups = ",\n".join(f"        createBindGroup(device, {layout}, infinityBuf, {bufs})"
+                        for _pipeline, layout, bufs, _workgroup in calls)
+    anchor = "    const weightBufs = "
+    assert js.count(anchor) == 1, f"bind-group patch target not found exactly once: {anchor!r}"
+    js = js.replace(anchor, f"    const bindGroups = [\n{groups},\n    ];\n{anchor}")
+    index = iter(range(len(calls)))
+    js = PASS_CALL.sub(
+        lambda m: f"        encodeComputePass(commandEncoder, {m[1]}, bindGroups[{next(index)}], {m[4]});", js)
+    assert "addComputePass(device, commandEncoder" not in js, \
+        "bind-group patch: an addComputePass(...) call was left unrewritten"
+    return js, len(calls)
+
+
+def kernel_hashes(js):
+    """Stable content hash per pass of an emitted runner, in `kernels` order:
+    sha256 (first 16 hex digits) over the kernel's WGSL plus its bind group
+    layout descriptor — the two inputs of its compiled pipeline, so equal
+    hashes mean interchangeable pipelines, whatever name the trace gave the
+    kernel."""
+    listing = re.findall(r"^    const kernels = \[([^\]]*)\];$", js, flags=re.M)
+    assert len(listing) == 1, "kernel hashes: expected one `const kernels = [...]` line in the emitted runner"
+    names = listing[0].split(", ")
+    layouts = re.findall(r"^    const layouts=\[(.*)\]$", js, flags=re.M)
+    assert len(layouts) == 1, "kernel hashes: expected one `const layouts=[...]` line in the emitted runner"
+    descriptors = layouts[0].split("device.createBindGroupLayout(")[1:]
+    assert len(descriptors) == len(names), "kernel hashes: one bind group layout per kernel expected"
+    hashes = []
+    for name, descriptor in zip(names, descriptors):
+        sources = re.findall(rf"^const {re.escape(name)} = `(.*?)`;$", js, flags=re.M | re.S)
+        assert len(sources) == 1, f"kernel hashes: no WGSL source for {name}"
+        digest = hashlib.sha256(f"{sources[0]}\0{descriptor.rstrip(',)')}".encode("utf8"))
+        hashes.append(digest.hexdigest()[:16])
+    return hashes
+
+
+def patch_runner_pipeline_cache(js):
+    """setupNet(device, weights, pipelineCache?) — with a Map from kernel hash
+    (kernel_hashes) to {pipeline: Promise<GPUComputePipeline>, layout}, a
+    kernel whose hash is in the map reuses that pipeline and bind group
+    layout instead of compiling again, and new ones are added (as promises;
+    a failed compile is dropped again): a re-trace of an edited graph only
+    compiles the kernels that changed. `kernels` names a kernel once per pass,
+    so passes sharing a hash share one pipeline, with or without the cache.
+    `_step.pipelineStats` counts {compiled, reused} per distinct kernel.
+    Apply after patch_runner_bind_groups — the bind groups are created after
+    the pipelines, from the (possibly cached) layouts. Fail-loud."""
+    hashes = kernel_hashes(js)
+    compile_block = (
+        "    const pipelines = await Promise.all(kernels.map(async (name, i) => {\n"
+        "      return await device.createComputePipelineAsync({\n"
+        "          layout: device.createPipelineLayout({\n"
+        "              bindGroupLayouts: [layouts[i]],\n"
+        "          }),\n"
+        "          compute: {\n"
+        "              module: device.createShaderModule({\n"
+        "                  code: name,\n"
+        "              }),\n"
+        "              entryPoint: \"main\",\n"
+        "          },\n"
+        "      });\n"
+        "  }))\n")
+    assert js.count(compile_block) == 1, "pipeline-cache patch: pipeline compilation block not found exactly once"
+    js = js.replace(
+        compile_block,
+        f"    const kernelHashes = {json.dumps(hashes)};\n"
+        "    const pipelineStats = { compiled: 0, reused: 0 };\n"
+        "    const distinct = new Map(await Promise.all([...new Set(kernelHashes)].map(async (hash) => {\n"
+        "      const i = kernelHashes.indexOf(hash);\n"
+        "      const cached = pipelineCache?.get(hash);\n"
+        "      if (cached) {\n"
+        "        pipelineStats.reused += 1;\n"
+        "        return [hash, { pipeline: await cached.pipeline, layout: cached.layout }];\n"
+        "      }\n"
+        "      const pipeline = device.createComputePipelineAsync({\n"
+        "          layout: device.createPipelineLayout({\n"
+        "              bindGroupLayouts: [layouts[i]],\n"
+        "          }),\n"
+        "          compute: {\n"
+        "              module: device.createShaderModule({\n"
+        "                  code: kernels[i],\n"
+        "              }),\n"
+        "              entryPoint: \"main\",\n"
+        "          },\n"
+        "      });\n"
+        "      pipelineStats.compiled += 1;\n"
+        "      pipelineCache?.set(hash, { pipeline, layout: layouts[i] });\n"
+        "      pipeline.catch(() => pipelineCache?.delete(hash));\n"
+        "      return [hash, { pipeline: await pipeline, layout: layouts[i] }];\n"
+        "  })));\n"
+        "    const pipelines = kernelHashes.map((hash, i) => {\n"
+        "      layouts[i] = distinct.get(hash).layout;\n"
+        "      return distinct.get(hash).pipeline;\n"
+        "    });\n")
+    js, n = re.subn(r"const setupNet = async \(device, (\w+(?: = null)?)\) => \{",
+                    r"const setupNet = async (device, \1, pipelineCache = null) => {", js)
+    assert n == 1, "pipeline-cache patch: setupNet signature not found exactly once"
+    tail = "    _step.weightBufs = weightBufs;\n"
+    assert js.count(tail) == 1, f"pipeline-cache patch target not found exactly once: {tail!r}"
+    return js.replace(tail, f"{tail}    _step.pipelineStats = pipelineStats;\n")
+
+
+def patch_runner_single_pass(js):
+    """Optional, on top of patch_runner_bind_groups: the step's passes become
+    one prebuilt sequence of [pipeline, bindGroup, workgroup] (built once in
+    setupNet) encoded as ONE compute pass with a dispatch per kernel —
+    WebGPU makes each dispatch its own usage scope, so a kernel still sees
+    the previous one's writes. Static workgroups only (the training runners;
+    not the symbolic eval runner). Fail-loud."""
+    calls = re.findall(
+        r"^        encodeComputePass\(commandEncoder, (pipelines\[\d+\]), (bindGroups\[\d+\]), (\[[\d, ]+\])\);\n",
+        js, flags=re.M)
+    block = "".join(f"        encodeComputePass(commandEncoder, {pipeline}, {group}, {workgroup});\n"
+                    for pipeline, group, workgroup in calls)
+    assert calls and js.count(block) == 1, \
+        "single-pass patch: expected one contiguous run of static encodeComputePass(...) calls"
+    sequence = ",\n".join(f"        [{pipeline}, {group}, {workgroup}]" for pipeline, group, workgroup in calls)
+    js = js.replace(block, "        encodePassSequence(commandEncoder, passSequence);\n")
+    anchor = "    const weightBufs = "
+    js = js.replace(anchor, f"    const passSequence = [\n{sequence},\n    ];\n{anchor}")
+    helper = "const encodeComputePass = (commandEncoder, pipeline, bindGroup, workgroup) => {"
+    assert js.count(helper) == 1, f"single-pass patch target not found exactly once: {helper!r}"
+    return js.replace(
+        helper,
+        "const encodePassSequence = (commandEncoder, passSequence) => {\n"
+        "  const passEncoder = commandEncoder.beginComputePass();\n"
+        "  for (const [pipeline, bindGroup, workgroup] of passSequence) {\n"
+        "    passEncoder.setPipeline(pipeline);\n"
+        "    passEncoder.setBindGroup(0, bindGroup);\n"
+        "    passEncoder.dispatchWorkgroups(...workgroup);\n"
+        "  }\n"
+        "  passEncoder.end();\n"
+        "};\n\n"
+        f"{helper}")
+
+
+# ValueErrors that make build_eval fall back to a fixed-batch eval runner.
+SYMBOLIC_FALLBACK_REASONS = ("failed to be a single number", "cannot be rendered to JS", "UOp repr is left")
+
+
+def build_eval(model_cls, input_shape, max_batch=MAX_BATCH_SIZE, stream_weights=False):
+    """Trace the forward pass only and emit its runner: (js, symbolic). Its
+    weight buffers load from the SAME safetensors blob as the training runner
+    (the blob carries the model.* alias entries), and get the COPY flags so
+    current training weights can be copied in before each evaluation.
+    The batch is a symbolic variable bound at max_batch (one runner for any
+    count up to it, see patch_runner_symbolic_batch); a model whose forward
+    needs the batch as a number (a reshape to a literal batch, say), or
+    whose dispatch sizes dispatch_dim_js cannot render, falls back to the
+    batch baked at max_batch, and `fallback` says why (None for
+    the symbolic runner — callers of a fallback pass full batches). Any
+    other export failure propagates. stream_weights: see
+    patch_runner_for_weight_streaming. Returns (js, fallback)."""
+    sample_shape = [int(dim) for dim in input_shape]
+    sample_size = math.prod(sample_shape)
     ev = EvalWrap(model_cls())
     Tensor.realize(*get_parameters(ev))
-    x = Tensor.randn(BATCH_SIZE, *[int(dim) for dim in input_shape])
-    js, _inp, _out, _state = em.export_model(ev, "webgpu", x, model_name="evalstep")
-    return patch_runner_for_weight_readback(js)
+    try:
+        batch = Variable("batch", 1, max_batch).bind(max_batch)
+        x = Tensor.randn(max_batch, *sample_shape).realize()[:batch]
+        js, _inp, _out, _state = em.export_model(ev, "webgpu", x, model_name="evalstep",
+                                                 stream_weights=stream_weights)
+        js = patch_runner_for_weights(js, stream_weights)
+        js, _passes = patch_runner_bind_groups(patch_runner_symbolic_batch(js, sample_size, max_batch))
+        return patch_runner_pipeline_cache(js), None
+    except ValueError as error:
+        # UOp._eval: a symbolic value used as a concrete int/bool/float; or a
+        # dispatch size the runner cannot compute from the uploaded batch
+        if not any(reason in str(error) for reason in SYMBOLIC_FALLBACK_REASONS):
+            raise
+        fallback = f"{type(error).__name__}: {error}"
+        x = Tensor.randn(max_batch, *sample_shape)
+        js, _inp, _out, _state = em.export_model(ev, "webgpu", x, model_name="evalstep",
+                                                 stream_weights=stream_weights)
+        js, _passes = patch_runner_bind_groups(patch_runner_for_weights(js, stream_weights))
+        return patch_runner_pipeline_cache(js), fallback
+
+
+def strip_final_softmax(source):
+    """The generated source minus its final `.softmax()` (see load_model_class)
+    — also what the trace cache keys on, so a re-paste that differs only by
+    that call shares one trace."""
+    return re.sub(r"\.softmax\(\)(?=\s*\n(\s*return\b|$))", "", source, count=1)
 
 
 def load_model_class(source):
@@ -228,14 +925,106 @@ def load_model_class(source):
     log-softmaxes internally — training through a double softmax cripples the
     gradients, so the final softmax call is stripped, exactly like Keras
     folding softmax into categorical crossentropy."""
-    stripped = re.sub(r"\.softmax\(\)(?=\s*\n(\s*return\b|$))", "", source, count=1)
     namespace = {}
-    exec(stripped, namespace)  # noqa: S102 — the user pastes their own generated code
+    exec(strip_final_softmax(source), namespace)  # noqa: S102 — the user pastes their own generated code
     if "Model" not in namespace:
         raise ValueError("the pasted code does not define a `Model` class")
+    if not inspect.isclass(namespace["Model"]) or not callable(getattr(namespace["Model"], "__call__", None)):
+        raise ValueError("`Model` in the pasted code is not a class with a __call__ forward")
     return namespace["Model"]
 
 
+@contextlib.contextmanager
+def _preflight_shapes_only():
+    """For preflight() alone: Tensor.rand (which every random init goes
+    through: uniform, randn, kaiming_*, glorot_*) as an unfilled
+    Tensor.empty. Building the lazy threefry graph of a layer's init costs
+    ~10ms; preflight never reads the values, and the RNG counters stay where
+    a trace expects them. The real Tensor.rand is back when the block exits,
+    raising or not, before any trace can build a model."""
+    rand = Tensor.rand
+
+    def empty(*shape, device=None, dtype=None, contiguous=True):
+        return Tensor.empty(*shape, device=device, dtype=dtype or dtypes.default_float)
+
+    try:
+        Tensor.rand = staticmethod(empty)
+        yield
+    finally:
+        Tensor.rand = rand
+
+
+def preflight(model_cls, input_shape, num_classes=None, batch=2):
+    """Instantiate model_cls and run its forward on a lazy batch, without
+    realizing anything, in milliseconds: what a trace needs to not fail
+    seconds in. Raises ValueError when the forward does not run on
+    input_shape, outputs something other than (batch, num_classes) scores or
+    has nothing to train. Returns the trainable parameter count, the
+    per-sample output shape, the forward pass's kernel count (scheduled, not
+    compiled — a training step is roughly ten times that) and the time taken.
+    Only the trace paths call it, and only when they are about to trace: a
+    trace-cache hit never reaches it."""
+    with _preflight_shapes_only():
+        started = time.perf_counter()
+        shape = [int(dim) for dim in input_shape]
+        try:
+            model = model_cls()
+        except Exception as error:
+            raise ValueError(f"Model() fails: {type(error).__name__}: {error}") from error
+        state = get_parameters(model)
+        for tensor in state:  # buffers, as after the trace's realize, so kernels count the same
+            tensor.replace(Tensor.empty(*tensor.shape, dtype=tensor.dtype))
+        params = [tensor for tensor in state if tensor.is_param]
+        if not params:
+            raise ValueError("the model has no trainable parameters")
+        try:
+            out = model(Tensor.empty(batch, *shape))
+        except Exception as error:
+            raise ValueError(f"the forward pass fails on a {tuple(shape)} input: {type(error).__name__}: {error}") from error
+        if not isinstance(out, Tensor):
+            raise ValueError(f"the forward pass returns {type(out).__name__}, not a Tensor")
+        if len(out.shape) != 2 or out.shape[0] != batch or (num_classes is not None and out.shape[1] != int(num_classes)):
+            raise ValueError(f"the forward pass outputs {tuple(out.shape[1:])} per sample; "
+                             f"the loss needs ({num_classes if num_classes is not None else 'classes'},) class scores")
+        kernels = sum(1 for _ in em.iter_kernel_calls(out.schedule_linear()))
+        return {
+            "params": sum(int(tensor.numel()) for tensor in params),
+            "outputShape": [int(dim) for dim in out.shape[1:]],
+            "forwardKernels": kernels,
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+def layer_fingerprints(source, input_shape):
+    """[(name, fingerprint)] for the `self.<name> = ...` attributes of a Model
+    class source, in the order __call__ first uses them (attributes it never
+    calls come last, in __init__ order). Each __call__ line is hashed, with
+    the constructors of the attributes it calls, onto the previous line's
+    hash (seeded with the input shape and everything before `class Model:`);
+    a layer's fingerprint is the hash at its first use. Equal fingerprints
+    mean neither the layer nor anything before it in the forward pass
+    changed. Only a report (meta.layerReuse): the step is always traced
+    whole, and tinygrad's program cache is what skips unchanged kernels."""
+    preamble, _, body = source.partition("class Model")
+    init, _, forward = body.partition("def __call__")
+    constructors = {name: constructor.strip()
+                    for name, constructor in re.findall(r"^\s+self\.(\w+) = (.+)$", init, flags=re.M)}
+    fingerprint = hashlib.sha256(
+        json.dumps([preamble, [int(dim) for dim in input_shape]]).encode("utf8")).hexdigest()
+    fingerprints = {}
+    for line in filter(None, (line.strip() for line in forward.splitlines())):
+        called = [name for name in re.findall(r"\bself\.(\w+)", line) if name in constructors]
+        fingerprint = hashlib.sha256(
+            json.dumps([fingerprint, line, [constructors[name] for name in called]]).encode("utf8")).hexdigest()
+        for name in called:
+            fingerprints.setdefault(name, fingerprint[:16])
+    for name, constructor in constructors.items():
+        if name not in fingerprints:
+            fingerprint = hashlib.sha256(json.dumps([fingerprint, constructor]).encode("utf8")).hexdigest()
+            fingerprints[name] = fingerprint[:16]
+    return list(fingerprints.items())
+
+
 def patch_runner_optimize_io(js):
     """Second, OPTIONAL runner variant addressing the two I/O costs measured
     on immature WebGPU stacks (Firefox 2026-07): (1) inputs upload via
@@ -268,28 +1057,293 @@ def patch_runner_optimize_io(js):
     return js
 
 
+def patch_runner_multi_step(js, steps, max_batch):
+    """Fused variant of the optimize-io runner: one step() call takes up to
+    `steps` batches stacked along the batch axis and runs them as that many
+    SGD steps in ONE command encoder and ONE queue.submit — small models are
+    bound by per-step JS/encoder overhead, not by the kernels.
+    Both stacks upload with a single writeBuffer into staging buffers; each
+    step copies its slice into input0/input1, replays the traced passes and
+    copies its loss into a per-step readback slot, and the call resolves to
+    the MEAN loss (null with _readLoss false). The number of steps is ceil(labels / max_batch), so a
+    call with fewer batches (or a short last one, padded as in
+    patch_runner_for_partial_batch) runs on the same runner. Rewrites the
+    whole step function of a patch_runner_optimize_io output; fail-loud."""
+    head = "    const _step = async (_input0,_input1,_readLoss=true) => {\n"
+    tail = "        return [resultBuffer0];\n    };\n"
+    assert js.count(head) == 1 and js.count(tail) == 1, \
+        "multi-step patch: expected the optimize-io step function (patch_runner_optimize_io)"
+    start = js.index(head)
+    end = js.index(tail) + len(tail)
+    passes = re.findall(r"^ *encode(?:ComputePass|PassSequence)\(commandEncoder, .*\);$", js[start:end], flags=re.M)
+    assert passes, "multi-step patch: no encodeComputePass(...) calls in the step function"
+    body = "\n".join(f"            {line.strip()}" for line in passes)
+    fused = (
+        f"    const stagedInput0 = createEmptyBuf(device, input0.size * {steps});\n"
+        f"    const stagedInput1 = createEmptyBuf(device, input1.size * {steps});\n"
+        f"    const gpuReadBufferSteps = device.createBuffer({{size:output0.size * {steps},"
+        " usage: GPUBufferUsage.COPY_DST | GPUBufferUsage.MAP_READ });\n"
+        f"{head}"
+        f"        const _steps = Math.ceil(_input1.length / {max_batch});\n"
+        f"        if (_steps < 1 || _steps > {steps}) throw new Error(`step() takes 1 to {steps} batches"
+        f" of up to {max_batch} samples, got ${{_input1.length}} labels`);\n"
+        f"        if (_input1.length < _steps * {max_batch}) {{\n"
+        f"{pad_rows_js(f'_steps * {max_batch}', max_batch, ' ' * 12)}"
+        f"            const _padded = new Int32Array(_steps * {max_batch}).fill({PAD_LABEL});\n"
+        "            _padded.set(_input1);\n"
+        "            _input1 = _padded;\n"
+        "        }\n"
+        "        device.queue.writeBuffer(stagedInput0, 0, _input0);\n"
+        "        device.queue.writeBuffer(stagedInput1, 0, _input1);\n"
+        "        const commandEncoder = device.createCommandEncoder();\n"
+        "        for (let _k = 0; _k < _steps; _k++) {\n"
+        "            commandEncoder.copyBufferToBuffer(stagedInput0, _k * input0.size, input0, 0, input0.size);\n"
+        "            commandEncoder.copyBufferToBuffer(stagedInput1, _k * input1.size, input1, 0, input1.size);\n"
+        f"{body}\n"
+        "            if (_readLoss) commandEncoder.copyBufferToBuffer("
+        "output0, 0, gpuReadBufferSteps, _k * output0.size, output0.size);\n"
+        "        }\n"
+        "        device.queue.submit([commandEncoder.finish()]);\n"
+        "\n"
+        "        if (!_readLoss) return null;\n"
+        "        await gpuReadBufferSteps.mapAsync(GPUMapMode.READ);\n"
+        "        const losses = new Float32Array(gpuReadBufferSteps.getMappedRange(), 0, _steps * output0.size / 4);\n"
+        "        const resultBuffer0 = new Float32Array(output0.size / 4);\n"
+        "        losses.forEach((loss, i) => { resultBuffer0[i % resultBuffer0.length] += loss / _steps; });\n"
+        "        gpuReadBufferSteps.unmap();\n"
+        f"{tail}"
+    )
+    return js[:start] + fused + js[end:]
+
+
+def _file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+try:
+    TINYGRAD_VERSION = importlib.metadata.version("tinygrad")
+except importlib.metadata.PackageNotFoundError:  # a bare source checkout on PYTHONPATH
+    TINYGRAD_VERSION = "unknown"
+# The emitted runner is a function of the vendored exporter too: a re-vendor
+# (or a local patch) must never serve a runner traced by the previous one.
+EXPORT_MODEL_SHA256 = _file_sha256(em.__file__)
+# ...and of this file's runner patches, which rewrite the cached runners.
+DRIVER_SHA256 = _file_sha256(__file__)
+
+
+class TraceCache:
+    """Content-addressed LRU of finished traces: key (see trace_key) ->
+    {"js", "jsOpt", "evalJs", "meta", "recipe"}, evicted least-recently-used
+    first once the entries' JSON size exceeds `budget` bytes. The weights
+    blob is NOT stored — it is regenerated from the recipe (same seed, same
+    bytes). Lives for the worker's lifetime (the worker outlives trainings,
+    see ../runtime.ts); with a `directory` the entries are also written there
+    as <key>.json and survive the process (run_local, or a mounted FS)."""
+
+    def __init__(self, budget=TRACE_CACHE_BUDGET, directory=None):
+        self.budget = budget
+        self.directory = directory
+        self.entries = OrderedDict()  # key -> (entry, size in bytes)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            on_disk = [name for name in os.listdir(directory) if name.endswith(".json")]
+            # oldest first, so the LRU order survives a restart
+            for name in sorted(on_disk, key=lambda n: os.path.getmtime(os.path.join(directory, n))):
+                with open(os.path.join(directory, name), encoding="utf8") as f:
+                    self._insert(name[:-len(".json")], json.load(f))
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _insert(self, key, entry):
+        size = len(json.dumps(entry).encode("utf8"))
+        if size > self.budget:
+            return
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key)[1]
+        self.entries[key] = (entry, size)
+        self.bytes += size
+        while self.bytes > self.budget:
+            old_key, (_entry, old_size) = self.entries.popitem(last=False)
+            self.bytes -= old_size
+            if self.directory:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self._path(old_key))
+
+    def get(self, key):
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def put(self, key, entry):
+        self._insert(key, entry)
+        if self.directory and key in self.entries:
+            with open(self._path(key), "w", encoding="utf8") as f:
+                json.dump(entry, f)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries),
+                "bytes": self.bytes, "budget": self.budget}
+
+
+TRACE_CACHE = TraceCache()
+# (recipe, lr, momentum) of the last few stream_weights traces handed out, by
+# trace key (meta.weightsKey): the page instantiates the training runner
+# first, then fetches the tensors (streamed_tensors) once — the eval runner
+# copies its weights from the training runner — so a handful is enough.
+STREAMED_RECIPES = OrderedDict()
+STREAMED_RECIPES_MAX = 8
+# Kernel hashes of the runners handed out, least recently used first: what
+# the page's pipeline cache holds (runtime.ts keeps one per device, an LRU of
+# PIPELINE_CACHE_MAX_ENTRIES — keep the two bounds equal), hence meta.pipelines.
+KNOWN_KERNELS = OrderedDict()
+KNOWN_KERNELS_MAX = 1024
+# layer_fingerprints of the models traced so far, oldest first (meta.layerReuse).
+KNOWN_LAYERS = OrderedDict()
+KNOWN_LAYERS_MAX = 1024
+
+
+def trace_key(model_source, input_shape, num_classes, nesterov, max_batch=MAX_BATCH_SIZE,
+              stream_weights=False):
+    """sha256 over everything a trace depends on: the (softmax-stripped)
+    model source, the shapes, the optimizer's STRUCTURE (nesterov — lr and
+    momentum are runtime state, see RuntimeSGD), and the exact tinygrad,
+    export_model.py and driver.py that produced the runner."""
+    fields = {
+        "source": strip_final_softmax(model_source) if model_source else None,
+        "inputShape": [int(dim) for dim in input_shape],
+        "numClasses": int(num_classes),
+        "nesterov": bool(nesterov),
+        "maxBatchSize": int(max_batch),
+        "streamWeights": bool(stream_weights),
+        "tinygrad": TINYGRAD_VERSION,
+        "exportModel": EXPORT_MODEL_SHA256,
+        "driver": DRIVER_SHA256,
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf8")).hexdigest()
+
+
 def build_both(model_source=None, input_shape=(28, 28), num_classes=10,
-               lr=LEARNING_RATE, momentum=0.9, nesterov=False):
+               lr=LEARNING_RATE, momentum=0.9, nesterov=False, cache=TRACE_CACHE,
+               max_batch=MAX_BATCH_SIZE, stream_weights=False, fused_steps=1, single_pass=False):
     """(legacy_js, optimized_js, weights, meta, eval_js) from the traces —
     the training trace is the expensive part; both training-runner variants
-    are post-processing, and the eval trace (forward only) is cheap."""
-    js, weights, meta = build(model_source, input_shape, num_classes,
-                              lr=lr, momentum=momentum, nesterov=nesterov)
-    model_cls = load_model_class(model_source) if model_source else Model
-    eval_js = build_eval(model_cls, input_shape)
-    return js, patch_runner_optimize_io(js), weights, meta, eval_js
+    are post-processing, and the eval trace (forward only) is cheap.
+    fused_steps > 1 makes optimized_js the patch_runner_multi_step variant
+    (up to that many batches per call; also post-processing, so it shares
+    the cache entry), and single_pass encodes both training runners' kernels
+    as one compute pass (patch_runner_single_pass).
+    Traces are looked up in `cache` first (None disables it); meta.traceCache
+    carries whether this call hit plus the cache's running counters.
+    stream_weights builds no blob (weights is None): the tensors come from
+    streamed_tensors(meta["weightsKey"]), one at a time."""
+    key = trace_key(model_source, input_shape, num_classes, nesterov, max_batch, stream_weights)
+    entry = cache.get(key) if cache is not None else None
+    hit = entry is not None
+    if not hit:
+        model_cls = load_model_class(model_source) if model_source else Model
+        checked = preflight(model_cls, input_shape, num_classes)  # fail in ms, not deep in the export
+        js, recipe, meta = trace(model_source, input_shape, num_classes,
+                                 lr=lr, momentum=momentum, nesterov=nesterov, max_batch=max_batch,
+                                 stream_weights=stream_weights)
+        eval_js, fallback = build_eval(model_cls, input_shape, max_batch, stream_weights)
+        meta["evalSymbolicBatch"] = fallback is None
+        if fallback is not None:
+            meta["evalFallback"] = fallback
+        entry = {"js": js, "jsOpt": patch_runner_optimize_io(js), "evalJs": eval_js,
+                 "meta": meta, "recipe": recipe}
+        if cache is not None:
+            cache.put(key, entry)
+    # The cached meta may come from a trace with other lr/momentum values.
+    meta = dict(entry["meta"], learningRate=lr, momentum=momentum, fusedSteps=fused_steps)
+    if stream_weights:  # no blob: the page fetches the tensors one by one
+        weights = None
+        STREAMED_RECIPES[key] = (entry["recipe"], lr, momentum)
+        STREAMED_RECIPES.move_to_end(key)
+        while len(STREAMED_RECIPES) > STREAMED_RECIPES_MAX:
+            STREAMED_RECIPES.popitem(last=False)
+        meta["weightsKey"] = key
+    else:
+        weights = build_safetensors(entry["recipe"], lr=lr, momentum=momentum)
+    if hit:  # nothing was traced, every layer's kernels came from the cache
+        meta["layerReuse"] = [dict(layer, reused=True) for layer in meta["layerReuse"]]
+        meta["programsCompiled"] = 0
+    else:  # kept out of the cached meta: a hit runs no preflight
+        meta["preflight"] = checked
+    js, js_opt = entry["js"], entry["jsOpt"]
+    if single_pass:
+        js, js_opt = patch_runner_single_pass(js), patch_runner_single_pass(js_opt)
+        meta["computePassesPerStep"] = 1
+    if fused_steps > 1:
+        js_opt = patch_runner_multi_step(js_opt, fused_steps, max_batch)
+    if cache is not None:
+        meta["traceCache"] = {"key": key, "hit": hit, **cache.stats()}
+    hashes = set(kernel_hashes(entry["js"])) | set(kernel_hashes(entry["evalJs"]))
+    reused = sum(1 for kernel in hashes if kernel in KNOWN_KERNELS)
+    meta["pipelines"] = {"new": len(hashes) - reused, "reused": reused}
+    for kernel in hashes:
+        KNOWN_KERNELS[kernel] = True
+        KNOWN_KERNELS.move_to_end(kernel)
+    while len(KNOWN_KERNELS) > KNOWN_KERNELS_MAX:
+        KNOWN_KERNELS.popitem(last=False)
+    return js, js_opt, weights, meta, entry["evalJs"]
+
+
+def streamed_tensors(weights_key):
+    """iter_tensors of a stream_weights build_both call, by its
+    meta["weightsKey"] — the worker's `weights` request."""
+    if weights_key not in STREAMED_RECIPES:
+        raise ValueError(f"no stream_weights trace with key {weights_key!r} (traced too long ago?)")
+    recipe, lr, momentum = STREAMED_RECIPES[weights_key]
+    return iter_tensors(recipe, lr=lr, momentum=momentum)
 
 
 def build(model_source=None, input_shape=(28, 28), num_classes=10,
-          lr=LEARNING_RATE, momentum=0.9, nesterov=False):
+          lr=LEARNING_RATE, momentum=0.9, nesterov=False, max_batch=MAX_BATCH_SIZE,
+          stream_weights=False):
+    """(js, weights, meta) for the training runner alone — an uncached
+    trace() plus its safetensors blob. Nothing is cached, so every call
+    traces and runs the preflight first."""
     model_cls = load_model_class(model_source) if model_source else Model
+    checked = preflight(model_cls, input_shape, num_classes)
+    js, recipe, meta = trace(model_source, input_shape, num_classes, lr=lr, momentum=momentum,
+                             nesterov=nesterov, max_batch=max_batch, stream_weights=stream_weights)
+    return js, build_safetensors(recipe, lr=lr, momentum=momentum), dict(meta, preflight=checked)
+
+
+def trace(model_source=None, input_shape=(28, 28), num_classes=10,
+          lr=LEARNING_RATE, momentum=0.9, nesterov=False, max_batch=MAX_BATCH_SIZE,
+          stream_weights=False):
+    """Trace the training step: (patched js, weights_recipe, meta).
+    The batch is traced at max_batch, NOT symbolically: tinygrad 0.13's
+    gradient pass cannot reduce over a symbolic dimension (it evaluates
+    `batch != 1`), so short batches are label-padded instead
+    (patch_runner_for_partial_batch). stream_weights exports a runner that
+    allocates its weight buffers and takes the bytes tensor by tensor
+    (patch_runner_for_weight_streaming)."""
+    model_cls = load_model_class(model_source) if model_source else Model
+    layers = layer_fingerprints(strip_final_softmax(model_source) if model_source else inspect.getsource(Model),
+                                input_shape)
+    COMPILE_LOG.report()  # drop whatever an earlier export left
     step = TrainStep(model_cls, lr=lr, momentum=momentum, nesterov=nesterov)
     Tensor.realize(*get_parameters(step))  # materialize BEFORE capture, or init fuses into kernels
-    x = Tensor.randn(BATCH_SIZE, *[int(dim) for dim in input_shape])
-    y = Tensor.randint(BATCH_SIZE, low=0, high=int(num_classes))
-    js, inp_sizes, out_sizes, state = em.export_model(step, "webgpu", x, y, model_name="trainstep")
-    js = patch_runner_for_weight_readback(js)
-    weights = build_safetensors(state, lr=lr)
+    x = Tensor.randn(max_batch, *[int(dim) for dim in input_shape])
+    y = Tensor.randint(max_batch, low=0, high=int(num_classes))
+    js, inp_sizes, out_sizes, state = em.export_model(step, "webgpu", x, y, model_name="trainstep",
+                                                      stream_weights=stream_weights)
+    compile_stats = COMPILE_LOG.report()
+    memory = compile_stats.pop("memory")
+    js = patch_runner_for_partial_batch(patch_runner_for_weights(js, stream_weights), max_batch)
+    js, passes = patch_runner_bind_groups(js)
+    js = patch_runner_pipeline_cache(js)
+    recipe = weights_recipe(state)
     canonical, aliases = {}, {}
     for name, tensor in state.items():  # model.* names come first, so they win
         if id(tensor) in canonical:
@@ -297,10 +1351,15 @@ def build(model_source=None, input_shape=(28, 28), num_classes=10,
         else:
             canonical[id(tensor)] = name
     meta = {
-        "batchSize": BATCH_SIZE,
+        # the traced (= maximum) batch; any count up to it runs on this trace
+        "batchSize": max_batch,
+        "maxBatchSize": max_batch,
+        "padLabel": PAD_LABEL,
+        "streamWeights": bool(stream_weights),
         "inputShape": [int(dim) for dim in input_shape],
         "numClasses": int(num_classes),
         "learningRate": lr,
+        "momentum": momentum,
         "inputSizes": {k: list(v) if isinstance(v, (list, tuple)) else v for k, v in inp_sizes.items()},
         "outputSizes": {k: list(v) if isinstance(v, (list, tuple)) else v for k, v in out_sizes.items()},
         "stateEntries": list(state.keys()),
@@ -313,5 +1372,28 @@ def build(model_source=None, input_shape=(28, 28), num_classes=10,
         # runner exposes them as weight buffers under these model.* names.
         "bnStats": [name for name in state
                     if name.endswith(".running_mean") or name.endswith(".running_var")],
+        # the weights blob stores each aliased tensor once (build_safetensors)
+        "weights": weights_footprint(recipe),
+        # createBindGroup calls per training step: addComputePass made one
+        # per pass; patch_runner_bind_groups builds them all in setupNet
+        "bindGroupsPerStep": {"before": passes, "after": 0},
+        "computePassesPerStep": passes,
+        # per pass, in `kernels` order; the page's pipeline cache keys
+        "kernelHashes": kernel_hashes(js),
+        # reuse report: layers unchanged (with everything before them in the
+        # forward pass) since an earlier trace, and the kernel programs this
+        # trace had to generate — tinygrad caches them per AST, so an edit
+        # near the tail only generates the kernels it actually changed
+        "layerReuse": [{"name": name, "reused": fingerprint in KNOWN_LAYERS} for name, fingerprint in layers],
+        "programsCompiled": compile_stats["calls"] - compile_stats["cacheHits"],
+        # the training export's to_program calls (_timed_to_program)
+        "compile": compile_stats,
+        # intermediate buffers sharing pooled GPU buffers (pool_buffers)
+        "memory": memory,
     }
-    return js, weights, meta
+    for _name, fingerprint in layers:
+        KNOWN_LAYERS[fingerprint] = True
+        KNOWN_LAYERS.move_to_end(fingerprint)
+    while len(KNOWN_LAYERS) > KNOWN_LAYERS_MAX:
+        KNOWN_LAYERS.popitem(last=False)
+    return js, recipe, meta
@@ -1,9 +1,10 @@
 # Local (plain CPython) validation of driver.py against the SAME tinygrad
 # wheel Pyodide will micropip-install. Usage:
 #   PYTHONPATH=/path/to/unpacked-tinygrad-wheel python3 run_local.py [out-prefix]
-# The optional prefix dumps the emitted (patched) runner and the weights blob
-# as <prefix>.js / <prefix>.safetensors, so check_runner.ts can smoke-test
-# them under bun against a fake WebGPU device:
+# The optional prefix dumps the emitted (patched) runners and the weights blob
+# as <prefix>.js / .opt.js / .eval.js / .conv.eval.js / .stream.js / .fused.js /
+# .single.js / .safetensors, so check_runner.ts can smoke-test them under bun against a
+# fake WebGPU device:
 #   bun check_runner.ts <prefix>
 import os
 
@@ -16,10 +17,14 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 import json  # noqa: E402
 import struct  # noqa: E402
+import time  # noqa: E402
+import tracemalloc  # noqa: E402
 
 import driver  # noqa: E402
 
+started = time.perf_counter()
 js, js_opt, weights, meta, eval_js = driver.build_both()
+traced_in = time.perf_counter() - started
 print("meta:", json.dumps(meta, indent=2))
 print("js bytes:", len(js))
 print("eval js bytes:", len(eval_js))
@@ -50,17 +55,305 @@ for name in param_names:
         f"weightBufs map is missing {name}"
 assert set(meta["stateShapes"]) == set(header), "meta.stateShapes out of sync with the state dict"
 
+# The safetensors writer stores aliased tensors once, 8-byte aligned:
+for alias, canonical in meta["aliases"].items():
+    assert header[alias]["data_offsets"] == header[canonical]["data_offsets"], \
+        f"{alias} is stored separately from {canonical}"
+assert (8 + header_len) % 8 == 0 and all(info["data_offsets"][0] % 8 == 0 for info in header.values()), \
+    "safetensors data is not 8-byte aligned"
+assert len(weights) == 8 + header_len + meta["weights"]["storedBytes"], "meta.weights out of sync with the blob"
+
 # The optimize-io variant (patch_runner_optimize_io):
 assert js_opt.count("device.queue.writeBuffer(input") == 2, "optimized runner must upload both inputs via writeBuffer"
 assert "gpuWriteBuffer0.mapAsync" not in js_opt, "optimized runner still maps the input staging buffer"
 assert "_readLoss=true" in js_opt and "if (!_readLoss) return null;" in js_opt, "optimized runner lacks the _readLoss flag"
 
+# Batches below the traced maximum: the training step pads its labels with
+# PAD_LABEL, the eval step runs on a symbolic batch (driver.build_eval).
+assert meta["maxBatchSize"] == driver.MAX_BATCH_SIZE, "meta does not report the max batch"
+assert f".fill({driver.PAD_LABEL})" in js and f".fill({driver.PAD_LABEL})" in js_opt, \
+    "training runner does not pad short batches"
+assert meta["evalSymbolicBatch"], "the default model's eval runner did not trace symbolically"
+assert "UOp(" not in eval_js and "_batch[0]" in eval_js, "eval runner kept an unrendered symbolic dimension"
+assert "_rows.copyWithin(" in js and "_rows.copyWithin(" in js_opt, "short batches are not padded with real rows"
+# A forward that needs the batch as a number falls back to a fixed-batch eval
+# runner, and says why; anything else an export raises is not swallowed.
+RESHAPE_MODEL = """from tinygrad import Tensor, nn
+
+
+class Model:
+  def __init__(self):
+    self.dense_1 = nn.Linear(784, 10)
+
+  def __call__(self, x):
+    return self.dense_1(x.reshape(32, 784))
+"""
+fixed_eval_js, fallback = driver.build_eval(driver.load_model_class(RESHAPE_MODEL), (28, 28))
+assert fallback and "single number" in fallback and "_batch[0]" not in fixed_eval_js, fallback
+# A conv forward's dispatch sizes are expressions of the batch (batch * 104
+# workgroups, say), not the bare variable: they render to JS as a whole
+# (driver.dispatch_dim_js), and the runner stays symbolic and parses.
+CONV_MODEL = """from tinygrad import Tensor, nn
+
+
+class Model:
+  def __init__(self):
+    self.conv2d_1 = nn.Conv2d(1, 8, 3)
+    self.dense_1 = nn.Linear(8 * 13 * 13, 10)
+
+  def __call__(self, x):
+    x = self.conv2d_1(x).relu()
+    x = x.max_pool2d(2)
+    x = x.flatten(1)
+    return self.dense_1(x).softmax()
+"""
+_js, _js_opt, _weights, conv_meta, conv_eval_js = driver.build_both(CONV_MODEL, (1, 28, 28), 10)
+assert conv_meta["evalSymbolicBatch"], conv_meta.get("evalFallback")
+assert "UOp(" not in conv_eval_js and "(_batch[0] * " in conv_eval_js, "conv eval runner kept a UOp repr"
+assert "addComputePass(device, commandEncoder" not in conv_eval_js, "conv eval runner kept a per-step bind group"
+try:
+    driver.dispatch_dim_js(driver.Variable("batch", 1, 32).cast(driver.dtypes.float))
+except ValueError as error:
+    assert "cannot be rendered to JS" in str(error), error
+else:
+    raise AssertionError("a float dispatch dimension was rendered")
+# patch_runner_bind_groups rewrites a call however many lines it spans.
+PASS_HELPER = "const addComputePass = (device, commandEncoder, pipeline, layout, infinityUniformBuf, bufs, workgroup) => {"
+split_js, split_passes = driver.patch_runner_bind_groups(
+    f"{PASS_HELPER}\n}};\n    const weightBufs = {{}};\n"
+    "        addComputePass(device, commandEncoder, pipelines[0], layouts[0], infinityBuf, [buf_0,\n"
+    "          buf_1], [4,\n          1, 1]);\n")
+assert split_passes == 1 and "addComputePass(device, commandEncoder" not in split_js \
+    and "createBindGroup(device, layouts[0], infinityBuf, [buf_0,\n          buf_1])" in split_js, split_js
+
+# The trace cache (driver.TraceCache): the same request again must be a hit
+# that returns the identical runners and weights without re-tracing.
+assert meta["traceCache"]["hit"] is False, "first build_both call should miss the trace cache"
+started = time.perf_counter()
+again = driver.build_both()
+cached_in = time.perf_counter() - started
+assert again[3]["traceCache"]["hit"] is True, "identical request did not hit the trace cache"
+assert again[:3] == (js, js_opt, weights) and again[4] == eval_js, "cache hit returned different output"
+print(f"trace: {traced_in:.2f}s, cache hit: {cached_in * 1000:.1f}ms"
+      f" ({again[3]['traceCache']['bytes']} bytes cached)")
+
+# lr and momentum are runtime state (driver.RuntimeSGD): another value must
+# reuse the trace, only the opt.lr / opt.momentum scalars change.
+_js, _js_opt, swept, swept_meta, _eval_js = driver.build_both(lr=0.05, momentum=0.5)
+assert swept_meta["traceCache"]["hit"] is True, "an lr/momentum change re-traced"
+assert _js == js, "an lr/momentum change produced a different runner"
+assert "opt.momentum" in header, "momentum is not a state tensor of the trace"
+assert swept_meta["learningRate"] == 0.05 and swept_meta["momentum"] == 0.5, "meta kept the cached hyperparameters"
+swept_header_len = struct.unpack("<Q", swept[:8])[0]
+swept_header = json.loads(swept[8:8 + swept_header_len])
+for name, want in (("opt.lr", 0.05), ("opt.momentum", 0.5)):
+    start, _end = swept_header[name]["data_offsets"]
+    got = struct.unpack("<f", swept[8 + swept_header_len + start:8 + swept_header_len + start + 4])[0]
+    assert abs(got - want) < 1e-7, f"{name} = {got}, expected {want}"
+assert "_step.setLearningRate = " in js and "_step.setMomentum = " in js, "runner lacks the hyperparameter setters"
+assert "_step.setLearningRate" not in eval_js, "the eval runner has no optimizer to set"
+
+# The fused runner (driver.patch_runner_multi_step): same cache entry, the
+# traced passes replayed per stacked batch inside one encoder and one submit.
+_js, js_fused, _weights, fused_meta, _eval_js = driver.build_both(fused_steps=4)
+assert fused_meta["traceCache"]["hit"] is True and fused_meta["fusedSteps"] == 4, "the fused variant re-traced"
+assert js_fused.count("device.queue.submit(") == 1 and "for (let _k = 0; _k < _steps; _k++)" in js_fused, \
+    "fused runner does not encode its steps into one submit"
+assert js_fused.count("encodeComputePass(commandEncoder,") == js_opt.count("encodeComputePass(commandEncoder,"), \
+    "fused runner lost or duplicated kernel passes"
+
+# Bind groups (driver.patch_runner_bind_groups): built once in setupNet, none
+# per step; single_pass additionally encodes the kernels as one compute pass.
+for runner in (js, js_opt, js_fused, eval_js):
+    assert "addComputePass(device, commandEncoder," not in runner, "a runner still creates bind groups per step"
+assert js.count("createBindGroup(device, layouts[") == meta["bindGroupsPerStep"]["before"] >= meta["kernels"], \
+    "expected one prebuilt bind group per kernel pass"
+print(f"bind groups per step: {meta['bindGroupsPerStep']['before']} -> {meta['bindGroupsPerStep']['after']}")
+_js, js_single, _weights, single_meta, _eval_js = driver.build_both(fused_steps=4, single_pass=True)
+assert single_meta["traceCache"]["hit"] is True and single_meta["computePassesPerStep"] == 1, \
+    "the single-pass variant re-traced or miscounts its passes"
+assert "encodeComputePass(commandEncoder," not in js_single and \
+    js_single.count("encodePassSequence(commandEncoder, passSequence);") == 1, "fused single-pass runner not rewritten"
+
+# Pipeline reuse across traces (driver.kernel_hashes): a model edited only in
+# its tail re-traces, but the kernels of its untouched layers hash the same,
+# so the page's pipeline cache compiles just the new ones.
+DEEP_MODEL = """from tinygrad import Tensor, nn
+
+
+class Model:
+  def __init__(self):
+    self.dense_1 = nn.Linear(784, 96)
+    self.dense_2 = nn.Linear(96, 48)
+    self.dense_3 = nn.Linear(48, {width})
+
+  def __call__(self, x):
+    x = x.flatten(1)
+    x = self.dense_1(x).relu()
+    x = self.dense_2(x).relu()
+    x = self.dense_3(x).softmax()
+    return x
+"""
+started = time.perf_counter()
+_js, _js_opt, _weights, deep_meta, _eval_js = driver.build_both(DEEP_MODEL.format(width=10))
+deep_in = time.perf_counter() - started
+started = time.perf_counter()
+_js, _js_opt, _weights, edited_meta, _eval_js = driver.build_both(DEEP_MODEL.format(width=12), num_classes=12)
+edited_in = time.perf_counter() - started
+assert edited_meta["traceCache"]["hit"] is False and edited_meta["pipelines"]["reused"] > 0, \
+    "an edit of the last layer reused no kernel"
+print(f"pipelines after editing the last layer: {edited_meta['pipelines']['new']} new,"
+      f" {edited_meta['pipelines']['reused']} reused (first trace: {deep_meta['pipelines']['new']} new)")
+# ...and the re-trace reports it (driver.layer_fingerprints): the two
+# untouched layers are reused and fewer kernel programs are generated.
+assert [s["reused"] for s in deep_meta["layerReuse"]] == [False, False, False], "a fresh model reported reused layers"
+assert [s["reused"] for s in edited_meta["layerReuse"]] == [True, True, False], \
+    f"expected dense_1/dense_2 reused after editing dense_3, got {edited_meta['layerReuse']}"
+assert edited_meta["programsCompiled"] < deep_meta["programsCompiled"], "the tail edit regenerated every kernel"
+print(f"tail edit: {deep_in:.2f}s -> {edited_in:.2f}s, kernel programs generated"
+      f" {deep_meta['programsCompiled']} -> {edited_meta['programsCompiled']},"
+      f" reused layers: {[s['name'] for s in edited_meta['layerReuse'] if s['reused']]}")
+# The report follows the forward pass, not __init__: declared in reverse, the
+# layers still come out dense_1 first, and a line added between two layers
+# changes every layer after it.
+reversed_init = DEEP_MODEL.replace(
+    "    self.dense_1 = nn.Linear(784, 96)\n    self.dense_2 = nn.Linear(96, 48)\n    self.dense_3 = nn.Linear(48, {width})",
+    "    self.dense_3 = nn.Linear(48, {width})\n    self.dense_2 = nn.Linear(96, 48)\n    self.dense_1 = nn.Linear(784, 96)")
+assert reversed_init != DEEP_MODEL, "reordering the layers of DEEP_MODEL matched nothing"
+ordered = driver.layer_fingerprints(reversed_init.format(width=10), (28, 28))
+assert [name for name, _fingerprint in ordered] == ["dense_1", "dense_2", "dense_3"], ordered
+edited = driver.layer_fingerprints(reversed_init.format(width=10).replace(
+    "    x = self.dense_2(", "    x = x * 2\n    x = self.dense_2("), (28, 28))
+assert [a == b for (_name, a), (_, b) in zip(ordered, edited)] == [True, False, False], \
+    "an edit between layers did not change the layers after it"
+# ...as meta.compile details (driver._timed_to_program): every kernel CALL of
+# the export, which ones tinygrad's AST cache answered, and their render time.
+first, edited = deep_meta["compile"], edited_meta["compile"]
+assert len(edited["perKernel"]) == edited["calls"] and edited["cacheHits"] > first["cacheHits"], \
+    "meta.compile does not show the reused kernels as cache hits"
+print(f"to_program: {first['calls']} calls, {first['cacheHits']} cached, {first['renderMs']:.0f}ms ->"
+      f" {edited['cacheHits']} cached, {edited['renderMs']:.0f}ms"
+      f" (duplicate function bodies dropped: {edited['functionsDeduplicated']})")
+# Buffer pooling (driver.pool_buffers): replaying two steps of the export's
+# statements, every kernel argument a kernel reads must see the same write
+# (step, statement, argument) with the pools as with a buffer per name.
+pool_runs = []
+pool_buffers = driver.pool_buffers
+
+
+def recording_pool_buffers(statements, bufs, poolable, kernel_outs):
+    pooled = pool_buffers(statements, bufs, poolable, kernel_outs)
+    pool_runs.append((statements, pooled[0], kernel_outs))
+    return pooled
+
+
+def replay(statements, kernel_outs):
+    written, seen = {}, []
+    for step in range(2):
+        for i, (function_name, args, _global_size, _local_size) in enumerate(statements):
+            outs, ins = kernel_outs[function_name]
+            seen += [written.get(args[j], ("init", args[j])) for j in ins]
+            written.update((args[j], (step, i, j)) for j in outs)
+    return seen
+
+
+driver.pool_buffers = recording_pool_buffers
+_js, _recipe, pooled_meta = driver.trace(DEEP_MODEL.format(width=10))
+driver.build_eval(driver.load_model_class(DEEP_MODEL.format(width=10)), (28, 28))
+driver.pool_buffers = pool_buffers
+assert len(pool_runs) == 2, "expected the training and eval exports to pool their buffers"
+for statements, pooled, kernel_outs in pool_runs:
+    assert replay(statements, kernel_outs) == replay(pooled, kernel_outs), "pooling changed what a kernel reads"
+memory = pooled_meta["memory"]
+assert memory["bytesAfter"] < memory["bytesBefore"], "no intermediate buffer shared a pool"
+# A pool holds one dtype: a float buffer and an int buffer never share one,
+# even when their lives do not overlap.
+_statements, typed_bufs, _summary = pool_buffers(
+    [("k", ["f", "out"], [1], [1]), ("k", ["i", "out"], [1], [1])],
+    {"f": (64, driver.dtypes.float32, "f"), "i": (64, driver.dtypes.int32, "i"), "out": (4, driver.dtypes.float32, "out")},
+    {"f", "i"}, {"k": ([0], [1])})
+assert sorted(dtype for name, (_size, dtype, _key) in typed_bufs.items() if name.startswith("pool_")) \
+    == sorted([driver.dtypes.float32, driver.dtypes.int32]), f"pools mixed dtypes: {typed_bufs}"
+print(f"intermediate buffers: {memory['buffers']} -> {memory['pools']} pools,"
+      f" {memory['bytesBefore']} -> {memory['bytesAfter']} bytes")
+
+# Pre-flight (driver.preflight): a shape-only forward answers in milliseconds
+# what a trace would only find out seconds in, and leaves the RNG alone.
+counters = dict(driver.Tensor._device_rng_counters)
+checked = driver.preflight(driver.load_model_class(DEEP_MODEL.format(width=10)), (28, 28), 10)
+assert checked["params"] == 784 * 96 + 96 + 96 * 48 + 48 + 48 * 10 + 10, checked
+assert checked["outputShape"] == [10] and checked["forwardKernels"] > 0, checked
+assert deep_meta["preflight"]["params"] == checked["params"], "trace meta lacks the preflight"
+assert "preflight" not in again[3], "a trace-cache hit reports a preflight it did not run"
+for source, num_classes, message in ((DEEP_MODEL.format(width=10).replace("784", "100"), 10, "forward pass fails"),
+                                     (DEEP_MODEL.format(width=10), 12, "class scores"),
+                                     ("Model = 3", 10, "not a class")):
+    started = time.perf_counter()
+    try:
+        driver.build_both(source, (28, 28), num_classes)
+    except ValueError as error:
+        assert message in str(error), error
+    else:
+        raise AssertionError(f"preflight accepted a broken model ({message})")
+    assert time.perf_counter() - started < 1.0, "preflight took as long as a trace"
+assert dict(driver.Tensor._device_rng_counters) == counters, "preflight advanced the RNG"
+print(f"preflight: {checked['ms']}ms vs {deep_in:.2f}s to trace"
+      f" ({checked['params']} params, {checked['forwardKernels']} forward kernels)")
+assert "pipelineCache?.get(hash)" in js and "pipelineCache?.get(hash)" in eval_js, \
+    "runners do not take a pipeline cache"
+
+# Weight streaming (driver.patch_runner_for_weight_streaming): the same trace
+# exported with stream_weights=True allocates its weight buffers and takes the
+# bytes tensor by tensor; its own cache entry, no blob, the same tensor bytes.
+stream_js, _js_opt, stream_weights, stream_meta, stream_eval_js = driver.build_both(stream_weights=True)
+assert stream_meta["streamWeights"] and not meta["streamWeights"], "meta does not report the export mode"
+assert stream_meta["traceCache"]["hit"] is False, "the streaming export shared the mapped export's cache entry"
+assert stream_weights is None and stream_meta["weightsKey"], "the streaming export built a weights blob"
+streamed = list(driver.streamed_tensors(stream_meta["weightsKey"]))
+assert sorted(name for names, _data in streamed for name in names) == sorted(header), \
+    "the streamed tensors do not cover the state dict"
+for names, data in streamed:
+    for name in names:
+        start, end = header[name]["data_offsets"]
+        assert data == weights[8 + header_len + start:8 + header_len + end], f"{name} streamed different bytes"
+for runner in (stream_js, stream_eval_js):
+    assert "mappedAtCreation" not in runner.split("const setupNet")[1], "streaming runner still maps weight buffers"
+    assert "GPUBufferUsage.STORAGE | GPUBufferUsage.COPY_SRC | GPUBufferUsage.COPY_DST }" in runner, \
+        "streamed weight buffers did not get COPY_SRC + COPY_DST"
+    assert "_step.uploadTensor = " in runner and "if (weights) _step.uploadWeights(weights);" in runner, \
+        "streaming runner lacks the upload methods"
+# Peak Python heap while the worker makes the weights (tracemalloc): the
+# whole blob, against one tensor at a time for a streamed trace.
+recipe = driver.STREAMED_RECIPES[stream_meta["weightsKey"]][0]
+tracemalloc.start()
+blob = driver.build_safetensors(recipe)
+blob_peak = tracemalloc.get_traced_memory()[1]
+del blob
+tracemalloc.reset_peak()
+for _names, _data in driver.iter_tensors(recipe):
+    pass
+streamed_peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+assert streamed_peak < blob_peak, "streaming the tensors held as much as the blob"
+print(f"weights peak heap in the worker: blob {blob_peak} bytes, streamed {streamed_peak} bytes")
+
 if len(sys.argv) > 1:
     with open(f"{sys.argv[1]}.js", "w") as f:
         f.write(js)
     with open(f"{sys.argv[1]}.opt.js", "w") as f:
         f.write(js_opt)
+    with open(f"{sys.argv[1]}.eval.js", "w") as f:
+        f.write(eval_js)
+    with open(f"{sys.argv[1]}.conv.eval.js", "w") as f:
+        f.write(conv_eval_js)
+    with open(f"{sys.argv[1]}.stream.js", "w") as f:
+        f.write(stream_js)
+    with open(f"{sys.argv[1]}.fused.js", "w") as f:
+        f.write(js_fused)
+    with open(f"{sys.argv[1]}.single.js", "w") as f:
+        f.write(js_single)
     with open(f"{sys.argv[1]}.safetensors", "wb") as f:
         f.write(weights)
-    print(f"patched runners (+ .opt.js) + weights written to {sys.argv[1]}.*")
+    print(f"patched runners (+ .opt.js, .eval.js, .conv.eval.js, .stream.js, .fused.js, .single.js)"
+          f" + weights written to {sys.argv[1]}.*")
 print("OK — driver output is valid against this tinygrad")
@@ -9,7 +9,9 @@
  * injected worker factory (createTinygradRuntime({ createWorker })).
  */
 
-import type { TraceRequest, TraceResult, WorkerRequest, WorkerResponse } from './protocol';
+import type {
+  StreamedTensor, TraceRequest, TraceResult, WorkerRequest, WorkerResponse,
+} from './protocol';
 
 /** The worker surface the runtime drives: the real Worker, or a test fake. */
 export interface RuntimeWorker {
@@ -21,6 +23,8 @@ export interface RuntimeWorker {
 interface PendingEntry {
   resolve: (result: TraceResult | undefined) => void;
   reject: (error: Error) => void;
+  /** A 'weights' request's tensor messages, as they arrive. */
+  onTensor?: (tensor: StreamedTensor) => void;
 }
 
 export interface TraceHandle {
@@ -33,7 +37,7 @@ export function createTinygradRuntime(
 ) {
   let worker: RuntimeWorker | null = null;
   let nextId = 1;
-  let initPromise: Promise<TraceResult | undefined> | null = null;
+  let initPromise: Promise<unknown> | null = null;
   const pending = new Map<number, PendingEntry>(); // id -> { resolve, reject }
 
   const makeWorker = createWorker
@@ -53,6 +57,15 @@ export function createTinygradRuntime(
         const response = event.data;
         const entry = pending.get(response.id);
         if (!entry) return; // cancelled (or unknown) — drop it
+        if ('tensor' in response) {
+          try {
+            entry.onTensor!(response.tensor);
+          } catch (error) { // the rest of the stream is dropped
+            pending.delete(response.id);
+            entry.reject(error as Error);
+          }
+          return;
+        }
         pending.delete(response.id);
         if (response.ok) entry.resolve(response.result);
         else entry.reject(new Error(response.error));
@@ -64,9 +77,11 @@ export function createTinygradRuntime(
     return worker;
   };
 
-  const post = (request: WorkerRequest) => new Promise<TraceResult | undefined>(
+  const post = (
+    request: WorkerRequest, onTensor?: (tensor: StreamedTensor) => void,
+  ) => new Promise<TraceResult | undefined>(
     (resolve, reject) => {
-      pending.set(request.id, { resolve, reject });
+      pending.set(request.id, { resolve, reject, onTensor });
       ensureWorker().postMessage(request);
     },
   );
@@ -107,6 +122,15 @@ export function createTinygradRuntime(
         },
       };
     },
+    /**
+     * The initial tensors of a streamWeights trace (its meta.weightsKey), one
+     * onTensor call each — e.g. uploadStreamedTensor into the runner — so
+     * neither side ever holds the whole safetensors blob.
+     */
+    async streamWeights(weightsKey: string, onTensor: (tensor: StreamedTensor) => void): Promise<void> {
+      await this.init();
+      await post({ id: nextId++, type: 'weights', weightsKey }, onTensor);
+    },
   };
 }
 
@@ -148,26 +172,118 @@ export function acquireWebGpuDevice(): Promise<GPUDevice> {
  * The emitted runner's step function (mod.default.setupNet's resolution):
  * the training runner takes (x, y, readLoss?) and the eval runner just (x),
  * both resolving to the output arrays, with `weightBufs` patched on
- * (driver.patch_runner_for_weight_readback).
+ * (driver.patch_runner_for_weight_readback). The training runner also gets
+ * the hyperparameter setters (queue writes into opt.lr / opt.momentum, taking
+ * effect from the next step). Runners exported with streamWeights also take
+ * their weights after setupNet: uploadTensor(name, bytes) writes one
+ * weightBufs entry, uploadWeights(blob) every entry of a safetensors blob.
  */
 export interface RunnerStep {
   (x: Float32Array, y?: Int32Array, readLoss?: boolean): Promise<Float32Array[]>;
   weightBufs: Record<string, GPUBuffer>;
+  setLearningRate?(value: number): void;
+  setMomentum?(value: number): void;
+  uploadTensor?(name: string, bytes: Uint8Array | Float32Array): void;
+  uploadWeights?(blob: Uint8Array): void;
+  /** How many of this runner's kernels compiled vs came from the pipeline cache. */
+  pipelineStats?: { compiled: number; reused: number };
+}
+
+/** A compiled kernel, keyed by its content hash (driver.kernel_hashes). */
+export interface CachedPipeline {
+  pipeline: Promise<GPUComputePipeline>;
+  layout: GPUBindGroupLayout;
+}
+
+// Kernels a device's pipeline cache keeps: a few traces' worth (a training
+// plus eval runner is tens to a few hundred kernels). Past it the least
+// recently used go; a runner holds its own pipelines, so an evicted kernel
+// only costs the NEXT runner that needs it a compile.
+export const PIPELINE_CACHE_MAX_ENTRIES = 1024;
+
+/**
+ * The pipelineCache the emitted runners take (driver.patch_runner_pipeline_cache
+ * calls get/set/delete): a Map bounded to `maxEntries`, least recently used
+ * evicted first — every re-trace of an editing session adds kernels.
+ */
+export class PipelineCache {
+  readonly maxEntries: number;
+
+  private readonly entries = new Map<string, CachedPipeline>(); // oldest use first
+
+  constructor(maxEntries = PIPELINE_CACHE_MAX_ENTRIES) {
+    this.maxEntries = maxEntries;
+  }
+
+  get size(): number {
+    return this.entries.size;
+  }
+
+  get(hash: string): CachedPipeline | undefined {
+    const entry = this.entries.get(hash);
+    if (entry) {
+      this.entries.delete(hash);
+      this.entries.set(hash, entry);
+    }
+    return entry;
+  }
+
+  set(hash: string, entry: CachedPipeline): this {
+    this.entries.delete(hash);
+    this.entries.set(hash, entry);
+    for (const oldest of this.entries.keys()) {
+      if (this.entries.size <= this.maxEntries) break;
+      this.entries.delete(oldest);
+    }
+    return this;
+  }
+
+  delete(hash: string): boolean {
+    return this.entries.delete(hash);
+  }
+}
+
+// One pipeline cache per device (pipelines are device objects): every runner
+// instantiated on it reuses the kernels earlier traces already compiled.
+const pipelineCaches = new WeakMap<GPUDevice, PipelineCache>();
+
+export function pipelineCacheFor(device: GPUDevice): PipelineCache {
+  let cache = pipelineCaches.get(device);
+  if (!cache) {
+    cache = new PipelineCache();
+    pipelineCaches.set(device, cache);
+  }
+  return cache;
 }
 
 /**
  * Import the emitted runner ES module (a string of JS) and set up the net on
  * the device: resolves to the step function, with step.weightBufs exposing
- * {stateName: GPUBuffer} (driver.patch_runner_for_weight_readback).
+ * {stateName: GPUBuffer} (driver.patch_runner_for_weight_readback). Kernels
+ * already compiled on this device by an earlier runner are reused
+ * (driver.patch_runner_pipeline_cache). `weights` is null for a streamWeights
+ * runner whose tensors arrive afterwards (uploadStreamedTensor).
  */
 export async function instantiateRunner(
-  runnerJs: string, device: GPUDevice, weights: Uint8Array,
+  runnerJs: string, device: GPUDevice, weights: Uint8Array | null,
 ): Promise<RunnerStep> {
   const url = URL.createObjectURL(new Blob([runnerJs], { type: 'text/javascript' }));
   try {
     const mod = await import(/* @vite-ignore */ url);
-    return await mod.default.setupNet(device, weights);
+    return await mod.default.setupNet(device, weights, pipelineCacheFor(device));
   } finally {
     URL.revokeObjectURL(url);
   }
 }
+
+/**
+ * Write one streamed tensor into the runner's weight buffer, under whichever
+ * of its names the runner holds it by; a tensor the runner has no buffer for
+ * is skipped.
+ */
+export function uploadStreamedTensor(step: RunnerStep, tensor: StreamedTensor): void {
+  const name = tensor.names.find(candidate => candidate in step.weightBufs);
+  if (name === undefined) return;
+  if (!step.uploadTensor) throw new Error('this runner was not exported with streamWeights');
+  step.uploadTensor(name, tensor.bytes);
+}
@@ -68,16 +68,39 @@ function ensurePyodide(): Promise<PyodideApi> {
   return pyodidePromise;
 }
 
+let numpyPromise: Promise<void> | null = null;
+
+/**
+ * numpy is optional, so it is not part of the boot: driver.build_safetensors
+ * vectorizes the weight init with it (same bytes without it, ~7x slower),
+ * and only a trace builds weights. Loaded with the first trace; a failed
+ * download leaves that trace on the pure-Python path and the next one retries.
+ */
+function ensureNumpy(pyodide: PyodideApi): Promise<void> {
+  if (!numpyPromise) {
+    numpyPromise = pyodide.loadPackage(['numpy']).then(
+      () => undefined,
+      () => { numpyPromise = null; },
+    );
+  }
+  return numpyPromise;
+}
+
 async function trace(
   message: Extract<WorkerRequest, { type: 'trace' }>,
 ): Promise<TraceResult> {
   const pyodide = await ensurePyodide();
+  await ensureNumpy(pyodide);
   pyodide.globals.set('model_source', message.modelSource);
   pyodide.globals.set('input_shape_json', JSON.stringify(message.inputShape));
   pyodide.globals.set('num_classes', message.numClasses);
   pyodide.globals.set('learning_rate', message.learningRate);
   pyodide.globals.set('momentum', message.momentum);
   pyodide.globals.set('nesterov', message.nesterov);
+  pyodide.globals.set('max_batch', message.maxBatchSize ?? null);
+  pyodide.globals.set('stream_weights', message.streamWeights ?? false);
+  pyodide.globals.set('fused_steps', message.fusedSteps ?? 1);
+  pyodide.globals.set('single_pass', message.singlePass ?? false);
   // build_both post-processes ONE trace into both runner variants; only the
   // optimized one (writeBuffer uploads + skippable loss readback) ships back.
   const result = await pyodide.runPythonAsync([
@@ -89,17 +112,48 @@ async function trace(
     '    lr=learning_rate,',
     '    momentum=momentum,',
     '    nesterov=nesterov,',
+    '    max_batch=driver.MAX_BATCH_SIZE if max_batch is None else max_batch,',
+    '    stream_weights=stream_weights,',
+    '    fused_steps=fused_steps,',
+    '    single_pass=single_pass,',
     ')',
     '{"js": _js_opt, "evalJs": _eval_js, "weights": _weights, "meta": json.dumps(_meta)}',
   ].join('\n'));
   const runnerJs: string = result.get('js');
   const evalJs: string = result.get('evalJs');
-  const weights: Uint8Array = result.get('weights').toJs(); // Uint8Array
+  // None for a streamWeights trace: its tensors come with a 'weights' request.
+  const weightsProxy = result.get('weights');
+  const weights: Uint8Array | null = weightsProxy ? weightsProxy.toJs() : null;
   const meta: TraceMeta = JSON.parse(result.get('meta'));
   result.destroy();
   return { runnerJs, evalJs, weights, meta };
 }
 
+/**
+ * Answer a 'weights' request: one `tensor` message per stored tensor of a
+ * streamWeights trace (driver.streamed_tensors), its bytes transferred, and
+ * only that tensor in hand at a time — no safetensors blob on either side.
+ */
+async function streamWeights(message: Extract<WorkerRequest, { type: 'weights' }>): Promise<void> {
+  const pyodide = await ensurePyodide();
+  await ensureNumpy(pyodide);
+  pyodide.globals.set('weights_key', message.weightsKey);
+  await pyodide.runPythonAsync('_tensors = driver.streamed_tensors(weights_key)');
+  const next = () => pyodide.runPythonAsync(
+    '_tensor = next(_tensors, None)\n_tensor and {"names": _tensor[0], "bytes": _tensor[1]}',
+  );
+  try {
+    for (let tensor = await next(); tensor; tensor = await next()) { // eslint-disable-line no-await-in-loop
+      const names: string[] = tensor.get('names').toJs();
+      const bytes: Uint8Array = tensor.get('bytes').toJs();
+      tensor.destroy();
+      self.postMessage({ id: message.id, tensor: { names, bytes } }, [bytes.buffer]);
+    }
+  } finally {
+    await pyodide.runPythonAsync('_tensors = _tensor = None');
+  }
+}
+
 // Trace ids cancelled while their Python was running: the result is dropped
 // instead of posted (Python itself cannot be interrupted mid-exec).
 const cancelled = new Set<number>();
@@ -119,7 +173,12 @@ self.onmessage = async (event) => {
     if (message.type === 'trace') {
       const result = await trace(message);
       if (cancelled.delete(message.id)) return;
-      self.postMessage({ id: message.id, ok: true, result }, [result.weights.buffer]);
+      self.postMessage({ id: message.id, ok: true, result }, result.weights ? [result.weights.buffer] : []);
+      return;
+    }
+    if (message.type === 'weights') {
+      await streamWeights(message);
+      self.postMessage({ id: message.id, ok: true });
       return;
     }
     throw new Error(`unknown message type "${(message as WorkerRequest).type}"`);
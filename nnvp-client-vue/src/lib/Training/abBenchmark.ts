@@ -14,11 +14,9 @@ import type { KerasLayerJSON, NnvpLayer, NnvpModel } from '../../types/model';
 // eslint-disable-next-line @typescript-eslint/no-explicit-any
 type Tf = any;
 
-// Both engines slice ~this many samples per epoch (their TRAIN_DATA_SIZE);
-// the samples/sec math mirrors it: tfjs consumes the full 500-sample slice
-// per epoch, the tinygrad engine floor(500 / its traced batch of 32) batches.
+// Both engines train on this many samples per epoch (their TRAIN_DATA_SIZE);
+// the tinygrad engine's last, short batch is padded by its runner.
 export const ENGINE_EPOCH_SLICE = 500;
-export const TINYGRAD_TRACE_BATCH = 32;
 
 /**
  * Deterministic synthetic dataset shaped like the current board model.
@@ -151,10 +149,7 @@ export function datasetCompatible(
 }
 
 /** Samples each engine actually processes for a given number of epochs. */
-export function samplesProcessed(engineId: string, epochs: number): number {
-  if (engineId === 'tinygrad') {
-    return Math.floor(ENGINE_EPOCH_SLICE / TINYGRAD_TRACE_BATCH) * TINYGRAD_TRACE_BATCH * epochs;
-  }
+export function samplesProcessed(_engineId: string, epochs: number): number {
   return ENGINE_EPOCH_SLICE * epochs;
 }
 
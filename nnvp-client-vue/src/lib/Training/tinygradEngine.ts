@@ -27,21 +27,29 @@ import type {
 } from './engine';
 import { TrainingPrepareError } from './engine';
 import {
-  acquireWebGpuDevice, getSharedRuntime, instantiateRunner,
+  acquireWebGpuDevice, getSharedRuntime, instantiateRunner, uploadStreamedTensor,
 } from '../TinygradRuntime/runtime';
-import type { RunnerStep } from '../TinygradRuntime/runtime';
+import type { RunnerStep, TinygradRuntime } from '../TinygradRuntime/runtime';
 import { snapshotWeightBufs, syncWeightBufs, writeWeightBuf } from '../TinygradRuntime/weightIO';
+import KerasGenerator from '../KerasInterface/KerasGenerator';
 import type { TraceMeta, TraceResult } from '../TinygradRuntime/protocol';
 import type { NnvpLayer, NnvpModel } from '../../types/model';
 
-// Mirror the tfjs engine's historical demo-trainer slice: ~500 train samples
-// per epoch (fit consumes floor(500 / meta.batchSize) batches per epoch),
-// and — like tfjs re-fitting its one fixed slice — every epoch of a fit
-// trains the SAME window, so cross-engine loss curves see the same data.
+// Mirror the tfjs engine's historical demo-trainer slice: 500 train samples
+// per epoch (ceil(500 / meta.batchSize) steps, the last one short), and —
+// like tfjs re-fitting its one fixed slice — every epoch of a fit trains the
+// SAME window, so cross-engine loss curves see the same data.
 const TRAIN_DATA_SIZE = 500;
 // Sync the loss every N-th step only; the other steps skip the readback fence.
 const LOSS_READBACK_EVERY = 10;
 
+// The batch every training step is traced at: prepare() sends it as
+// TraceRequest.maxBatchSize, and graphTrainingBytes sizes activations by it.
+export const TRACE_BATCH_SIZE = 32;
+// The most device memory prepare() lets one training step need
+// (graphTrainingBytes) before it refuses to trace.
+export const TRACE_MEMORY_MAX_BYTES = 1024 * 1024 * 1024;
+
 const SUPPORTED_LOSSES = ['categoricalCrossentropy', 'sparseCategoricalCrossentropy'];
 const SGD_PARAMS = ['learningRate', 'momentum', 'nesterov'];
 
@@ -113,6 +121,18 @@ export function graphNumClasses(graph: NnvpModel): number {
   throw unsupported('a graph whose Output is not fed by a Dense layer (num_classes)');
 }
 
+/**
+ * Lower bound on the device memory one traced training step needs, from the
+ * catalog cost estimate (layerCost.ts): weights, gradients and momentum per
+ * parameter, plus every activation and its gradient at the traced batch.
+ * Layers the estimate leaves out add nothing, so this never over-refuses.
+ * The generator takes the layers' kerasLayer over: pass a fresh parse.
+ */
+export function graphTrainingBytes(graph: NnvpModel): number {
+  const cost = new KerasGenerator(graph).estimateCostFromGraph();
+  return 3 * 4 * cost.params + 2 * TRACE_BATCH_SIZE * cost.activationBytes;
+}
+
 // --- Session -----------------------------------------------------------------
 
 interface TinygradSessionInit {
@@ -144,21 +164,26 @@ function createSession({ device, step, meta, graphJson, epochs, makeEvalStep }:
       if (!trainImages || !trainLabels || !pixels) {
         throw new Error('the tinygrad engine needs a dataset with raw trainImages/trainLabels arrays');
       }
-      const totalBatches = Math.floor(trainImages.length / pixels / batchSize);
-      if (totalBatches < 1) throw new Error('the dataset is smaller than one training batch');
-      const perEpoch = Math.min(Math.max(1, Math.floor(TRAIN_DATA_SIZE / batchSize)), totalBatches);
+      const samples = Math.min(Math.floor(trainImages.length / pixels), trainLabels.length, TRAIN_DATA_SIZE);
+      if (samples < 1) throw new Error('the dataset has no training samples');
+      // A short last batch goes through step() as is: the runner pads it
+      // (driver.patch_runner_for_partial_batch), so no sample is dropped.
+      const perEpoch = Math.ceil(samples / batchSize);
       let lastLoss = NaN;
       const yInt = new Int32Array(batchSize);
       for (let epoch = 0; epoch < epochs; epoch += 1) {
         for (let batch = 0; batch < perEpoch; batch += 1) {
           if (stopRequested) return;
-          const at = batch; // same fixed window every epoch (mirrors tfjs's slice)
-          const x = trainImages.subarray(at * batchSize * pixels, (at + 1) * batchSize * pixels);
-          for (let i = 0; i < batchSize; i += 1) yInt[i] = trainLabels[at * batchSize + i]!;
+          // Same fixed window every epoch (mirrors tfjs's slice).
+          const start = batch * batchSize;
+          const rows = Math.min(batchSize, samples - start);
+          const x = trainImages.subarray(start * pixels, (start + rows) * pixels);
+          const y = rows === batchSize ? yInt : yInt.subarray(0, rows);
+          for (let i = 0; i < rows; i += 1) y[i] = trainLabels[start + i]!;
           const readLoss = batch === 0
             || batch % LOSS_READBACK_EVERY === LOSS_READBACK_EVERY - 1
             || batch === perEpoch - 1;
-          const out = await step(x, yInt, readLoss); // eslint-disable-line no-await-in-loop
+          const out = await step(x, y, readLoss); // eslint-disable-line no-await-in-loop
           if (readLoss) {
             lastLoss = out[0]![0]!;
             // Callbacks may throw to cancel (watchTraining's stop path) —
@@ -214,10 +239,17 @@ function createSession({ device, step, meta, graphJson, epochs, makeEvalStep }:
 
 // --- Engine --------------------------------------------------------------------
 
+/** The slice of the runtime the engine drives (tests inject a fake). */
+export type EngineRuntime = Pick<TinygradRuntime, 'init' | 'trace' | 'streamWeights'>;
+
 export function createTinygradEngine({
   runtime = getSharedRuntime(),
   requestDevice = acquireWebGpuDevice,
   instantiate = instantiateRunner,
+}: {
+  runtime?: EngineRuntime;
+  requestDevice?: () => Promise<GPUDevice>;
+  instantiate?: typeof instantiateRunner;
 } = {}): TrainingEngine {
   return {
     capabilities,
@@ -267,22 +299,36 @@ export function createTinygradEngine({
       }
       inputShape = graphInputShape(graph); // unsupported/incomplete graphs throw their clear errors
       numClasses = graphNumClasses(graph);
+      // Refused before the backend boot and the trace, not minutes into them.
+      const trainingBytes = graphTrainingBytes(JSON.parse(graphJson!));
+      if (trainingBytes > TRACE_MEMORY_MAX_BYTES) {
+        const mb = (bytes: number): string => `${Math.round(bytes / (1024 * 1024))} MB`;
+        throw new Error(`this model needs at least ${mb(trainingBytes)} per training step, over the tinygrad `
+          + `engine's ${mb(TRACE_MEMORY_MAX_BYTES)} limit`);
+      }
 
       // Backend boot (Pyodide + wheel): untagged, like the tfjs loadTf stage.
       await runtime.init();
       let traced: TraceResult;
       try {
+        // streamWeights: no safetensors blob is built or posted; each runner
+        // takes the initial tensors one at a time right after setupNet.
         traced = await runtime.trace({
           modelSource: generatedCode, inputShape, numClasses, learningRate, momentum, nesterov,
+          maxBatchSize: TRACE_BATCH_SIZE, streamWeights: true,
         }).promise;
       }
       catch (error) {
         throw new TrainingPrepareError('build', error, generatedCode);
       }
       const device = await requestDevice();
-      const step: RunnerStep = await instantiate(traced.runnerJs, device, traced.weights);
-      // The eval runner shares the safetensors blob (it loads the model.*
-      // alias entries) and is only instantiated when evaluateLogits is used.
+      const step = await instantiate(traced.runnerJs, device, traced.weights);
+      const { weightsKey } = traced.meta;
+      if (weightsKey) await runtime.streamWeights(weightsKey, tensor => uploadStreamedTensor(step, tensor));
+      // The eval runner is only instantiated when evaluateLogits is used, and
+      // is NOT streamed: the worker keeps a bounded number of recipes, so this
+      // trace's may be gone by then. evaluateLogits copies every one of its
+      // weights from the training runner (syncWeightBufs) before each call.
       const makeEvalStep = traced.evalJs
         ? (): Promise<RunnerStep> => instantiate(traced.evalJs, device, traced.weights)
         : null;
@@ -45,9 +45,50 @@ export interface KerasLayerJSON {
 
 // --- Layer catalog (generatedKerasLayers.json) --------------------------------
 
+/**
+ * How a layer maps its input shape(s) to its output shape, introspected from
+ * Keras by scripts/generate_keras_layers_json.py (infer_shape_rule, which also
+ * documents each kind) and evaluated by KerasInterface/shapeRules.ts. Shapes
+ * exclude the batch axis and are channels-last; parameter-dependent kinds name
+ * the constructor parameter they read. `ranks`: the input ranks, among the
+ * probed 1-4, the layer accepts.
+ */
+export type ShapeRule = { ranks?: number[] } & (
+  | { kind: 'identity' | 'flatten' | 'elementwise' | 'unknown' }
+  | { kind: 'lastAxis' | 'appendAxis' | 'recurrent' | 'repeat' | 'reshape' | 'permute' | 'concat'; param: string }
+  | {
+    kind: 'window'; spatial: number; kernel: string;
+    channels?: string; multiplier?: string; transposed?: boolean;
+  }
+  | { kind: 'global'; spatial: number }
+  | { kind: 'upsample'; spatial: number; param: string }
+  | { kind: 'pad'; spatial: number; param: string; sign: 1 | -1 }
+  | { kind: 'resize'; height: string; width: string }
+  | { kind: 'table'; table: Record<string, number[]> }
+);
+
+/**
+ * How expensive a layer is — parameter count, forward FLOPs and activation
+ * bytes as a function of its input/output shapes and parameters — as
+ * introspected by scripts/generate_keras_layers_json.py (infer_cost, which
+ * also documents each kind) and evaluated by KerasInterface/layerCost.ts.
+ */
+export type LayerCostRule =
+  | { kind: 'reduce' | 'merge' | 'activation' | 'free' | 'perElement' | 'unknown' }
+  | { kind: 'dense'; param: string }
+  | { kind: 'conv'; spatial: number; kernel: string; channels: string; transposed?: boolean }
+  | { kind: 'depthwise'; spatial: number; kernel: string; multiplier: string }
+  | { kind: 'separable'; spatial: number; kernel: string; multiplier: string; channels: string }
+  | { kind: 'embedding'; input: string; output: string }
+  | { kind: 'recurrent'; param: string; gates: number; resetAfter?: string }
+  | { kind: 'perChannel'; fixed: number; flags: string[] }
+  | { kind: 'pool'; spatial: number; kernel: string };
+
 /**
  * One layer's entry in generatedKerasLayers.json. `input`/`output` are
- * doc-style shape hints (e.g. { shape: "Arbitrary" }), NOT ParameterDefs.
+ * doc-style shape hints (e.g. { shape: "Arbitrary" }), NOT ParameterDefs;
+ * `shapeRule` is the machine-readable version, when Keras could be probed,
+ * and `cost` comes with it.
  */
 export interface KerasLayerCatalogEntry {
   category: string;
@@ -55,6 +96,8 @@ export interface KerasLayerCatalogEntry {
   parameters: Record<string, ParameterDef>;
   input?: { shape: string | string[] };
   output?: { shape: string | string[] };
+  shapeRule?: ShapeRule;
+  cost?: LayerCostRule;
 }
 
 /**
@@ -15,7 +15,9 @@ const CDN_DIR = 'https://datasets.nnvp.io/datasets/';
 
 // Collect every fully-qualified URL a dataset config references.
 function urlsForDataset(config: AnyDatasetSourceConfig): string[] {
-  if (config.kind === 'text') return [config.textPath];
+  if (config.kind === 'text') {
+    return [config.textPath, config.tokensPath, config.shardsPath, config.windowsPath].filter((url): url is string => !!url);
+  }
   const urls: string[] = [];
   if (Array.isArray(config.imagesSpritePath)) {
     for (const entry of config.imagesSpritePath) {
@@ -28,6 +28,8 @@ import './kerasImport';
 import './KerasGenerator';
 import './KerasGeneratorPyTorch';
 import './KerasGeneratorTinygrad';
+import './shapeRules';
+import './layerCost';
 import './assistantActions';
 import './flowGraphEditor';
 import './autoLayout';
@@ -0,0 +1,107 @@
+/**
+ * Catalog cost rules (layerCost.ts): parameter counts against what Keras
+ * counts for the same layers, and the per-sample totals over a whole graph.
+ */
+import { logicTest } from '../harness/define';
+import KerasGenerator from '../../src/lib/KerasInterface/KerasGenerator';
+import { applyCostRule, costRuleOf, describeCost } from '../../src/lib/KerasInterface/layerCost';
+import { shapeRuleParams } from '../../src/lib/KerasInterface/shapeRules';
+import type {
+  NnvpLayer, NnvpLayerId, NnvpModel, ParameterValue,
+} from '../../src/types/model';
+
+// The catalog cost of `name`, parameters over the catalog defaults.
+function cost(name: string, shapes: number[][], out: number[], params: Record<string, ParameterValue> = {}) {
+  const rule = costRuleOf(name);
+  if (!rule) throw new Error(`no cost rule for ${name}`);
+  return applyCostRule(rule, shapes, out, shapeRuleParams(name, params));
+}
+
+// Minimal board layer (only the fields the generator reads).
+function leaf(id: NnvpLayerId, name: string, params: Record<string, ParameterValue>,
+  inputLayers: NnvpLayerId[], outputLayers: NnvpLayerId[]): NnvpLayer {
+  return {
+    id,
+    x: 0,
+    y: 0,
+    name,
+    inputLayers,
+    outputLayers,
+    children: null,
+    kerasLayer: {
+      name, category: 'test', parameterValues: params, parameterDef: {},
+    },
+  } as unknown as NnvpLayer;
+}
+
+logicTest('layerCost: parameter counts match Keras count_params()', ({ expect }) => {
+  expect(cost('Dense', [[784]], [128], { units: 128 })!.params).toBe(100480);
+  expect(cost('Dense', [[784]], [128], { units: 128, use_bias: false })!.params).toBe(100352);
+  expect(cost('Conv2D', [[28, 28, 1]], [26, 26, 16], { filters: 16, kernel_size: 3 })!.params).toBe(160);
+  expect(cost('DepthwiseConv2D', [[12, 10, 8]], [10, 8, 16], { kernel_size: 3, depth_multiplier: 2 })!.params)
+    .toBe(160);
+  expect(cost('LSTM', [[12, 10]], [5], { units: 5 })!.params).toBe(320);
+  // GRU defaults to reset_after=True: a second recurrent bias per gate.
+  expect(cost('GRU', [[12, 10]], [5], { units: 5 })!.params).toBe(255);
+  expect(cost('GRU', [[12, 10]], [5], { units: 5, reset_after: false })!.params).toBe(240);
+  expect(cost('Embedding', [[12]], [12, 6], { input_dim: 20, output_dim: 6 })!.params).toBe(120);
+  // Moving mean/variance plus gamma and beta, per channel.
+  expect(cost('BatchNormalization', [[12, 10]], [12, 10])!.params).toBe(40);
+  expect(cost('BatchNormalization', [[12, 10]], [12, 10], { center: false })!.params).toBe(30);
+});
+
+logicTest('layerCost: FLOPs and activation bytes follow the shapes', ({ expect }) => {
+  expect(cost('Conv2D', [[28, 28, 1]], [26, 26, 16], { filters: 16, kernel_size: 3 })).toEqual({
+    params: 160, flops: 2 * 9 * 26 * 26 * 16, activationBytes: 4 * 26 * 26 * 16,
+  });
+  expect(cost('MaxPooling2D', [[26, 26, 16]], [13, 13, 16])).toEqual({
+    params: 0, flops: 4 * 13 * 13 * 16, activationBytes: 4 * 13 * 13 * 16,
+  });
+  expect(cost('Add', [[10], [10], [10]], [10])!.flops).toBe(20);
+  expect(cost('Flatten', [[13, 13, 16]], [2704])!.flops).toBe(0);
+  // Recurrent layers keep every step's gate activations too.
+  expect(cost('SimpleRNN', [[12, 10]], [5], { units: 5 })!.activationBytes).toBe(4 * 5 + 4 * 12 * 5);
+  expect(cost('Dense', [[784]], [128], {})).toBeNull();
+});
+
+logicTest('layerCost: estimates a whole graph per sample', ({ expect }) => {
+  // Input [28,28,1] -> Conv2D(16, 3) -> MaxPooling2D -> Flatten -> Dense(10) -> Output
+  const json = {
+    inputs: ['1'],
+    outputs: ['6'],
+    layers: [
+      leaf('1', 'Input', { shape: [28, 28, 1] }, [], ['2']),
+      leaf('2', 'Conv2D', { filters: 16, kernel_size: [3, 3] }, ['1'], ['3']),
+      leaf('3', 'MaxPooling2D', {}, ['2'], ['4']),
+      leaf('4', 'Flatten', {}, ['3'], ['5']),
+      leaf('5', 'Dense', { units: 10 }, ['4'], ['6']),
+      leaf('6', 'Output', {}, ['5'], []),
+    ],
+  } as unknown as NnvpModel;
+  const estimate = new KerasGenerator(json).estimateCostFromGraph();
+  // Flatten is a view of the pooled map and Output allocates nothing:
+  // neither adds activation bytes.
+  expect(estimate).toEqual({
+    params: 160 + 27050,
+    flops: 194688 + 10816 + 54080,
+    activationBytes: 4 * (784 + 10816 + 2704 + 10),
+    unknown: [],
+  });
+  expect(describeCost(estimate)).toBe('27.2k params · 259.6k FLOPs · 57.3kB activations per sample');
+});
+
+logicTest('layerCost: layers without a rule or shapes are listed, not guessed', ({ expect }) => {
+  const json = {
+    inputs: ['1'],
+    outputs: ['3'],
+    layers: [
+      leaf('1', 'Input', {}, [], ['2']),
+      leaf('2', 'Dense', { units: 10 }, ['1'], ['3']),
+      leaf('3', 'Output', {}, ['2'], []),
+    ],
+  } as unknown as NnvpModel;
+  const estimate = new KerasGenerator(json).estimateCostFromGraph();
+  expect(estimate.unknown.map(String)).toEqual(['1', '2', '3']);
+  expect(estimate.params).toBe(0);
+  expect(describeCost(estimate)).toBe('0 params · 0 FLOPs · 0B activations per sample (3 layers not estimated)');
+});
@@ -0,0 +1,73 @@
+/**
+ * Catalog shape rules (shapeRules.ts): the evaluator against Keras' own
+ * output shapes for the generated catalog's rules, and the dim-inference
+ * fallback that uses them for layers without a hand-written case.
+ */
+import { logicTest } from '../harness/define';
+import { applyShapeRule, shapeRuleOf, shapeRuleParams } from '../../src/lib/KerasInterface/shapeRules';
+import inferFeatureDims from '../../src/lib/KerasInterface/KerasGeneratorDimInference';
+import type { GeneratorGraph } from '../../src/lib/KerasInterface/KerasGenerator';
+import type { NnvpLayerId, ParameterValue } from '../../src/types/model';
+
+// The catalog rule of `name` on `shapes`, parameters over the catalog defaults.
+function outputShape(name: string, shapes: number[][], params: Record<string, ParameterValue> = {}): number[] | null {
+  const rule = shapeRuleOf(name);
+  if (!rule) throw new Error(`no shape rule for ${name}`);
+  return applyShapeRule(rule, shapes, shapeRuleParams(name, params));
+}
+
+logicTest('shapeRules: window rules match Keras conv and pooling output shapes', ({ expect }) => {
+  expect(outputShape('Conv1D', [[12, 10]], { filters: 4, kernel_size: 3 })).toEqual([10, 4]);
+  expect(outputShape('Conv1D', [[12, 10]], { filters: 4, kernel_size: 3, strides: 2, padding: 'same' })).toEqual([6, 4]);
+  expect(outputShape('Conv2D', [[12, 10, 8]], { filters: 4, kernel_size: 3, dilation_rate: 2 })).toEqual([8, 6, 4]);
+  expect(outputShape('Conv2DTranspose', [[12, 10, 8]], { filters: 4, kernel_size: 3, strides: 2 })).toEqual([25, 21, 4]);
+  // pool_size defaults to (2, 2) and strides to the pool size.
+  expect(outputShape('MaxPooling2D', [[12, 10, 8]])).toEqual([6, 5, 8]);
+  expect(outputShape('DepthwiseConv2D', [[12, 10, 8]], { kernel_size: 3, depth_multiplier: 2 })).toEqual([10, 8, 16]);
+});
+
+logicTest('shapeRules: a rank the layer rejects, or a window larger than its input, is unknown', ({ expect }) => {
+  expect(outputShape('Conv2D', [[12, 10]], { filters: 4, kernel_size: 3 })).toBeNull();
+  expect(outputShape('Conv1D', [[2, 10]], { filters: 4, kernel_size: 3 })).toBeNull();
+  // An unset required parameter is the catalog's "None" default.
+  expect(outputShape('Conv1D', [[12, 10]], { kernel_size: 3 })).toBeNull();
+});
+
+logicTest('shapeRules: parameter-driven rules follow their parameter', ({ expect }) => {
+  expect(outputShape('Dense', [[12, 10]], { units: 5 })).toEqual([12, 5]);
+  expect(outputShape('Embedding', [[12]], { input_dim: 100, output_dim: 9 })).toEqual([12, 9]);
+  expect(outputShape('LSTM', [[12, 10]], { units: 5 })).toEqual([5]);
+  expect(outputShape('LSTM', [[12, 10]], { units: 5, return_sequences: true })).toEqual([12, 5]);
+  expect(outputShape('Reshape', [[12, 10]], { target_shape: [2, -1] })).toEqual([2, 60]);
+  expect(outputShape('Reshape', [[12, 10]], { target_shape: [7, -1] })).toBeNull();
+  expect(outputShape('ZeroPadding2D', [[12, 10, 8]])).toEqual([14, 12, 8]);
+  expect(outputShape('Cropping1D', [[12, 10]], { cropping: [2, 3] })).toEqual([7, 10]);
+  expect(outputShape('UpSampling2D', [[12, 10, 8]])).toEqual([24, 20, 8]);
+  expect(outputShape('GlobalAveragePooling1D', [[12, 10]])).toEqual([10]);
+});
+
+logicTest('shapeRules: merges check their inputs agree', ({ expect }) => {
+  expect(outputShape('Concatenate', [[12, 10], [12, 6]])).toEqual([12, 16]);
+  expect(outputShape('Concatenate', [[12, 10], [3, 10]], { axis: 1 })).toEqual([15, 10]);
+  expect(outputShape('Concatenate', [[12, 10], [3, 6]])).toBeNull();
+  expect(outputShape('Multiply', [[12, 10], [12, 10]])).toEqual([12, 10]);
+  expect(outputShape('Multiply', [[12, 10], [12, 6]])).toBeNull();
+});
+
+logicTest('shapeRules: aliases resolve to their canonical rule', ({ expect }) => {
+  expect(shapeRuleOf('Convolution2D')).toEqual(shapeRuleOf('Conv2D'));
+  expect(shapeRuleOf('NotALayer')).toBeUndefined();
+});
+
+logicTest('shapeRules: dim inference carries the full shape through layers without a case', ({ expect }) => {
+  // Input -> Conv1D(4, 3) -> MaxPooling1D -> Flatten
+  const graph = {
+    1: { sources: [], keras_data: { name: 'Input', parameterValues: { shape: [12, 10] } } },
+    2: { sources: ['1'], keras_data: { name: 'Conv1D', parameterValues: { filters: 4, kernel_size: 3 } } },
+    3: { sources: ['2'], keras_data: { name: 'MaxPooling1D', parameterValues: {} } },
+    4: { sources: ['3'], keras_data: { name: 'Flatten', parameterValues: {} } },
+  } as unknown as GeneratorGraph;
+  const dims = inferFeatureDims(graph, ['1', '2', '3', '4'] as NnvpLayerId[]);
+  expect(dims['3' as NnvpLayerId]).toEqual({ shape: [5, 4], features: 4 });
+  expect(dims['4' as NnvpLayerId]).toEqual({ shape: [20], features: 20 });
+});
@@ -7,7 +7,7 @@
 import { appTest, logicTest } from '../harness/define';
 import type { Expect } from '../harness/define';
 import {
-  VOCAB_SIZE, NEWLINE_INDEX, SPACE_INDEX, charToIndex, indexToChar, encodeText, decodeIndices,
+  VOCAB_SIZE, VOCAB_HASH, NEWLINE_INDEX, SPACE_INDEX, charToIndex, indexToChar, encodeText, decodeIndices,
 } from '../../src/lib/JSDatasets/text-vocab';
 import TextDataset from '../../src/lib/JSDatasets/text-data-loader';
 import { sampleFromProbs } from '../../src/lib/Inspector/textSampler';
@@ -61,6 +61,82 @@ async function withTextFetch(
   }
 }
 
+/**
+ * Serve per-path files for the duration of `fn`: text as .text(), bytes as
+ * .arrayBuffer(), null as a 404, an Error as a rejected fetch (network or
+ * integrity failure) — for the .tokens-vs-.txt load paths. A promised body
+ * answers once it resolves (holds a shard back).
+ */
+async function withCorpusFetch(
+  files: Record<string, string | ArrayBuffer | Promise<ArrayBuffer> | Error | null>,
+  fn: (requests: string[]) => Promise<void>,
+): Promise<void> {
+  const realFetch = globalThis.fetch;
+  const requests: string[] = [];
+  globalThis.fetch = ((path: string) => {
+    requests.push(path);
+    const file = files[path];
+    if (file === null || file === undefined) return Promise.resolve({ ok: false, status: 404 });
+    if (file instanceof Error) return Promise.reject(file);
+    return Promise.resolve(file).then(body => ({
+      ok: true,
+      text: async () => body as string,
+      arrayBuffer: async () => body as ArrayBuffer,
+      json: async () => JSON.parse(body as string),
+    }));
+  }) as unknown as typeof fetch;
+  try {
+    await fn(requests);
+  } finally {
+    globalThis.fetch = realFetch;
+  }
+}
+
+/** A .shards.json manifest + its shards as write_shards lays them out, under dir/. */
+function shardedFiles(text: string, shardChars: number, testStart: number): Record<string, string | ArrayBuffer> {
+  const encoded = encodeText(text);
+  const files: Record<string, string | ArrayBuffer> = {};
+  const shards: [number, number, string, null][] = [];
+  for (let offset = 0; offset < encoded.length; offset += shardChars) {
+    const piece = encoded.slice(offset, offset + shardChars);
+    const file = `corpus_shard_${String(shards.length).padStart(3, '0')}.bin`;
+    files[`dir/${file}`] = piece.buffer;
+    shards.push([offset, piece.length, file, null]);
+  }
+  const manifest = {
+    vocabSize: VOCAB_SIZE, vocabHash: VOCAB_HASH, length: encoded.length, testStart, shards, books: [0],
+  };
+  files['dir/corpus.shards.json'] = JSON.stringify(manifest);
+  return files;
+}
+
+/** A .windows-<seqLen>.bin as write_windows lays it out. */
+function windowsFile(header: { seqLen: number; length: number; testStart: number }, train: number[], test: number[]): ArrayBuffer {
+  const buffer = new ArrayBuffer(36 + 4 * (train.length + test.length));
+  const bytes = new Uint8Array(buffer);
+  for (let i = 0; i < 8; i += 1) bytes[i] = 'NNVPWIN1'.charCodeAt(i);
+  const view = new DataView(buffer);
+  [header.seqLen, header.length, header.testStart, 0, 0, train.length, test.length]
+    .forEach((value, i) => view.setUint32(8 + 4 * i, value, true));
+  [...train, ...test].forEach((value, i) => view.setUint32(36 + 4 * i, value, true));
+  return buffer;
+}
+
+/** A .tokens file as scripts/prepare_poetry_datasets.py write_tokens lays it out. */
+function tokensFile(text: string, testStart: number, vocabHash = VOCAB_HASH): ArrayBuffer {
+  const encoded = encodeText(text);
+  const buffer = new ArrayBuffer(24 + encoded.length);
+  const bytes = new Uint8Array(buffer);
+  for (let i = 0; i < 8; i += 1) bytes[i] = 'NNVPTOK1'.charCodeAt(i);
+  const header = new DataView(buffer);
+  header.setUint32(8, VOCAB_SIZE, true);
+  header.setUint32(12, vocabHash, true);
+  header.setUint32(16, encoded.length, true);
+  header.setUint32(20, testStart, true);
+  bytes.set(encoded, 24);
+  return buffer;
+}
+
 // --- text-vocab ---------------------------------------------------------------
 
 logicTest('text-vocab: encodes and decodes printable ASCII + newline losslessly', ({ expect }) => {
@@ -162,6 +238,165 @@ logicTest('textDataset: encodeContext left-pads short seeds and keeps the tail o
   });
 });
 
+logicTest('textDataset: loads a served .tokens corpus in place, with its header split', async ({ expect }) => {
+  await setup(expect);
+  const buffer = tokensFile(PATTERN_CORPUS, 500);
+  await withCorpusFetch({ 'corpus.tokens': buffer }, async (requests) => {
+    const dataset = new TextDataset('corpus.txt', null, SEQ_LEN, { tokensPath: 'corpus.tokens' });
+    await dataset.load();
+    expect(requests).toEqual(['corpus.tokens']);
+    expect(dataset.corpus.buffer).toBe(buffer); // a view, not a copy
+    expect(dataset.testStart).toBe(500);
+    expect(dataset.excerpt(12)).toBe(PATTERN_CORPUS.slice(500, 512));
+    const { xs, labels } = dataset.nextBatchRaw(4, dataset.trainStart, () => 7);
+    expect(decodeIndices(xs.subarray(0, SEQ_LEN))).toBe(PATTERN_CORPUS.slice(7, 7 + SEQ_LEN));
+    expect(indexToChar(labels[0]!)).toBe(PATTERN_CORPUS[7 + SEQ_LEN]);
+  });
+});
+
+logicTest('textDataset: falls back to the .txt while the .tokens is not hosted', async ({ expect }) => {
+  await setup(expect);
+  await withCorpusFetch({ 'corpus.txt': PATTERN_CORPUS, 'corpus.tokens': null }, async (requests) => {
+    const dataset = new TextDataset('corpus.txt', null, SEQ_LEN, { tokensPath: 'corpus.tokens' });
+    await dataset.load();
+    expect(requests).toEqual(['corpus.tokens', 'corpus.txt']);
+    expect(decodeIndices(dataset.corpus)).toBe(PATTERN_CORPUS);
+    expect(dataset.testStart).toBe(Math.floor(PATTERN_CORPUS.length * 0.9));
+  });
+});
+
+logicTest('textDataset: falls back to the .txt when the .tokens fetch fails', async ({ expect }) => {
+  await setup(expect);
+  const files = { 'corpus.txt': PATTERN_CORPUS, 'corpus.tokens': new TypeError('Failed to fetch') };
+  await withCorpusFetch(files, async (requests) => {
+    const dataset = new TextDataset('corpus.txt', null, SEQ_LEN, { tokensPath: 'corpus.tokens' });
+    await dataset.load();
+    expect(requests).toEqual(['corpus.tokens', 'corpus.txt']);
+    expect(decodeIndices(dataset.corpus)).toBe(PATTERN_CORPUS);
+  });
+});
+
+logicTest('textDataset: a sharded corpus trains on its first shard while the rest streams in', async ({ expect }) => {
+  await setup(expect);
+  // 600 chars in 100-char shards, test region from 540: shards 0 and 5 up
+  // front, shard 1 held back until the first-shard state is checked.
+  const files: Record<string, string | ArrayBuffer | Promise<ArrayBuffer>> = shardedFiles(PATTERN_CORPUS, 100, 540);
+  let release = () => {};
+  const held = files['dir/corpus_shard_001.bin'] as ArrayBuffer;
+  files['dir/corpus_shard_001.bin'] = new Promise((resolve) => { release = () => resolve(held); });
+  await withCorpusFetch(files, async (requests) => {
+    const dataset = new TextDataset('corpus.txt', null, SEQ_LEN, { shardsPath: 'dir/corpus.shards.json' });
+    await dataset.load();
+    expect(requests.slice(0, 3)).toEqual([
+      'dir/corpus.shards.json', 'dir/corpus_shard_000.bin', 'dir/corpus_shard_005.bin',
+    ]);
+    expect(dataset.testStart).toBe(540);
+    expect(dataset.testSliceSize).toBe(55);
+    expect(dataset.excerpt(12)).toBe(PATTERN_CORPUS.slice(540, 552));
+    // Only shard 0's windows at first; every draw stays inside it.
+    expect(dataset.trainIndices.length).toBe(100 - SEQ_LEN);
+    expect(Math.max(...dataset.trainIndices) + SEQ_LEN).toBeLessThan(100);
+
+    release();
+    await dataset.shardsLoaded;
+    expect(requests.length).toBe(7);
+    expect(dataset.trainIndices.length).toBe(535);
+    expect(dataset.trainSliceSize).toBe(535);
+    expect(decodeIndices(dataset.corpus)).toBe(PATTERN_CORPUS);
+  });
+});
+
+logicTest('textDataset: falls back to the .txt when an upfront shard cannot be fetched', async ({ expect }) => {
+  await setup(expect);
+  const files = {
+    ...shardedFiles(PATTERN_CORPUS, 100, 540),
+    'dir/corpus_shard_005.bin': new TypeError('Failed to fetch'),
+    'corpus.txt': PATTERN_CORPUS,
+  };
+  await withCorpusFetch(files, async (requests) => {
+    const dataset = new TextDataset('corpus.txt', null, SEQ_LEN, { shardsPath: 'dir/corpus.shards.json' });
+    await dataset.load();
+    expect(requests[requests.length - 1]).toBe('corpus.txt');
+    expect(decodeIndices(dataset.corpus)).toBe(PATTERN_CORPUS);
+    expect(dataset.trainIndices.length).toBe(535);
+  });
+});
+
+logicTest('textDataset: a shard that fails mid-stream leaves training on the loaded prefix', async ({ expect }) => {
+  await setup(expect);
+  const files = { ...shardedFiles(PATTERN_CORPUS, 100, 540), 'dir/corpus_shard_002.bin': null };
+  await withCorpusFetch(files, async () => {
+    const dataset = new TextDataset('corpus.txt', null, SEQ_LEN, { shardsPath: 'dir/corpus.shards.json' });
+    await dataset.load();
+    let thrown: unknown = null;
+    try {
+      await dataset.shardsLoaded;
+    } catch (error) {
+      thrown = error;
+    }
+    expect(String(thrown)).toContain('corpus_shard_002.bin');
+    // Shards 0 and 1 are in: every draw stays inside the first 200 chars.
+    expect(dataset.trainIndices.length).toBe(200 - SEQ_LEN);
+    expect(Math.max(...dataset.trainIndices) + SEQ_LEN).toBeLessThan(200);
+  });
+});
+
+logicTest('textDataset: draws through a published window table instead of building one', async ({ expect }) => {
+  await setup(expect);
+  const header = { seqLen: SEQ_LEN, length: PATTERN_CORPUS.length, testStart: 540 };
+  const files = {
+    'corpus.txt': PATTERN_CORPUS,
+    'corpus.windows-5.bin': windowsFile(header, [7, 3, 11], [2, 0]),
+  };
+  await withCorpusFetch(files, async (requests) => {
+    const dataset = new TextDataset('corpus.txt', null, SEQ_LEN, { windowsPath: 'corpus.windows-5.bin' });
+    await dataset.load();
+    expect(requests).toEqual(['corpus.txt', 'corpus.windows-5.bin']);
+    expect(Array.from(dataset.trainIndices)).toEqual([7, 3, 11]);
+    expect(Array.from(dataset.testIndices)).toEqual([2, 0]);
+    expect(dataset.trainSliceSize).toBe(3);
+    expect(dataset.testSliceSize).toBe(2);
+    const { xs } = dataset.nextTrainBatchRaw(1); // the cursor's first step lands on index 1
+    expect(decodeIndices(xs)).toBe(PATTERN_CORPUS.slice(3, 3 + SEQ_LEN));
+
+    const otherSeqLen = new TextDataset('corpus.txt', null, SEQ_LEN + 1, { windowsPath: 'corpus.windows-5.bin' });
+    let thrown: unknown = null;
+    try {
+      await otherSeqLen.load();
+    } catch (error) {
+      thrown = error;
+    }
+    expect(String(thrown)).toContain('another corpus or seqLen');
+  });
+});
+
+logicTest('textDataset: builds its own index tables when the window table fetch fails', async ({ expect }) => {
+  await setup(expect);
+  const files = { 'corpus.txt': PATTERN_CORPUS, 'corpus.windows-5.bin': new TypeError('Failed to fetch') };
+  await withCorpusFetch(files, async (requests) => {
+    const dataset = new TextDataset('corpus.txt', null, SEQ_LEN, { windowsPath: 'corpus.windows-5.bin' });
+    await dataset.load();
+    expect(requests).toEqual(['corpus.txt', 'corpus.windows-5.bin']);
+    expect(dataset.trainIndices.length).toBe(535);
+    expect(dataset.testIndices.length).toBe(55);
+  });
+});
+
+logicTest('textDataset: refuses a .tokens encoded against another vocabulary', async ({ expect }) => {
+  await setup(expect);
+  const files = { 'corpus.tokens': tokensFile(PATTERN_CORPUS, 500, VOCAB_HASH ^ 1) };
+  await withCorpusFetch(files, async () => {
+    const dataset = new TextDataset('corpus.txt', null, SEQ_LEN, { tokensPath: 'corpus.tokens' });
+    let thrown: unknown = null;
+    try {
+      await dataset.load();
+    } catch (error) {
+      thrown = error;
+    }
+    expect(String(thrown)).toContain('another vocabulary');
+  });
+});
+
 logicTest('textDataset: refuses a corpus too short for the window size', async ({ expect }) => {
   await setup(expect);
   await withTextFetch('tiny', async () => {
@@ -14,12 +14,15 @@ import type {
   BatchLogs, EpochLogs, TrainingDataset, TrainingPrepareOptions,
 } from '../../src/lib/Training/engine';
 import {
-  createTinygradEngine, graphInputShape, graphNumClasses,
+  TRACE_BATCH_SIZE, TRACE_MEMORY_MAX_BYTES, createTinygradEngine,
+  graphInputShape, graphNumClasses, graphTrainingBytes,
 } from '../../src/lib/Training/tinygradEngine';
-import { createTinygradRuntime } from '../../src/lib/TinygradRuntime/runtime';
-import type { RunnerStep, RuntimeWorker, TraceHandle } from '../../src/lib/TinygradRuntime/runtime';
+import { PipelineCache, createTinygradRuntime } from '../../src/lib/TinygradRuntime/runtime';
 import type {
-  TraceMeta, TraceRequest, TraceResult, WorkerRequest, WorkerResponse,
+  CachedPipeline, RunnerStep, RuntimeWorker, TraceHandle,
+} from '../../src/lib/TinygradRuntime/runtime';
+import type {
+  StreamedTensor, TraceMeta, TraceRequest, TraceResult, WorkerRequest, WorkerResponse,
 } from '../../src/lib/TinygradRuntime/protocol';
 import { readWeightBuf, writeWeightBuf } from '../../src/lib/TinygradRuntime/weightIO';
 import type { NnvpLayer, NnvpModel, ParameterValue } from '../../src/types/model';
@@ -108,23 +111,32 @@ function makeTraceResult({ batchSize = 32 }: { batchSize?: number } = {}): Trace
   };
 }
 
-/** The fake runtime: the TinygradRuntime surface plus recorded calls. */
+/** The fake runtime: the engine's runtime surface plus recorded calls. */
 interface FakeRuntime {
   initCalls: number;
   traceRequests: TraceRequest[];
+  weightsKeys: string[];
   init(): Promise<TraceResult | undefined>;
   trace(request: TraceRequest): TraceHandle;
+  streamWeights(weightsKey: string, onTensor: (tensor: StreamedTensor) => void): Promise<void>;
 }
 
-function makeFakeRuntime(traceResult: TraceResult = makeTraceResult()): FakeRuntime {
+function makeFakeRuntime(
+  traceResult: TraceResult = makeTraceResult(), tensors: StreamedTensor[] = [],
+): FakeRuntime {
   return {
     initCalls: 0,
     traceRequests: [],
+    weightsKeys: [],
     async init(): Promise<TraceResult | undefined> { this.initCalls += 1; return undefined; },
     trace(request) {
       this.traceRequests.push(request);
       return { promise: Promise.resolve(traceResult), cancel() {} };
     },
+    async streamWeights(weightsKey, onTensor) {
+      this.weightsKeys.push(weightsKey);
+      tensors.forEach(onTensor);
+    },
   };
 }
 
@@ -249,7 +261,7 @@ function makeEngine({ traceResult = makeTraceResult(), initialValues }: {
 } = {}) {
   const device = makeFakeDevice();
   const runtime = makeFakeRuntime(traceResult);
-  const instantiated: Array<{ runnerJs: string; dev: GPUDevice; weights: Uint8Array }> = [];
+  const instantiated: Array<{ runnerJs: string; dev: GPUDevice; weights: Uint8Array | null }> = [];
   const step = makeFakeStep(device, traceResult.meta, initialValues);
   const engine = createTinygradEngine({
     runtime,
@@ -387,6 +399,58 @@ logicTest('tinygradRuntime: cancel rejects the pending trace and tells the worke
   replies.get(traceId)!();
 });
 
+logicTest('tinygradRuntime: a weights request streams its tensors before resolving', async ({ expect }) => {
+  const worker = {
+    posted: [] as WorkerRequest[],
+    onmessage: null as RuntimeWorker['onmessage'],
+    onerror: null as RuntimeWorker['onerror'],
+    postMessage(message: WorkerRequest) {
+      this.posted.push(message);
+      if (message.type === 'init') {
+        queueMicrotask(() => this.onmessage!(messageEvent({ id: message.id, ok: true })));
+      }
+      if (message.type === 'weights') {
+        queueMicrotask(() => {
+          if (message.weightsKey !== 'trace-key') {
+            this.onmessage!(messageEvent({ id: message.id, ok: false, error: 'no such trace' }));
+            return;
+          }
+          this.onmessage!(messageEvent({ id: message.id, tensor: { names: ['a'], bytes: Uint8Array.of(1) } }));
+          this.onmessage!(messageEvent({ id: message.id, tensor: { names: ['b', 'c'], bytes: Uint8Array.of(2, 3) } }));
+          this.onmessage!(messageEvent({ id: message.id, ok: true }));
+        });
+      }
+    },
+  };
+  const runtime = createTinygradRuntime({ createWorker: () => worker });
+  const received: string[][] = [];
+  await runtime.streamWeights('trace-key', tensor => received.push(tensor.names));
+  expect(received).toEqual([['a'], ['b', 'c']]);
+  const missing = await rejection(runtime.streamWeights('other', () => {}));
+  expect(missing.message).toBe('no such trace');
+  // A throwing consumer rejects the request; the rest of its stream is dropped.
+  const failed = await rejection(runtime.streamWeights('trace-key', () => { throw new Error('upload boom'); }));
+  expect(failed.message).toBe('upload boom');
+});
+
+logicTest('tinygradRuntime: the pipeline cache drops its least recently used kernels', ({ expect }) => {
+  const cache = new PipelineCache(2);
+  const entry = (): CachedPipeline => ({
+    pipeline: Promise.resolve({} as GPUComputePipeline), layout: {} as GPUBindGroupLayout,
+  });
+  const a = entry();
+  cache.set('a', a);
+  cache.set('b', entry());
+  expect(cache.get('a')).toBe(a); // a is now the most recently used
+  cache.set('c', entry());
+  expect(cache.size).toBe(2);
+  expect(cache.get('b')).toBe(undefined);
+  expect(cache.get('a')).toBe(a);
+  // A failed compile is dropped again (the runner's pipeline.catch).
+  expect(cache.delete('c')).toBe(true);
+  expect(cache.size).toBe(1);
+});
+
 // --- Graph probes -------------------------------------------------------------
 
 logicTest('tinygradEngine: infers channels-first input shape and final-Dense classes from graph JSON', ({ expect }) => {
@@ -487,6 +551,19 @@ logicTest('tinygradEngine: unsupported options throw clear errors before any tra
   expect(runtime2.traceRequests.length).toBe(0);
 });
 
+logicTest('tinygradEngine: a model over the memory limit is refused before the boot and the trace', async ({ expect }) => {
+  const graph = mnistGraph();
+  expect(graphTrainingBytes(graph)).toBe(3 * 4 * (100480 + 1290) + 2 * TRACE_BATCH_SIZE * 4 * (784 + 128 + 10));
+  const huge = mnistGraph();
+  huge.layers[0]!.kerasLayer!.parameterValues!.shape = [4096, 4096, 1];
+  const { engine, runtime } = makeEngine();
+  const error = await rejection(engine.prepare(JSON.stringify(huge), makeOpts()));
+  expect(error.message).toMatch(/per training step, over the tinygrad engine's 1024 MB limit/);
+  expect(runtime.initCalls).toBe(0);
+  expect(runtime.traceRequests.length).toBe(0);
+  expect(graphTrainingBytes(mnistGraph())).toBeLessThan(TRACE_MEMORY_MAX_BYTES);
+});
+
 logicTest('tinygradEngine: prepare traces with the graph shape and the configured sgd knobs', async ({ expect }) => {
   const { engine, runtime, step, instantiated } = makeEngine();
   const graphJson = JSON.stringify(mnistGraph());
@@ -501,6 +578,8 @@ logicTest('tinygradEngine: prepare traces with the graph shape and the configure
     learningRate: 0.05,
     momentum: 0.9,
     nesterov: true,
+    maxBatchSize: TRACE_BATCH_SIZE,
+    streamWeights: true,
   }]);
   // The traced runner (not the generated Python) is what gets instantiated.
   expect(instantiated.length).toBe(1);
@@ -543,6 +622,7 @@ logicTest('tinygradEngine: prepare tags generation/trace failures as build error
   const failingRuntime = {
     async init(): Promise<undefined> {},
     trace: (): TraceHandle => ({ promise: Promise.reject(new Error('trace boom')), cancel() {} }),
+    async streamWeights(): Promise<void> {},
   };
   const engine4 = createTinygradEngine({
     runtime: failingRuntime,
@@ -595,17 +675,27 @@ logicTest('tinygradEngine: fit slices raw batches, reading the loss at batch 0,
   expect(epochEnds[0]![1].val_loss).toBe(undefined);
 });
 
-logicTest('tinygradEngine: fit caps an epoch at the historical 500-sample slice', async ({ expect }) => {
+logicTest('tinygradEngine: fit caps an epoch at the historical 500-sample slice, short last batch included', async ({ expect }) => {
   const { engine, step } = makeEngine();
   const session = await engine.prepare(JSON.stringify(mnistGraph()), makeOpts({ epochs: 1 }));
-  // Plenty of data: an epoch still consumes floor(500/32) = 15 batches.
+  // Plenty of data: an epoch consumes ceil(500/32) = 16 steps, 15 full and
+  // one of the remaining 20 samples (the runner pads it).
   await session.fit(makeRawDataset({ samples: 3200, pixels: 4 }), {});
-  expect(step.calls.length).toBe(15);
-  // Readbacks at in-epoch steps 0 (first loss), 9 (cadence) and 14 (epoch end).
+  expect(step.calls.length).toBe(16);
+  expect(step.calls[15]!.x0).toBe(480 * 4);
+  expect(step.calls[15]!.xLength).toBe(20 * 4);
+  expect(step.calls[15]!.y).toEqual([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 0, 1, 2, 3, 4, 5, 6, 7, 8, 9]);
+  // Readbacks at in-epoch steps 0 (first loss), 9 (cadence) and 15 (epoch end).
   expect(step.calls.map(call => call.readLoss).filter(Boolean).length).toBe(3);
   expect(step.calls[0]!.readLoss).toBe(true);
   expect(step.calls[9]!.readLoss).toBe(true);
-  expect(step.calls[14]!.readLoss).toBe(true);
+  expect(step.calls[15]!.readLoss).toBe(true);
+  // A dataset smaller than the slice trains every sample, a partial batch too.
+  const { engine: engine2, step: step2 } = makeEngine();
+  const session2 = await engine2.prepare(JSON.stringify(mnistGraph()), makeOpts({ epochs: 2 }));
+  await session2.fit(makeRawDataset({ samples: 70, pixels: 4 }), {});
+  expect(step2.calls.map(call => call.xLength / 4)).toEqual([32, 32, 6, 32, 32, 6]);
+  expect(step2.calls[2]!.y).toEqual([4, 5, 6, 7, 8, 9]);
 });
 
 logicTest('tinygradEngine: stop() aborts between steps; a throwing callback cancels', async ({ expect }) => {
@@ -726,3 +816,51 @@ logicTest('tinygradEngine: evaluateLogits boots the eval runner lazily and syncs
   await session.evaluateLogits!(new Float32Array(4));
   expect(instantiated).toHaveLength(2);
 });
+
+logicTest('tinygradEngine: a streamed trace uploads each tensor into the runner that holds it', async ({ expect }) => {
+  const traceResult = makeTraceResult();
+  traceResult.weights = null;
+  traceResult.meta.weightsKey = 'trace-key';
+  const tensors: StreamedTensor[] = [
+    { names: ['model.layer_3.weight', 'opt.params.0'], bytes: new Uint8Array(24).fill(1) },
+    { names: ['opt.lr'], bytes: new Uint8Array(4).fill(2) },
+  ];
+  const device = makeFakeDevice();
+  const runtime = makeFakeRuntime(traceResult, tensors);
+  const uploads: Record<string, Array<[string, number]>> = { train: [], eval: [] };
+  const makeRunner = (kind: string, names: string[]): RunnerStep => Object.assign(
+    async () => [new Float32Array(4)],
+    {
+      weightBufs: Object.fromEntries(names.map(name => [name, asGpuBuffer(device.createBuffer({
+        size: traceResult.meta.stateShapes[name]!.reduce((a, b) => a * b, 1) * 4,
+        usage: USAGE.STORAGE | USAGE.COPY_SRC | USAGE.COPY_DST,
+      }))])),
+      uploadTensor: (name: string, bytes: Uint8Array | Float32Array) => {
+        uploads[kind]!.push([name, bytes.byteLength]);
+      },
+    },
+  );
+  const instantiatedWith: Array<Uint8Array | null> = [];
+  const engine = createTinygradEngine({
+    runtime,
+    requestDevice: async () => asGpuDevice(device),
+    instantiate: async (runnerJs, _dev, weights) => {
+      instantiatedWith.push(weights);
+      return runnerJs.includes('eval')
+        ? makeRunner('eval', ['opt.params.0'])
+        : makeRunner('train', ['opt.params.0', 'opt.params.1', 'opt.b.0', 'opt.lr']);
+    },
+  });
+  const session = await engine.prepare(JSON.stringify(mnistGraph()), makeOpts());
+  expect(runtime.traceRequests[0]!.streamWeights).toBe(true);
+  expect(instantiatedWith).toEqual([null]); // no blob anywhere
+  expect(runtime.weightsKeys).toEqual(['trace-key']);
+  // Each tensor lands under the name the runner holds it by.
+  expect(uploads.train).toEqual([['opt.params.0', 24], ['opt.lr', 4]]);
+  // The eval runner is not streamed again (the worker may have evicted the
+  // recipe by then); it takes the training runner's buffers instead.
+  await session.evaluateLogits!(new Float32Array(4));
+  expect(instantiatedWith).toEqual([null, null]);
+  expect(runtime.weightsKeys).toEqual(['trace-key']);
+  expect(uploads.eval).toEqual([]);
+});
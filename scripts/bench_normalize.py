@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Benchmark and differential check of prepare_poetry_datasets.normalize.
+
+The table-driven normalize (and normalize_chunks, at random chunk splits) must
+produce exactly what the original replace/NFKD/per-character implementation
+produced — checked on random Unicode text weighted towards what the corpora
+actually contain (ASCII, newline runs, accents, typographic punctuation) —
+and the timing compares both on a few MB of such text.
+
+Usage:
+    python3 scripts/bench_normalize.py [--mb 5] [--seed 0]
+"""
+
+import argparse
+import random
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from prepare_poetry_datasets import TRANSLITERATIONS, normalize, normalize_chunks  # noqa: E402
+
+
+def legacy_normalize(text: str) -> str:
+    """The original implementation, verbatim."""
+    for source, replacement in TRANSLITERATIONS.items():
+        text = text.replace(source, replacement)
+    text = unicodedata.normalize("NFKD", text)
+    kept = []
+    for char in text:
+        if char == "\n" or 32 <= ord(char) <= 126:
+            kept.append(char)
+    text = "".join(kept)
+    while "\n\n\n" in text:
+        text = text.replace("\n\n\n", "\n\n")
+    return text
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    pieces = []
+    while length > 0:
+        roll = rng.random()
+        if roll < 0.70:
+            piece = "".join(chr(rng.randint(32, 126)) for _ in range(rng.randint(1, 40)))
+        elif roll < 0.80:
+            piece = "\n" * rng.randint(1, 8)
+        elif roll < 0.88:
+            piece = rng.choice(list(TRANSLITERATIONS) + ["é", "ñ", "ﬁ", "Å", "½", "́", " "])
+        elif roll < 0.95:  # anywhere in the BMP, surrogates excluded
+            piece = chr(rng.choice([rng.randint(0, 0xD7FF), rng.randint(0xE000, 0xFFFF)]))
+        else:  # control characters, astral planes
+            piece = chr(rng.choice([rng.randint(0, 31), rng.randint(0x10000, 0x10FFFF)]))
+        pieces.append(piece)
+        length -= len(piece)
+    return "".join(pieces)
+
+
+def corpus_text(rng: random.Random, length: int) -> str:
+    """Poetry-corpus-like text: ASCII verse lines, a sprinkle of accents and
+    typographic punctuation, stanza breaks and the odd long blank run."""
+    words = ["thou", "the", "night", "love", "and", "sea", "of", "fire", "O", "my",
+             "“still”", "naïve", "—", "’tis", "café", "…"]
+    pieces = []
+    while length > 0:
+        line = " ".join(rng.choice(words) for _ in range(rng.randint(3, 9)))
+        roll = rng.random()
+        piece = line + ("\n\n" if roll < 0.15 else "\n" * rng.randint(3, 400) if roll < 0.16 else "\n")
+        pieces.append(piece)
+        length -= len(piece)
+    return "".join(pieces)
+
+
+def chunked(rng: random.Random, text: str):
+    start = 0
+    while start < len(text):
+        end = start + rng.randint(0, 64)
+        yield text[start:end]
+        start = end
+
+
+def timed(label: str, fn):
+    started = time.perf_counter()
+    out = fn()
+    print(f"  {label:<26} {time.perf_counter() - started:7.3f}s")
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=5.0, help="benchmark text size (default: 5)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    for case in range(2000):
+        text = random_text(rng, rng.randint(0, 400))
+        want = legacy_normalize(text)
+        assert normalize(text) == want, f"normalize differs on case {case}: {text!r}"
+        pieces = normalize_chunks(chunked(rng, text), buffer_chars=rng.randint(1, 256))
+        assert "".join(pieces) == want, f"normalize_chunks differs on case {case}"
+    print("differential: 2000 random Unicode texts identical (whole and chunked)")
+
+    for label, text in (("random Unicode", random_text(rng, int(args.mb * 1e6))),
+                        ("corpus-like", corpus_text(rng, int(args.mb * 1e6)))):
+        print(f"{label}, {len(text) / 1e6:.1f}M characters:")
+        want = timed("legacy normalize", lambda text=text: legacy_normalize(text))
+        got = timed("table-driven normalize", lambda text=text: normalize(text))
+        assert got == want, f"normalize differs on the {label} benchmark text"
+        lines = text.splitlines(keepends=True)
+        got = timed("normalize_chunks (lines)", lambda lines=lines: "".join(normalize_chunks(lines)))
+        assert got == want, f"normalize_chunks differs on the {label} benchmark text"
+    print("OK — identical to the legacy normalizer")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
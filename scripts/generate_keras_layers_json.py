@@ -18,6 +18,9 @@ Usage:
     make generate-layers
     # or manually:
     uv run scripts/generate_keras_layers_json.py 2>/dev/null > nnvp-client-vue/src/lib/KerasInterface/generatedKerasLayers.json
+    # only re-introspect layers whose class changed since the last run:
+    uv run scripts/generate_keras_layers_json.py --incremental \
+        --output nnvp-client-vue/src/lib/KerasInterface/generatedKerasLayers.json
 
 JSON Structure:
     {
@@ -37,6 +40,12 @@ JSON Structure:
                 },
                 "input": {"shape": "Arbitrary"},
                 "output": {"shape": ["Arbitrary"]},
+                "shapeRule": {                // Optional, see "Shape rules" below
+                    "kind": "window", "spatial": 2, ..., "ranks": [3]
+                },
+                "cost": {                     // With shapeRule, see "Cost rules" below
+                    "kind": "conv", "spatial": 2, ...
+                },
                 "aliases": ["AltName1", ...]  // Optional, only if has aliases
             }
         }
@@ -50,15 +59,50 @@ Customization:
     - KNOWN_INT_PARAMS, KNOWN_FLOAT_PARAMS, KNOWN_TUPLE_PARAMS: Fallback type
       detection for parameters without type annotations or defaults.
 
+Shape rules:
+    - infer_shape_rule instantiates each layer from PROBE_ARGS/PROBE_VARIANTS
+      and matches Keras' output shapes on PROBE_SHAPES against the rule kinds
+      documented above apply_shape_rule (mirrored by the client's
+      shapeRules.ts).
+
+Cost rules:
+    - infer_cost picks the rule kind (documented above layer_cost, mirrored
+      by the client's layerCost.ts) whose parameter count matches Keras'
+      count_params() on the same probes; FLOPs and activation bytes follow
+      from the kind and the shapes.
+
+Caching and parallelism:
+    - Each layer's introspection (parameters + shape rule) runs in-process or
+      on --jobs worker processes, and is stored in --cache-dir
+      under a key made of the Keras version, the source files of every Keras
+      class in the layer's MRO and this script's own source.
+    - --incremental reuses the cached result of every layer whose key is
+      unchanged, so only changed or new layers are introspected. The JSON is
+      assembled in sorted layer order either way: the output is byte-identical
+      to a full run, and --output rewrites the file only when it changed.
+
 Special layers:
     - Input/Output: Added manually as NNVP-specific layers (not standard Keras).
 """
 
+import argparse
+import hashlib
 import inspect
 import json
-
-import keras
-from keras import layers
+import math
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+_IMPORT_STARTED = time.perf_counter()
+import keras  # noqa: E402
+from keras import layers  # noqa: E402
+# Private, but it is the check Layer.__call__ runs; compute_output_shape alone
+# happily answers for ranks the layer would reject.
+from keras.src.layers.input_spec import assert_input_compatibility  # noqa: E402
+KERAS_IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
 
 
 # =============================================================================
@@ -378,6 +422,515 @@ def extract_layer_info(layer_class):
     return params
 
 
+# =============================================================================
+# Shape rules - how each layer maps input shapes to its output shape
+# =============================================================================
+#
+# Every layer gets a 'shapeRule': one of the rule kinds below (evaluated by
+# apply_shape_rule here and by the client's shapeRules.ts), plus 'ranks', the
+# input ranks (batch axis excluded) the layer accepts. A rule is chosen by
+# instantiating the layer with PROBE_ARGS (and each applicable PROBE_VARIANT)
+# and asking Keras for its output shape on every PROBE_SHAPES input; the first
+# candidate rule that reproduces every answer wins. A layer no rule explains
+# but whose output ignores the probed parameters gets a 'table' of the probed
+# shapes; anything else is 'unknown'.
+#
+# Rule kinds (params = constructor arguments, defaults filled in; channels last):
+#   identity                      output = input
+#   lastAxis    {param}           last axis becomes params[param]
+#   appendAxis  {param}           params[param] appended as a new last axis
+#   recurrent   {param}           [params[param]], or the input's last axis
+#                                 replaced by it when return_sequences
+#   flatten                       [product of the input axes]
+#   window      {spatial, kernel, channels, multiplier, transposed}
+#                                 conv/pool over `spatial` axes: kernel size,
+#                                 strides (pool default: the kernel), padding
+#                                 valid/same, dilation_rate (transposed: the
+#                                 inverse, output_padding unset); the channel
+#                                 axis becomes params[channels] or is multiplied
+#                                 by params[multiplier]
+#   global      {spatial}         spatial axes reduced (kept as 1 if keepdims)
+#   upsample    {spatial, param}  spatial axes multiplied by params[param]
+#   pad         {spatial, param, sign}
+#                                 spatial axes grown (+1) or cropped (-1) by
+#                                 params[param]: int, per-axis, or (before, after)
+#   repeat      {param}           [params[param], *input]
+#   reshape     {param}           params[param], one -1 inferred
+#   permute     {param}           input axes reordered by params[param] (1-based)
+#   resize      {height, width}   [params[height], params[width], channels]
+#   elementwise                   merge of equal shapes: the first input's
+#   concat      {param}           merge along params[param] (Keras axis: 0
+#                                 is the batch axis)
+#   table       {table}           "d0,d1,..." -> output shape, probed shapes only
+#   unknown                       no rule reproduces Keras
+
+# Representative values for constructor arguments that have no default
+PROBE_ARGS = {
+    'activation': 'relu', 'rate': 0.5, 'stddev': 0.1, 'factor': 0.1,
+    'height_factor': 0.1, 'width_factor': 0.1, 'scale': 0.5,
+    'units': 5, 'filters': 4, 'kernel_size': 3, 'pool_size': 2,
+    'input_dim': 20, 'output_dim': 6, 'num_bins': 8, 'max_number': 4,
+    'n': 3, 'dims': (2, 1), 'target_shape': (-1,), 'height': 4, 'width': 4,
+    'axes': -1, 'num_heads': 2, 'key_dim': 4,
+}
+
+# One argument changed at a time, so a rule must follow the parameters it
+# names (a variant the layer rejects is skipped)
+PROBE_VARIANTS = [
+    {'units': 7}, {'filters': 3}, {'output_dim': 9}, {'kernel_size': 2},
+    {'strides': 2}, {'padding': 'same'}, {'dilation_rate': 2}, {'pool_size': 3},
+    {'depth_multiplier': 2}, {'keepdims': True}, {'return_sequences': True},
+    {'size': 3}, {'padding': 2}, {'cropping': 2}, {'n': 2}, {'axis': 1},
+    {'target_shape': (2, -1)}, {'height': 3, 'width': 2},
+]
+
+# Probed inputs, batch axis excluded: ranks 1-4
+PROBE_SHAPES = [(12,), (12, 10), (12, 10, 8), (12, 10, 8, 6)]
+
+# Parameters a lastAxis/appendAxis/recurrent rule may name
+AXIS_SIZE_PARAMS = ('units', 'output_dim', 'num_tokens')
+
+
+def _is_none(value):
+    return value is None or value == 'None'
+
+
+def _per_axis(value, spatial):
+    """An int-or-tuple parameter as one int per spatial axis."""
+    if isinstance(value, int):
+        return [value] * spatial
+    value = list(value)
+    if len(value) != spatial:
+        raise ValueError(f'expected {spatial} values, got {value}')
+    return value
+
+
+def _pad_pairs(value, spatial):
+    """ZeroPadding/Cropping amounts as one (before, after) pair per axis."""
+    if isinstance(value, int):
+        return [(value, value)] * spatial
+    value = list(value)
+    if spatial == 1 and len(value) == 2 and all(isinstance(v, int) for v in value):
+        return [tuple(value)]
+    return [(v, v) if isinstance(v, int) else tuple(v) for v in _per_axis(value, spatial)]
+
+
+def apply_shape_rule(rule, shapes, params):
+    """Output shape (a list) of `rule` for the input `shapes` (one list per
+    input, batch axis excluded); raises on input the rule does not cover."""
+    kind, shape = rule['kind'], list(shapes[0])
+    if 'ranks' in rule and any(len(s) not in rule['ranks'] for s in shapes):
+        raise ValueError(f'rank {len(shape)} not in {rule["ranks"]}')
+    if kind == 'identity':
+        return shape
+    if kind == 'lastAxis':
+        return shape[:-1] + [params[rule['param']]]
+    if kind == 'appendAxis':
+        return shape + [params[rule['param']]]
+    if kind == 'recurrent':
+        return shape[:-1] + [params[rule['param']]] if params.get('return_sequences') else [params[rule['param']]]
+    if kind == 'flatten':
+        return [math.prod(shape)]
+    if kind == 'window':
+        spatial = rule['spatial']
+        if len(shape) != spatial + 1:
+            raise ValueError(f'expected rank {spatial + 1}')
+        kernel = _per_axis(params[rule['kernel']], spatial)
+        strides = kernel if _is_none(params.get('strides')) else _per_axis(params['strides'], spatial)
+        dilation = _per_axis(params.get('dilation_rate', 1), spatial)
+        same = str(params.get('padding', 'valid')).lower() == 'same'
+        if rule.get('transposed'):
+            if not _is_none(params.get('output_padding')):
+                raise ValueError('output_padding is not covered')
+            out = [size * stride if same else (size - 1) * stride + d * (k - 1) + 1
+                   for size, k, stride, d in zip(shape, kernel, strides, dilation)]
+        else:
+            out = [-(-size // stride) if same else (size - d * (k - 1) - 1) // stride + 1
+                   for size, k, stride, d in zip(shape, kernel, strides, dilation)]
+        if min(out) < 1:
+            raise ValueError('window larger than its input')
+        channels = params[rule['channels']] if rule.get('channels') else shape[-1]
+        if rule.get('multiplier'):
+            channels *= params[rule['multiplier']]
+        return out + [channels]
+    if kind == 'global':
+        if len(shape) != rule['spatial'] + 1:
+            raise ValueError(f'expected rank {rule["spatial"] + 1}')
+        return [1] * rule['spatial'] + shape[-1:] if params.get('keepdims') else shape[-1:]
+    if kind == 'upsample':
+        spatial = rule['spatial']
+        if len(shape) != spatial + 1:
+            raise ValueError(f'expected rank {spatial + 1}')
+        return [size * f for size, f in zip(shape, _per_axis(params[rule['param']], spatial))] + shape[-1:]
+    if kind == 'pad':
+        spatial = rule['spatial']
+        if len(shape) != spatial + 1:
+            raise ValueError(f'expected rank {spatial + 1}')
+        pairs = _pad_pairs(params[rule['param']], spatial)
+        return [size + rule['sign'] * (before + after) for size, (before, after) in zip(shape, pairs)] + shape[-1:]
+    if kind == 'repeat':
+        return [params[rule['param']]] + shape
+    if kind == 'reshape':
+        target = list(params[rule['param']])
+        if -1 in target:
+            known = math.prod(d for d in target if d != -1)
+            target[target.index(-1)] = math.prod(shape) // known
+        if math.prod(target) != math.prod(shape):
+            raise ValueError(f'cannot reshape {shape} to {target}')
+        return target
+    if kind == 'permute':
+        dims = list(params[rule['param']])
+        if sorted(dims) != list(range(1, len(shape) + 1)):
+            raise ValueError(f'{dims} does not permute rank {len(shape)}')
+        return [shape[d - 1] for d in dims]
+    if kind == 'resize':
+        return [params[rule['height']], params[rule['width']]] + shape[-1:]
+    if kind == 'elementwise':
+        if any(list(s) != shape for s in shapes):
+            raise ValueError('merged shapes differ')
+        return shape
+    if kind == 'concat':
+        axis = params[rule['param']] % (len(shape) + 1) - 1
+        if axis < 0:
+            raise ValueError('cannot concatenate along the batch axis')
+        if any(len(s) != len(shape) or [d for i, d in enumerate(s) if i != axis] !=
+               [d for i, d in enumerate(shape) if i != axis] for s in shapes):
+            raise ValueError('concatenated shapes differ off the axis')
+        return shape[:axis] + [sum(s[axis] for s in shapes)] + shape[axis + 1:]
+    if kind == 'table':
+        return list(rule['table'][','.join(str(d) for d in shape)])
+    raise ValueError(f'no shape rule of kind {kind!r}')
+
+
+def candidate_rules(parameters, merge):
+    """Rules worth testing for a layer with these constructor parameters,
+    most specific first."""
+    if merge:
+        yield {'kind': 'elementwise'}
+        if 'axis' in parameters:
+            yield {'kind': 'concat', 'param': 'axis'}
+        return
+    yield {'kind': 'identity'}
+    for param in AXIS_SIZE_PARAMS:
+        if param in parameters:
+            yield {'kind': 'lastAxis', 'param': param}
+            yield {'kind': 'appendAxis', 'param': param}
+            yield {'kind': 'recurrent', 'param': param}
+    yield {'kind': 'flatten'}
+    for spatial in (1, 2, 3):
+        for kernel in ('kernel_size', 'pool_size'):
+            if kernel in parameters:
+                channels = 'filters' if 'filters' in parameters else None
+                multiplier = 'depth_multiplier' if 'depth_multiplier' in parameters and not channels else None
+                for transposed in (False, True):
+                    yield {'kind': 'window', 'spatial': spatial, 'kernel': kernel, 'channels': channels,
+                           'multiplier': multiplier, 'transposed': transposed}
+        yield {'kind': 'global', 'spatial': spatial}
+        if 'size' in parameters:
+            yield {'kind': 'upsample', 'spatial': spatial, 'param': 'size'}
+        for param, sign in (('padding', 1), ('cropping', -1)):
+            if param in parameters:
+                yield {'kind': 'pad', 'spatial': spatial, 'param': param, 'sign': sign}
+    if 'n' in parameters:
+        yield {'kind': 'repeat', 'param': 'n'}
+    if 'target_shape' in parameters:
+        yield {'kind': 'reshape', 'param': 'target_shape'}
+    if 'dims' in parameters:
+        yield {'kind': 'permute', 'param': 'dims'}
+    if 'height' in parameters and 'width' in parameters:
+        yield {'kind': 'resize', 'height': 'height', 'width': 'width'}
+
+
+def probe_output_shape(layer_class, kwargs, shapes):
+    """Keras' output shape for these inputs (batch axis excluded) from a fresh
+    layer_class(**kwargs), or None if the layer rejects them or answers with
+    an axis it cannot size. Merges are called on symbolic tensors, since
+    their compute_output_shape does not check the inputs agree; other layers
+    answer from input_spec + compute_output_shape, which builds no weights."""
+    batched = [(None,) + tuple(shape) for shape in shapes]
+    try:
+        layer = layer_class(**kwargs)
+        tensors = [keras.KerasTensor(shape) for shape in batched]
+        if len(tensors) > 1:
+            out = layer(tensors).shape
+        else:
+            assert_input_compatibility(layer.input_spec, tensors, layer.name)
+            try:
+                out = layer.compute_output_shape(batched[0])
+            except NotImplementedError:
+                out = layer(tensors[0]).shape
+    except Exception:
+        return None
+    out = list(out)
+    if not out or out[0] is not None or any(not isinstance(d, int) for d in out[1:]):
+        return None
+    return out[1:]
+
+
+def infer_shape_rule(layer_class):
+    """The layer's shapeRule (see the section comment), or None when it
+    cannot be instantiated from PROBE_ARGS or accepts no probed input."""
+    try:
+        parameters = inspect.signature(layer_class.__init__).parameters
+    except (ValueError, TypeError):
+        return None
+    defaults = {name: param.default for name, param in parameters.items()
+                if param.default is not inspect.Parameter.empty}
+    required = [name for name, param in parameters.items()
+                if name not in ('self', 'args', 'kwargs') and name not in defaults
+                and param.kind not in (param.VAR_POSITIONAL, param.VAR_KEYWORD)]
+    if any(name not in PROBE_ARGS for name in required):
+        return None
+    base = {name: PROBE_ARGS[name] for name in required}
+    merge = any(cls.__name__ == 'Merge' for cls in layer_class.__mro__)
+    inputs = []
+    for shape in PROBE_SHAPES:
+        inputs += [[shape, shape], [shape, shape[:-1] + (shape[-1] + 2,)]] if merge else [[shape]]
+
+    probes, ranks = [], set()  # probes: (params, input shapes, output shape)
+    for variant in [{}] + PROBE_VARIANTS:
+        if any(name not in parameters or base.get(name) == value for name, value in variant.items()):
+            continue
+        kwargs = {**base, **variant}
+        for shapes in inputs:
+            out = probe_output_shape(layer_class, kwargs, shapes)
+            if out is not None:
+                probes.append(({**defaults, **kwargs}, shapes, out))
+                if not variant:
+                    ranks.add(len(shapes[0]))
+    if not ranks:
+        return None
+
+    def explains(rule):
+        try:
+            return all(apply_shape_rule(rule, shapes, params) == out for params, shapes, out in probes)
+        except Exception:
+            return False
+
+    for rule in candidate_rules(parameters, merge):
+        if explains(rule):
+            # unset options (channels None, transposed False) stay out of the JSON
+            return {**{key: value for key, value in rule.items() if value not in (None, False)},
+                    'ranks': sorted(ranks)}
+    base_outputs = {tuple(shapes[0]): out for params, shapes, out in probes if len(shapes) == 1
+                    and all(params.get(name) == value for name, value in base.items())}
+    table = {','.join(map(str, shape)): out for shape, out in base_outputs.items()}
+    if not merge and explains({'kind': 'table', 'table': table}):
+        return {'kind': 'table', 'table': table, 'ranks': sorted(ranks)}
+    return {'kind': 'unknown', 'ranks': sorted(ranks)}
+
+
+# =============================================================================
+# Cost rules - parameter count, activation bytes and forward FLOPs per layer
+# =============================================================================
+#
+# Every layer with a shapeRule also gets a 'cost': a rule kind below, evaluated
+# by layer_cost here and by the client's layerCost.ts on the layer's input
+# shape(s), output shape and parameters (defaults filled in; channels last).
+# C is the input's last axis, K the kernel's volume (kernel_size per spatial
+# axis, multiplied), b 0 when params['use_bias'] is False, else 1. The
+# parameter count is checked: a parametric kind is kept only if it reproduces
+# Keras' count_params() on every probe (COST_VARIANTS at the probed ranks),
+# and a parameter-free kind only if Keras counts none. FLOPs are the analytic
+# forward count (multiply-add = 2) and are not checked.
+#
+#   kind        fields                  parameters            forward FLOPs
+#   dense       {param}                 C*u + b*u             2*|in|*u
+#   conv        {spatial, kernel,       K*C/groups*f + b*f    2*K*C/groups*|out|
+#                channels, transposed}                        (transposed: 2*K*f*|in|)
+#   depthwise   {spatial, kernel,       K*C*m + b*C*m         2*K*|out|
+#                multiplier}
+#   separable   {spatial, kernel,       K*C*m + C*m*f + b*f   2*(K + f)*C*m*|out|/f
+#                multiplier, channels}
+#   embedding   {input, output}         params[input]*params[output]      0
+#   recurrent   {param, gates,          g*(C*u + u*u) + g*u*b*(1 + reset) 2*T*g*(C*u + u*u)
+#                resetAfter}            (reset: params[resetAfter] is True; T = in[0])
+#   perChannel  {fixed, flags}          C*(fixed + flags set)             2*|in|
+#   perElement                          |in|                  2*|in|
+#   pool        {spatial, kernel}       0                     K*|out|
+#   reduce                              0                     |in|
+#   merge                               0                     (inputs - 1)*|out|
+#   activation                          0                     |out|
+#   free                                0                     0
+#   unknown                             -                     -
+#
+# activationBytes is the float32 output, 4*|out|, plus for recurrent the
+# 4*T*g*u gate activations a backward pass keeps.
+
+# Single-argument variants that size or switch off weights. The other
+# PROBE_VARIANTS only move the output shape, and 'axis' would move the channel
+# axis off the last one
+COST_VARIANTS = [
+    {'units': 7}, {'filters': 3}, {'output_dim': 9}, {'kernel_size': 2}, {'depth_multiplier': 2},
+    {'use_bias': False}, {'center': False}, {'scale': False}, {'reset_after': False},
+    {'input_dim': 11}, {'groups': 2},
+]
+
+BYTES_PER_ELEMENT = 4
+
+
+def _kernel_volume(params, kernel, spatial):
+    return math.prod(_per_axis(params[kernel], spatial))
+
+
+def layer_cost(cost, shapes, out, params):
+    """{'params', 'flops', 'activationBytes'} of a cost rule on these inputs
+    and output shape (batch axis excluded); None values where unknown."""
+    kind = cost['kind']
+    shape = shapes[0]
+    c, size_in, size_out = shape[-1], math.prod(shape), math.prod(out)
+    b = 0 if params.get('use_bias') is False else 1
+    activation_bytes = BYTES_PER_ELEMENT * size_out
+    if kind == 'dense':
+        u = params[cost['param']]
+        weights, flops = c * u + b * u, 2 * size_in * u
+    elif kind == 'conv':
+        k = _kernel_volume(params, cost['kernel'], cost['spatial'])
+        f, groups = params[cost['channels']], params.get('groups') or 1
+        if c % groups:
+            raise ValueError(f'{c} channels in {groups} groups')
+        weights = k * c // groups * f + b * f
+        flops = 2 * k * f * size_in if cost.get('transposed') else 2 * k * c // groups * size_out
+    elif kind == 'depthwise':
+        k, m = _kernel_volume(params, cost['kernel'], cost['spatial']), params[cost['multiplier']]
+        weights, flops = k * c * m + b * c * m, 2 * k * size_out
+    elif kind == 'separable':
+        k, m = _kernel_volume(params, cost['kernel'], cost['spatial']), params[cost['multiplier']]
+        f = params[cost['channels']]
+        weights = k * c * m + c * m * f + b * f
+        flops = 2 * (k + f) * c * m * (size_out // out[-1])
+    elif kind == 'embedding':
+        weights, flops = params[cost['input']] * params[cost['output']], 0
+    elif kind == 'recurrent':
+        u, g, steps = params[cost['param']], cost['gates'], shape[0]
+        reset = 1 if cost.get('resetAfter') and params.get(cost['resetAfter']) is True else 0
+        weights = g * (c * u + u * u) + g * u * b * (1 + reset)
+        flops = 2 * steps * g * (c * u + u * u)
+        activation_bytes += BYTES_PER_ELEMENT * steps * g * u
+    elif kind == 'perChannel':
+        weights = c * (cost['fixed'] + sum(params.get(flag) is not False for flag in cost['flags']))
+        flops = 2 * size_in
+    elif kind == 'perElement':
+        weights, flops = size_in, 2 * size_in
+    elif kind == 'pool':
+        weights, flops = 0, _kernel_volume(params, cost['kernel'], cost['spatial']) * size_out
+    elif kind == 'reduce':
+        weights, flops = 0, size_in
+    elif kind == 'merge':
+        weights, flops = 0, (len(shapes) - 1) * size_out
+    elif kind == 'activation':
+        weights, flops = 0, size_out
+    elif kind == 'free':
+        weights, flops = 0, 0
+    else:
+        weights = flops = None
+    return {'params': weights, 'flops': flops, 'activationBytes': activation_bytes}
+
+
+def candidate_costs(parameters, shape_rule):
+    """Parametric cost rules worth testing for a layer with these constructor
+    parameters and shape rule, most specific first."""
+    reset_after = 'reset_after' if 'reset_after' in parameters else None
+    if 'units' in parameters:
+        yield {'kind': 'dense', 'param': 'units'}
+        for gates in (1, 3, 4):
+            yield {'kind': 'recurrent', 'param': 'units', 'gates': gates, 'resetAfter': reset_after}
+    if 'input_dim' in parameters and 'output_dim' in parameters:
+        yield {'kind': 'embedding', 'input': 'input_dim', 'output': 'output_dim'}
+    spatial = shape_rule.get('spatial')
+    if spatial and 'kernel_size' in parameters:
+        window = {'spatial': spatial, 'kernel': 'kernel_size'}
+        if 'filters' in parameters and 'depth_multiplier' in parameters:
+            yield {'kind': 'separable', **window, 'multiplier': 'depth_multiplier', 'channels': 'filters'}
+        elif 'filters' in parameters:
+            yield {'kind': 'conv', **window, 'channels': 'filters', 'transposed': shape_rule.get('transposed')}
+        elif 'depth_multiplier' in parameters:
+            yield {'kind': 'depthwise', **window, 'multiplier': 'depth_multiplier'}
+    flags = [flag for flag in ('center', 'scale') if flag in parameters]
+    for fixed in (0, 1, 2):
+        yield {'kind': 'perChannel', 'fixed': fixed, 'flags': flags}
+    yield {'kind': 'perElement'}
+
+
+def parameter_free_cost(shape_rule, category):
+    """The cost rule of a layer Keras counts no weights for, from what its
+    shape rule says it does."""
+    kind = shape_rule['kind']
+    if kind == 'window' and not shape_rule.get('channels') and not shape_rule.get('multiplier'):
+        return {'kind': 'pool', 'spatial': shape_rule['spatial'], 'kernel': shape_rule['kernel']}
+    if kind == 'global':
+        return {'kind': 'reduce'}
+    if kind == 'elementwise':
+        return {'kind': 'merge'}
+    if kind == 'identity' and category in ('Activation', 'Normalization'):
+        return {'kind': 'activation'}
+    if kind in ('unknown', 'table', 'window'):
+        return {'kind': 'unknown'}
+    return {'kind': 'free'}
+
+
+def probe_param_count(layer_class, kwargs, shape):
+    """count_params() of a fresh layer_class(**kwargs) built for this input
+    (batch axis excluded), or None if it fails. build() alone, not a symbolic
+    call, and every *_initializer 'zeros': a random initializer compiles
+    anew for each weight shape, which made the probes take a minute."""
+    parameters = inspect.signature(layer_class.__init__).parameters
+    zeros = {name: 'zeros' for name in parameters if name.endswith('_initializer') and name not in kwargs}
+    try:
+        layer = layer_class(**kwargs, **zeros)
+        layer.build((None,) + tuple(shape))
+        return layer.count_params()
+    except Exception:
+        return None
+
+
+def infer_cost(layer_class, shape_rule, category):
+    """The layer's cost rule (see the section comment), or None without a
+    shape rule to size its output."""
+    if shape_rule is None:
+        return None
+    if shape_rule['kind'] in ('elementwise', 'concat'):  # merges hold no weights
+        return {'kind': 'merge'} if shape_rule['kind'] == 'elementwise' else {'kind': 'free'}
+    parameters = inspect.signature(layer_class.__init__).parameters
+    defaults = {name: param.default for name, param in parameters.items()
+                if param.default is not inspect.Parameter.empty}
+    base = {name: PROBE_ARGS[name] for name, param in parameters.items()
+            if name not in ('self', 'args', 'kwargs') and name not in defaults
+            and param.kind not in (param.VAR_POSITIONAL, param.VAR_KEYWORD)}
+    shapes = [shape for shape in PROBE_SHAPES if len(shape) in shape_rule['ranks']]
+
+    probes = []  # (params, input shapes, output shape, Keras' parameter count)
+    for variant in [{}] + COST_VARIANTS:
+        if any(name not in parameters or base.get(name) == value for name, value in variant.items()):
+            continue
+        kwargs = {**base, **variant}
+        params = {**defaults, **kwargs}
+        for shape in shapes:
+            try:
+                out = apply_shape_rule(shape_rule, [shape], params)
+            except Exception:
+                continue
+            count = probe_param_count(layer_class, kwargs, shape)
+            if count is not None:
+                probes.append((params, [shape], out, count))
+    if not probes:
+        return {'kind': 'unknown'}
+    if all(count == 0 for *_, count in probes):
+        return parameter_free_cost(shape_rule, category)
+
+    def explains(cost):
+        try:
+            return all(layer_cost(cost, shapes, out, params)['params'] == count
+                       for params, shapes, out, count in probes)
+        except Exception:
+            return False
+
+    for cost in candidate_costs(parameters, shape_rule):
+        if explains(cost):
+            return {key: value for key, value in cost.items() if value is not None and value is not False}
+    return {'kind': 'unknown'}
+
+
 # Preferred canonical names (when multiple names point to same class, use these)
 PREFERRED_NAMES = [
     # Convolution: prefer Conv* over Convolution*
@@ -429,7 +982,103 @@ def get_all_layers():
     return all_layers, aliases
 
 
-def generate_layers_json():
+# =============================================================================
+# Per-layer introspection: cached, in worker processes
+# =============================================================================
+
+# Layers that are not offered: internal/base classes
+SKIPPED_LAYERS = ('Layer', 'InputLayer', 'TFSMLayer', 'Wrapper')
+
+# Any edit to this script may change what a layer introspects to
+GENERATOR_SHA256 = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+_SOURCE_DIGESTS = {}
+
+
+def _source_digest(cls):
+    """sha256 of the file defining cls, memoized. The whole module rather than
+    inspect.getsource(cls), which re-parses the module for every class."""
+    module = sys.modules.get(cls.__module__)
+    path = getattr(module, '__file__', None)
+    if path is None:
+        return f'{cls.__module__}.{cls.__qualname__}'
+    if path not in _SOURCE_DIGESTS:
+        _SOURCE_DIGESTS[path] = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    return _SOURCE_DIGESTS[path]
+
+
+def layer_cache_key(layer_class):
+    """What a layer's introspection depends on: the Keras version and
+    backend (shape rules and costs are probed through it), the sources of
+    every Keras class it inherits from (inherited __init__ and
+    compute_output_shape included) and this script."""
+    digest = hashlib.sha256(f'{keras.__version__}\0{keras.backend.backend()}\0{GENERATOR_SHA256}'.encode())
+    for cls in layer_class.__mro__:
+        if cls.__module__.startswith('keras'):
+            digest.update(f'{cls.__qualname__}\0{_source_digest(cls)}\0'.encode())
+    return digest.hexdigest()
+
+
+def introspect_layer(layer_name):
+    """Parameters and shape rule of keras.layers.<layer_name>, plus the
+    seconds it took. Module-level so worker processes can run it."""
+    started = time.perf_counter()
+    layer_class = getattr(layers, layer_name)
+    info = {'parameters': extract_layer_info(layer_class)}
+    shape_rule = infer_shape_rule(layer_class)
+    if shape_rule is not None:
+        info['shapeRule'] = shape_rule
+        info['cost'] = infer_cost(layer_class, shape_rule, LAYER_CATEGORIES.get(layer_name, 'Other'))
+    return info, time.perf_counter() - started
+
+
+def introspect_layers(all_layers, jobs, cache_dir, incremental):
+    """Introspect every layer in all_layers: from the cache when incremental
+    and the layer's key is unchanged, else serially (jobs == 1) or on a
+    spawned process pool (forking after the backend import is not safe).
+    Results go through a JSON round trip either way, so a cached and a fresh
+    result serialize identically. Returns {name: info} and the timing."""
+    cache_path = cache_dir / 'layers.json' if cache_dir else None
+    cache = json.loads(cache_path.read_text()) if cache_path and cache_path.exists() else {}
+    keys = {name: layer_cache_key(layer_class) for name, layer_class in all_layers.items()}
+    results = {}
+    if incremental:
+        for name, key in keys.items():
+            entry = cache.get(name)
+            if entry and entry['key'] == key:
+                results[name] = entry['info']
+    stale = sorted(name for name in all_layers if name not in results)
+
+    started = time.perf_counter()
+    seconds = {}
+    if jobs <= 1 or len(stale) <= 1:
+        for name in stale:
+            results[name], seconds[name] = introspect_layer(name)
+    else:
+        spawn = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(jobs, len(stale)), mp_context=spawn) as pool:
+            futures = {pool.submit(introspect_layer, name): name for name in stale}
+            for future in as_completed(futures):
+                results[futures[future]], seconds[futures[future]] = future.result()
+    for name in stale:
+        results[name] = json.loads(json.dumps(results[name]))
+    timing = {
+        'introspected': len(stale),
+        'cached': len(all_layers) - len(stale),
+        'jobs': 1 if jobs <= 1 or len(stale) <= 1 else min(jobs, len(stale)),
+        'seconds': time.perf_counter() - started,
+        'slowest': sorted(seconds.items(), key=lambda item: -item[1])[:3],
+    }
+
+    if cache_path:
+        cache = {name: {'key': keys[name], 'info': results[name]} for name in sorted(all_layers)}
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps(cache))
+    return results, timing
+
+
+def generate_layers_json(jobs=1, cache_dir=None, incremental=False):
     """Generate the complete layers JSON structure."""
     all_layers, aliases = get_all_layers()
 
@@ -439,24 +1088,24 @@ def generate_layers_json():
         for alias in alias_list:
             alias_to_canonical[alias] = canonical
 
-    layers_dict = {}
+    # Skip internal/base classes and backend-specific layers (category
+    # starts with '_')
+    offered = {
+        name: layer_class for name, layer_class in all_layers.items()
+        if name not in SKIPPED_LAYERS and not LAYER_CATEGORIES.get(name, 'Other').startswith('_')
+    }
+    introspected, timing = introspect_layers(offered, jobs, cache_dir, incremental)
 
-    for layer_name, layer_class in sorted(all_layers.items()):
-        # Skip internal/base classes
-        if layer_name in ('Layer', 'InputLayer', 'TFSMLayer', 'Wrapper'):
-            continue
+    layers_dict = {}
 
+    for layer_name in sorted(offered):
         category = LAYER_CATEGORIES.get(layer_name, 'Other')
-
-        # Skip backend-specific layers (category starts with '_')
-        if category.startswith('_'):
-            continue
-        params = extract_layer_info(layer_class)
+        info = introspected[layer_name]
 
         layer_info = {
             'category': category,
             'preferredName': layer_name,  # Per-layer preferred name (editable)
-            'parameters': params,
+            'parameters': info['parameters'],
             'input': {
                 'shape': 'Arbitrary'  # Could be enhanced with docstring parsing
             },
@@ -465,6 +1114,10 @@ def generate_layers_json():
             }
         }
 
+        if 'shapeRule' in info:
+            layer_info['shapeRule'] = info['shapeRule']
+            layer_info['cost'] = info['cost']
+
         # Add aliases if any exist
         if aliases.get(layer_name):
             layer_info['aliases'] = aliases[layer_name]
@@ -491,7 +1144,9 @@ def generate_layers_json():
         'preferredName': 'Output',
         'parameters': {},
         'input': {'shape': 'Arbitrary'},
-        'output': {'shape': ['Arbitrary']}
+        'output': {'shape': ['Arbitrary']},
+        'shapeRule': {'kind': 'identity'},
+        'cost': {'kind': 'free'}
     }
 
     # Final structure with both layers and the alias lookup
@@ -500,14 +1155,37 @@ def generate_layers_json():
         'layers': layers_dict
     }
 
-    return result, aliases
+    return result, aliases, timing
 
 
 def main():
-    import sys
-
-    data, aliases = generate_layers_json()
-    print(json.dumps(data, indent=4, sort_keys=False))
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', type=Path,
+                        help='write the JSON here, only if it changed (default: stdout)')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='introspection worker processes (default: 1, in-process); each worker '
+                             'pays its own Keras import, so this pays off for slow backends or '
+                             'large full runs')
+    parser.add_argument('--incremental', action='store_true',
+                        help='reuse cached results of layers whose class and Keras version are unchanged')
+    parser.add_argument('--cache-dir', type=Path, default=Path.home() / '.cache' / 'nnvp-keras-layers',
+                        help='per-layer introspection cache (default: ~/.cache/nnvp-keras-layers)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='neither read nor write the cache (implies a full run)')
+    args = parser.parse_args()
+
+    data, aliases, timing = generate_layers_json(
+        jobs=args.jobs, cache_dir=None if args.no_cache else args.cache_dir,
+        incremental=args.incremental and not args.no_cache,
+    )
+    text = json.dumps(data, indent=4, sort_keys=False) + '\n'
+    if args.output is None:
+        sys.stdout.write(text)
+    elif not args.output.exists() or args.output.read_text() != text:
+        args.output.write_text(text)
+        print(f"# Wrote {args.output}", file=sys.stderr)
+    else:
+        print(f"# {args.output} unchanged", file=sys.stderr)
 
     # Print summary to stderr
     layers_dict = data['layers']
@@ -533,6 +1211,13 @@ def main():
         for canonical, alias_list in sorted(aliases_with_values.items()):
             print(f"#   {canonical} <- {', '.join(alias_list)}", file=sys.stderr)
 
+    print(f"\n# Keras {keras.__version__} import: {KERAS_IMPORT_SECONDS:.2f}s", file=sys.stderr)
+    print(f"# Introspected {timing['introspected']} layers in {timing['seconds']:.2f}s "
+          f"on {timing['jobs']} process(es), {timing['cached']} from the cache", file=sys.stderr)
+    if timing['slowest']:
+        slowest = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in timing['slowest'])
+        print(f"# Slowest: {slowest}", file=sys.stderr)
+
 
 if __name__ == '__main__':
     main()
@@ -8,14 +8,24 @@ keep in sync with nnvp-client-vue/src/lib/JSDatasets/text-vocab.ts), and writes:
     <out>/tinyshakespeare/tinyshakespeare.txt
     <out>/gutenberg_poetry/gutenberg_poetry.txt
 
-then prints each file's size and SRI integrity string ("sha256-<base64>").
+plus, next to each .txt, a pre-encoded <name>.tokens (see write_tokens) the
+client loads zero-copy instead of encoding the text in the tab, then prints
+each file's size and SRI integrity string ("sha256-<base64>"). With
+--shard-mb, each corpus is also cut into <name>_shard_NNN.bin pieces under a
+<name>.shards.json manifest (see write_shards) so the client can start
+training on the first shard while the rest downloads. With --window-seq-lens,
+each corpus also gets a <name>.windows-<seqLen>.bin per listed seqLen: the
+train/test window start tables, pre-shuffled (see write_windows), optionally
+without the windows that lie entirely inside repeated boilerplate.
 
 To publish:
   1. upload each directory to the datasets CDN, preserving the layout above
      (they end up next to mnist/, cifar10/, ... under the cdnDir);
   2. paste the printed integrity strings into the matching `textChecksum`
      fields of nnvp-client-vue/src/lib/JSDatasets/datasets-sources.ts
-     (they ship as null until then, which skips subresource integrity).
+     (they ship as null until then, which skips subresource integrity), and
+     add the tokensPath / shardsPath / windowsPath entries of the files you
+     uploaded, each with its checksum — the loader only asks for listed files.
 
 Sources:
   - Tiny Shakespeare: karpathy/char-rnn (public domain text).
@@ -23,6 +33,25 @@ Sources:
     public-domain poetry from Project Gutenberg, served as gzipped ndjson.
     Whole books are taken in corpus order until the size budget is reached,
     so the corpus keeps long runs of one voice instead of shuffled lines.
+    With --gutenberg-dedup, repeated editions and anthologies are thinned out
+    on the way in (see Deduplicator): a line already kept is dropped, so is a
+    stanza nearly identical to one already kept, and the budget fills with
+    distinct text. It is off by default, so the published tiers stay the
+    plain corpus-order prefix unless a build asks for it.
+    The download is streamed (gzip decoded incrementally, one book in memory
+    at a time) and stops as soon as the budget is met; --gutenberg-source
+    points it at a local copy or fixture instead.
+
+The corpora are built in parallel (downloads on threads, normalization in
+worker processes). The small sources are downloaded once into --cache-dir and
+revalidated with ETag / Last-Modified afterwards. The Gutenberg corpus is
+still streamed from its source (only the budget's worth is read); its ETag /
+Last-Modified stand in for its bytes, and --cache-gutenberg-source downloads
+it whole into the cache instead. An output — a corpus, or a .tokens, shard or
+window file derived from one — is rebuilt only when its source, this script
+or its parameters changed (or the file on disk no longer matches what was
+built), so re-running with only a new --gutenberg-budget-mb rebuilds only the
+Gutenberg files. --no-cache always rebuilds.
 """
 
 import argparse
@@ -30,10 +59,19 @@ import base64
 import gzip
 import hashlib
 import json
+import math
+import re
+import struct
 import sys
 import unicodedata
+import urllib.error
+import zlib
 import urllib.request
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Optional
 
 SHAKESPEARE_URL = (
     "https://raw.githubusercontent.com/karpathy/char-rnn/master/data/tinyshakespeare/input.txt"
@@ -44,6 +82,29 @@ GUTENBERG_URL = "http://static.decontextualize.com/gutenberg-poetry-v001.ndjson.
 # perfect to specialize a poetry-pretrained model onto.
 SONNETS_URL = "https://www.gutenberg.org/cache/epub/1041/pg1041.txt"
 
+# Every output's build_key includes this script's own hash: a change to the
+# normalizer, the Deduplicator or any writer rebuilds what it produced.
+SCRIPT_SHA256 = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+# The client's text-vocab.ts, in index order: '\n' then printable ASCII.
+VOCAB = "\n" + "".join(chr(code) for code in range(32, 127))
+# Keep in sync with TRAIN_FRACTION in text-data-loader.ts.
+TRAIN_FRACTION = 0.9
+# .tokens layout: magic, then little-endian uint32 vocab size, vocab hash,
+# corpus length and test-region offset, then one vocab index byte per char.
+TOKENS_MAGIC = b"NNVPTOK1"
+TOKENS_HEADER = struct.Struct("<8s4I")
+# .windows-<seqLen>.bin layout: magic, then little-endian uint32 seqLen,
+# corpus length, test-region offset, seed, flags (WINDOWS_DEDUP) and the
+# train / test window counts, then those uint32 window starts (the test ones
+# relative to the test-region offset).
+WINDOWS_MAGIC = b"NNVPWIN1"
+WINDOWS_HEADER = struct.Struct("<8s7I")
+WINDOWS_DEDUP = 1
+# A non-blank line seen this many times counts as boilerplate for
+# --dedup-windows (running headers, license lines, refrains).
+BOILERPLATE_REPEATS = 3
+
 # A few common non-ASCII characters worth mapping instead of dropping.
 TRANSLITERATIONS = {
     "‘": "'", "’": "'", "‚": "'", "‛": "'",
@@ -54,22 +115,58 @@ TRANSLITERATIONS = {
 }
 
 
+class _VocabTable(dict):
+    """str.translate table: code point -> what normalize keeps of it, filled
+    on first sight. Every step is per character — transliteration keys are
+    single characters, NFKD decomposes each code point on its own (canonical
+    reordering only moves combining marks, which are dropped anyway) and
+    the vocabulary filter is a character test — so one lookup per character
+    gives exactly what the whole-text pipeline gives."""
+
+    def __missing__(self, code: int) -> Optional[str]:
+        # Transliterate, strip accents (NFKD base letters survive), then drop
+        # whatever remains outside the vocabulary.
+        char = chr(code)
+        decomposed = unicodedata.normalize("NFKD", TRANSLITERATIONS.get(char, char))
+        kept = "".join(c for c in decomposed if c == "\n" or 32 <= ord(c) <= 126)
+        self[code] = value = kept if kept else None
+        return value
+
+
+_VOCAB_TABLE = _VocabTable()
+for _code in range(128):  # prefilled: keeps str.translate on its ASCII fast path
+    _VOCAB_TABLE.__missing__(_code)
+# The blank-line runs the dropped characters may have left (a literal
+# prefix, so the regex engine scans for it at memchr speed).
+_BLANK_RUN = re.compile("\n\n\n+")
+
+
 def normalize(text: str) -> str:
     """Force `text` into the client's fixed vocabulary: \\n + ASCII 32..126."""
-    for source, replacement in TRANSLITERATIONS.items():
-        text = text.replace(source, replacement)
-    # Strip accents (NFKD base letters survive), then drop whatever remains
-    # outside the vocabulary.
-    text = unicodedata.normalize("NFKD", text)
-    kept = []
-    for char in text:
-        if char == "\n" or 32 <= ord(char) <= 126:
-            kept.append(char)
-    text = "".join(kept)
-    # Collapse the blank-line runs the dropped characters may have left.
-    while "\n\n\n" in text:
-        text = text.replace("\n\n\n", "\n\n")
-    return text
+    return _BLANK_RUN.sub("\n\n", text.translate(_VOCAB_TABLE))
+
+
+def normalize_chunks(chunks, buffer_chars: int = 1 << 16):
+    """normalize() over an iterable of str chunks (e.g. the lines of a text
+    file), yielding normalized pieces whose concatenation is exactly
+    normalize("".join(chunks)). Chunks are batched to ~buffer_chars before
+    normalizing (per-line calls would be overhead-bound), and a trailing
+    newline run is held back until the next batch shows whether it goes on."""
+    pending, batch, size = "", [], 0
+    for chunk in chunks:
+        batch.append(chunk)
+        size += len(chunk)
+        if size < buffer_chars:
+            continue
+        text = normalize(pending + "".join(batch))
+        batch, size = [], 0
+        body = text.rstrip("\n")
+        pending = text[len(body):]
+        if body:
+            yield body
+    text = normalize(pending + "".join(batch))
+    if text:
+        yield text
 
 
 def fetch(url: str) -> bytes:
@@ -78,16 +175,80 @@ def fetch(url: str) -> bytes:
         return response.read()
 
 
-def prepare_shakespeare(out_dir: Path) -> Path:
-    text = normalize(fetch(SHAKESPEARE_URL).decode("utf-8"))
-    path = out_dir / "tinyshakespeare" / "tinyshakespeare.txt"
+def read_source(source: str) -> bytes:
+    """A URL (fetched) or a local path (e.g. a download-cache entry)."""
+    return fetch(source) if "://" in source else Path(source).read_bytes()
+
+
+def fetch_cached(url: str, cache_dir: Path) -> tuple[Path, str]:
+    """Download `url` into `cache_dir` once: (local path, sha256 of the bytes).
+    Entries are named after the URL's hash, with a JSON sidecar holding the
+    response's ETag / Last-Modified for revalidation — an unchanged source
+    answers 304 and is not downloaded again. file:// URLs ignore the
+    conditional headers and are simply re-read (local, so cheap)."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    stem = hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+    data_path = cache_dir / stem
+    meta_path = cache_dir / f"{stem}.json"
+    meta = json.loads(meta_path.read_text()) if meta_path.exists() and data_path.exists() else {}
+    request = urllib.request.Request(url)
+    if meta.get("etag"):
+        request.add_header("If-None-Match", meta["etag"])
+    if meta.get("lastModified"):
+        request.add_header("If-Modified-Since", meta["lastModified"])
+    partial = cache_dir / f"{stem}.part"
+    digest = hashlib.sha256()
+    try:
+        with urllib.request.urlopen(request) as response, partial.open("wb") as f:  # noqa: S310
+            print(f"downloading {url} ...", flush=True)
+            while block := response.read(1 << 20):
+                f.write(block)
+                digest.update(block)
+            headers = response.headers
+    except urllib.error.HTTPError as error:
+        partial.unlink(missing_ok=True)
+        if error.code != 304:
+            raise
+        print(f"cached {url} (not modified)", flush=True)
+        return data_path, meta["sha256"]
+    partial.replace(data_path)
+    meta = {"url": url, "etag": headers.get("ETag"), "lastModified": headers.get("Last-Modified"),
+            "sha256": digest.hexdigest()}
+    meta_path.write_text(json.dumps(meta))
+    return data_path, meta["sha256"]
+
+
+def probe_source(source: str) -> tuple[str, Optional[str]]:
+    """For a source build_all streams instead of caching: (the source, an
+    identity standing in for the sha256 of its bytes). A local path or
+    file:// URL is hashed as it is; a remote one is identified by its ETag /
+    Last-Modified (a HEAD request, no body read), or None when the server
+    sends neither, and the output is then always rebuilt."""
+    if "://" not in source or source.startswith("file://"):
+        local = Path(urllib.request.url2pathname(source[len("file://"):])) if "://" in source else Path(source)
+        return source, file_sha256(local)
+    with urllib.request.urlopen(urllib.request.Request(source, method="HEAD")) as response:  # noqa: S310
+        validators = [response.headers.get("ETag"), response.headers.get("Last-Modified")]
+    if not any(validators):
+        return source, None
+    return source, hashlib.sha256(json.dumps([source, *validators]).encode("utf-8")).hexdigest()
+
+
+def output_path(out_dir: Path, name: str) -> Path:
+    path = out_dir / name / f"{name}.txt"
     path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def prepare_shakespeare(out_dir: Path, source: str = SHAKESPEARE_URL) -> Path:
+    text = normalize(read_source(source).decode("utf-8"))
+    path = output_path(out_dir, "tinyshakespeare")
     path.write_text(text, encoding="ascii")
     return path
 
 
-def prepare_sonnets(out_dir: Path) -> Path:
-    raw = fetch(SONNETS_URL).decode("utf-8-sig")
+def prepare_sonnets(out_dir: Path, source: str = SONNETS_URL) -> Path:
+    raw = read_source(source).decode("utf-8-sig")
     # Strip the Project Gutenberg boilerplate around the actual text.
     start = raw.find("*** START OF")
     start = raw.find("\n", start) + 1 if start != -1 else 0
@@ -95,50 +256,443 @@ def prepare_sonnets(out_dir: Path) -> Path:
     if end == -1:
         end = len(raw)
     text = normalize(raw[start:end].strip() + "\n")
-    path = out_dir / "shakespeare_sonnets" / "shakespeare_sonnets.txt"
-    path.parent.mkdir(parents=True, exist_ok=True)
+    path = output_path(out_dir, "shakespeare_sonnets")
     path.write_text(text, encoding="ascii")
     return path
 
 
-def prepare_gutenberg(out_dir: Path, budget_bytes: int, name: str = "gutenberg_poetry") -> Path:
-    raw = gzip.decompress(fetch(GUTENBERG_URL))
-    lines_by_book: dict[str, list[str]] = {}
-    book_order: list[str] = []
-    for raw_line in raw.splitlines():
-        if not raw_line:
-            continue
-        entry = json.loads(raw_line)
-        gid = str(entry["gid"])
-        if gid not in lines_by_book:
-            lines_by_book[gid] = []
-            book_order.append(gid)
-        lines_by_book[gid].append(entry["s"])
-
-    chunks: list[str] = []
+class CountingReader:
+    """Binary stream wrapper counting the bytes actually pulled through it."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.count += len(data)
+        return data
+
+
+def open_source(source: str):
+    """A URL (http(s)://, file://) or a local path, as a binary stream."""
+    print(f"streaming {source} ...", flush=True)
+    if "://" in source:
+        return urllib.request.urlopen(source)  # noqa: S310 - fixed URLs above, or the user's own --*-source
+    return open(source, "rb")
+
+
+class BoundedHashSet:
+    """Set of 64-bit fingerprints in a fixed direct-mapped table: memory is
+    capped at 8 bytes per slot whatever the corpus size, at the price of
+    forgetting a fingerprint when a later one lands in its slot (a missed
+    duplicate, never a false one)."""
+
+    def __init__(self, slots: int):
+        self.table = array("Q", bytes(8 * slots))
+
+    def add(self, fingerprint: int) -> bool:
+        """Insert; True if the fingerprint was already present."""
+        fingerprint = fingerprint or 1  # 0 marks an empty slot
+        slot = fingerprint % len(self.table)
+        if self.table[slot] == fingerprint:
+            return True
+        self.table[slot] = fingerprint
+        return False
+
+
+def fingerprint(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+class Deduplicator:
+    """Line- and stanza-level duplicate filter for prepare_gutenberg.
+
+    Near-duplicate: a book's lines are grouped into STANZA_LINES-line
+    stanzas, each MinHashed over its character 5-grams (MINHASH_BANDS x
+    MINHASH_ROWS values) and LSH-banded; a stanza sharing any band with an
+    earlier one is dropped. Punctuation and case are ignored, and 8-row
+    bands put the threshold near 0.85 Jaccard: re-punctuated or lightly
+    re-spelled editions go, unrelated stanzas (~0.1% false hits on
+    Zipf-distributed word salad) stay. Exact: a
+    line whose letters and digits (case and punctuation ignored) were
+    already kept is dropped — unless shorter than DEDUP_MIN_LINE_CHARS,
+    where repeats are ordinary ("O my love!"). Both sets are BoundedHashSets, so memory stays
+    at `memory_bytes` however much of the corpus streams through."""
+
+    DEDUP_MIN_LINE_CHARS = 20
+    STANZA_LINES = 4
+    SHINGLE_CHARS = 5
+    MINHASH_BANDS = 4
+    MINHASH_ROWS = 8
+    _NOT_ALNUM = re.compile(r"[^a-z0-9]+")
+
+    def __init__(self, memory_bytes: int = 64_000_000):
+        self.lines = BoundedHashSet(memory_bytes // 16)
+        self.bands = BoundedHashSet(memory_bytes // 16)
+        self.lines_seen = self.lines_dropped = 0
+        self.stanzas_seen = self.stanzas_dropped = 0
+        self.bytes_dropped = 0
+
+    def _key(self, line: str) -> str:
+        return self._NOT_ALNUM.sub(" ", line.lower()).strip()
+
+    def _band_fingerprints(self, key: bytes) -> list[int]:
+        # One-permutation MinHash: each shingle's 64-bit hash goes to the bin
+        # its top bits pick, and a bin keeps its minimum — one pass over the
+        # shingles instead of one per signature value.
+        bins = self.MINHASH_BANDS * self.MINHASH_ROWS
+        signature = [1 << 64] * bins  # an empty bin stays at the sentinel
+        for shingle in {key[i:i + self.SHINGLE_CHARS] for i in range(len(key) - self.SHINGLE_CHARS + 1)}:
+            value = (zlib.crc32(shingle) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+            slot = value * bins >> 64
+            if value < signature[slot]:
+                signature[slot] = value
+        return [fingerprint(struct.pack(f"<{1 + self.MINHASH_ROWS}Q", band,
+                                        *(value & 0xFFFFFFFFFFFFFFFF for value in
+                                          signature[band * self.MINHASH_ROWS:(band + 1) * self.MINHASH_ROWS])))
+                for band in range(self.MINHASH_BANDS)]
+
+    def filter_book(self, lines: list[str]) -> list[str]:
+        """The book's lines minus the duplicates, stats updated: near-duplicate
+        stanzas first (a re-edited stanza still has its lines together), then
+        repeated lines among the stanzas kept."""
+        kept = []
+        for start in range(0, len(lines), self.STANZA_LINES):
+            stanza = lines[start:start + self.STANZA_LINES]
+            key = " ".join(map(self._key, stanza)).encode("utf-8")
+            if len(key) >= self.STANZA_LINES * self.DEDUP_MIN_LINE_CHARS:
+                self.stanzas_seen += 1
+                # Every band is inserted (no short-circuit): a dropped stanza is
+                # near a kept one, so its bands are as good a reference.
+                if any([self.bands.add(band) for band in self._band_fingerprints(key)]):
+                    self.stanzas_dropped += 1
+                    self.lines_seen += len(stanza)
+                    self.bytes_dropped += sum(len(normalize(line)) + 1 for line in stanza)
+                    continue
+            kept.extend(stanza)
+        result = []
+        for line in kept:
+            self.lines_seen += 1
+            key = self._key(line)
+            if len(key) >= self.DEDUP_MIN_LINE_CHARS and self.lines.add(fingerprint(key.encode("utf-8"))):
+                self.lines_dropped += 1
+                self.bytes_dropped += len(normalize(line)) + 1
+                continue
+            result.append(line)
+        return result
+
+    def summary(self) -> str:
+        return (f"dedup: dropped {self.lines_dropped}/{self.lines_seen} repeated lines and"
+                f" {self.stanzas_dropped}/{self.stanzas_seen} near-duplicate stanzas,"
+                f" {self.bytes_dropped / 1e6:.2f} MB of budget freed for distinct text")
+
+
+def prepare_gutenberg(out_dir: Path, budget_bytes: int, name: str = "gutenberg_poetry",
+                      source: str = GUTENBERG_URL, dedup: bool = False,
+                      dedup_memory_bytes: int = 64_000_000) -> Path:
+    """Whole books in corpus order until `budget_bytes`, streamed: the ndjson
+    is decoded line by line and each book is normalized and written out when
+    the next one starts, so memory holds one book whatever the corpus size,
+    and reading stops at the book that meets the budget. The corpus lists
+    each book's lines contiguously (gid order); a gid seen again later would
+    become a separate book here, and is counted and reported. With `dedup`,
+    each book goes through a Deduplicator (bounded to dedup_memory_bytes)
+    first, and a book left empty is skipped."""
+    path = output_path(out_dir, name)
     total = 0
     books_taken = 0
-    for gid in book_order:
-        book = normalize("\n".join(lines_by_book[gid])) + "\n\n"
-        chunks.append(book)
-        total += len(book)
-        books_taken += 1
-        if total >= budget_bytes:
-            break
-    print(f"kept {books_taken} books out of {len(book_order)}")
+    decompressed = 0
+    seen: set[str] = set()
+    revisited = 0
+    starts = []  # each book's offset in the output, for write_shards' manifest
+    deduplicator = Deduplicator(dedup_memory_bytes) if dedup else None
+    with open_source(source) as raw, path.open("w", encoding="ascii") as out:
+        counter = CountingReader(raw)
+        gid, lines = None, []
 
-    path = out_dir / name / f"{name}.txt"
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text("".join(chunks), encoding="ascii")
+        def flush() -> bool:
+            """Write the pending book; True once the budget is met."""
+            nonlocal total, books_taken
+            kept = deduplicator.filter_book(lines) if deduplicator else lines
+            if not kept:
+                return False
+            book = normalize("\n".join(kept)) + "\n\n"
+            starts.append(total)
+            out.write(book)
+            total += len(book)
+            books_taken += 1
+            return total >= budget_bytes
+
+        with gzip.GzipFile(fileobj=counter) as ndjson:
+            for raw_line in ndjson:
+                decompressed += len(raw_line)
+                if not raw_line.strip():
+                    continue
+                entry = json.loads(raw_line)
+                entry_gid = str(entry["gid"])
+                if entry_gid != gid:
+                    if gid is not None and flush():
+                        gid = None
+                        break
+                    if entry_gid in seen:
+                        revisited += 1
+                    seen.add(entry_gid)
+                    gid, lines = entry_gid, []
+                lines.append(entry["s"])
+        if gid is not None:  # the source ran out before the budget
+            flush()
+    books_path(path).write_text(json.dumps(starts))
+    print(f"kept {books_taken} books ({total / 1e6:.2f} MB) after reading"
+          f" {counter.count / 1e6:.2f} MB compressed / {decompressed / 1e6:.2f} MB of ndjson")
+    if deduplicator:
+        print(deduplicator.summary())
+    if revisited:
+        print(f"warning: {revisited} books were not contiguous in the source and were split")
+    return path
+
+
+def vocab_hash(vocab: str = VOCAB) -> int:
+    """32-bit FNV-1a over the vocabulary's characters in index order — the
+    same value text-vocab.ts computes, so a .tokens file encoded against
+    another vocabulary is refused instead of silently misread."""
+    value = 0x811C9DC5
+    for char in vocab:
+        value = ((value ^ ord(char)) * 0x01000193) & 0xFFFFFFFF
+    return value
+
+
+# bytes.translate table: normalized ASCII -> vocab index.
+_TOKEN_TABLE = bytes(VOCAB.index(chr(code)) if chr(code) in VOCAB else VOCAB.index(" ")
+                     for code in range(256))
+
+
+def books_path(text_path: Path) -> Path:
+    """Sidecar listing each book's start offset in a multi-book corpus."""
+    return text_path.with_suffix(".books.json")
+
+
+def tokens_path(text_path: Path) -> Path:
+    return text_path.with_suffix(".tokens")
+
+
+def write_tokens(text_path: Path) -> Path:
+    """Encode a normalized corpus into <stem>.tokens next to it: the header
+    (TOKENS_HEADER), then the text as vocab indices, one byte each."""
+    data = text_path.read_bytes()
+    split = math.floor(len(data) * TRAIN_FRACTION)
+    path = tokens_path(text_path)
+    with path.open("wb") as f:
+        f.write(TOKENS_HEADER.pack(TOKENS_MAGIC, len(VOCAB), vocab_hash(), len(data), split))
+        f.write(data.translate(_TOKEN_TABLE))
+    return path
+
+
+def sri(data: bytes) -> str:
+    return "sha256-" + base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")
+
+
+def boilerplate_runs(text: str) -> list[tuple[int, int]]:
+    """[start, end) spans of consecutive boilerplate lines (non-blank lines
+    occurring at least BOILERPLATE_REPEATS times), newlines included."""
+    lines = text.split("\n")
+    counts = Counter(line for line in lines if line.strip())
+    runs: list[tuple[int, int]] = []
+    offset = 0
+    for line in lines:
+        end = offset + len(line) + 1
+        if line.strip() and counts[line] >= BOILERPLATE_REPEATS:
+            if runs and runs[-1][1] == offset:
+                runs[-1] = (runs[-1][0], end)
+            else:
+                runs.append((offset, end))
+        offset = end
+    return runs
+
+
+def window_starts(begin: int, end: int, seq_len: int, runs: list[tuple[int, int]]) -> array:
+    """Starts of the windows (seq_len chars + their label) inside [begin, end),
+    relative to begin, skipping those lying entirely inside one of `runs`."""
+    starts = array("I")
+    cursor = begin
+    for run_start, run_end in runs:
+        # Windows starting in [run_start, run_end - seq_len - 1] stay inside the run.
+        skip_from, skip_to = max(run_start, begin), min(run_end - seq_len, end - seq_len)
+        if skip_from >= skip_to:
+            continue
+        starts.extend(range(cursor - begin, skip_from - begin))
+        cursor = max(cursor, skip_to)
+    starts.extend(range(cursor - begin, max(end - seq_len, cursor) - begin))
+    return starts
+
+
+def shuffled(values: array, seed: int) -> array:
+    """`values` shuffled in place by numpy.random.default_rng(seed), through a
+    uint32 view of the array's own buffer (random.shuffle would need a list
+    of int objects — gigabytes for the large tiers). The same seed gives the
+    same table; numpy is only needed for --window-seq-lens."""
+    import numpy  # noqa: PLC0415 - the only numpy user; the rest of the script is stdlib
+    numpy.random.default_rng(seed).shuffle(numpy.frombuffer(values, dtype=numpy.uint32))
+    return values
+
+
+def windows_path(text_path: Path, seq_len: int) -> Path:
+    return text_path.with_suffix(f".windows-{seq_len}.bin")
+
+
+def write_windows(text_path: Path, seq_len: int, seed: int = 0, dedup: bool = False) -> Path:
+    """<stem>.windows-<seq_len>.bin: every train and test window start of the
+    corpus (the loader's TRAIN_FRACTION split), each table shuffled with its
+    own seeded stream; with `dedup`, minus the windows entirely inside
+    repeated boilerplate (boilerplate_runs)."""
+    text = text_path.read_text(encoding="ascii")
+    test_start = math.floor(len(text) * TRAIN_FRACTION)
+    runs = boilerplate_runs(text) if dedup else []
+    train = shuffled(window_starts(0, test_start, seq_len, runs), seed)
+    test = shuffled(window_starts(test_start, len(text), seq_len, runs), seed + 1)
+    if sys.byteorder != "little":
+        train.byteswap()
+        test.byteswap()
+    path = windows_path(text_path, seq_len)
+    with path.open("wb") as f:
+        f.write(WINDOWS_HEADER.pack(WINDOWS_MAGIC, seq_len, len(text), test_start, seed,
+                                    WINDOWS_DEDUP if dedup else 0, len(train), len(test)))
+        f.write(train.tobytes())
+        f.write(test.tobytes())
+    return path
+
+
+def shards_path(text_path: Path) -> Path:
+    """The shard manifest; the shards themselves are <stem>_shard_NNN.bin."""
+    return text_path.with_suffix(".shards.json")
+
+
+def write_shards(text_path: Path, shard_bytes: int) -> Path:
+    """Cut the encoded corpus into shard_bytes pieces (<stem>_shard_NNN.bin,
+    vocab indices, no header) and write <stem>.shards.json: the .tokens
+    header fields, [offset, length, file, SRI] per shard and the book start
+    offsets (one book at 0 for single-text corpora). Shards from an earlier
+    run with another shard size are removed."""
+    data = text_path.read_bytes().translate(_TOKEN_TABLE)
+    stem = text_path.stem
+    for stale in text_path.parent.glob(f"{stem}_shard_*.bin"):
+        stale.unlink()
+    shards = []
+    for index, offset in enumerate(range(0, len(data), shard_bytes)):
+        piece = data[offset:offset + shard_bytes]
+        shard_path = text_path.parent / f"{stem}_shard_{index:03d}.bin"
+        shard_path.write_bytes(piece)
+        shards.append([offset, len(piece), shard_path.name, sri(piece)])
+    books = json.loads(books_path(text_path).read_text()) if books_path(text_path).exists() else [0]
+    manifest = {
+        "vocabSize": len(VOCAB), "vocabHash": vocab_hash(), "length": len(data),
+        "testStart": math.floor(len(data) * TRAIN_FRACTION), "shards": shards, "books": books,
+    }
+    path = shards_path(text_path)
+    path.write_text(json.dumps(manifest))
     return path
 
 
 def report(path: Path) -> None:
     data = path.read_bytes()
-    integrity = "sha256-" + base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")
     print(f"{path}")
     print(f"  size:      {len(data) / 1e6:.2f} MB")
-    print(f"  integrity: {integrity}")
+    print(f"  integrity: {sri(data)}")
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_key(source_sha256: str, step, kwargs: dict) -> str:
+    """What an output depends on: its source (bytes, or probe_source's
+    stand-in), this script (SCRIPT_SHA256: the normalizer, dedup and writer
+    logic), the step that produced it and that step's parameters."""
+    fields = {"source": source_sha256, "script": SCRIPT_SHA256, "step": step.__name__, **kwargs}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def output_files(path: Path) -> list[Path]:
+    """The files an output consists of: a .shards.json manifest and the shards
+    it lists, or the single file."""
+    if path.name.endswith(".shards.json"):  # shards_path
+        return [path] + [path.parent / shard[2] for shard in json.loads(path.read_text())["shards"]]
+    return [path]
+
+
+def up_to_date(outputs: dict, path: Path, key: str) -> bool:
+    """True if `outputs` (the cache's outputs.json) records `path` as built
+    under `key`, and every file of it is still on disk unchanged."""
+    entry = outputs.get(str(path.resolve()))
+    if not entry or entry["key"] != key or not path.exists():
+        return False
+    files = output_files(path)
+    return (all(file.exists() for file in files)
+            and {str(file.resolve()): file_sha256(file) for file in files} == entry["files"])
+
+
+def record(outputs: dict, path: Path, key: str) -> None:
+    outputs[str(path.resolve())] = {"key": key,
+                                    "files": {str(file.resolve()): file_sha256(file) for file in output_files(path)}}
+
+
+def build_all(jobs: list, out_dir: Path, cache_dir: Optional[Path], outputs: dict) -> list[tuple[Path, Optional[str]]]:
+    """Run the (name, source, prepare, kwargs, cache_source) jobs concurrently:
+    downloads on a thread pool, the normalizing preparations on a process
+    pool, each starting as soon as its own download is done. With a
+    cache_dir, cache_source jobs go through fetch_cached (local paths as
+    file:// URLs), the others through probe_source, and an output up_to_date
+    in `outputs` is not rebuilt. Returns (output path, sha256 of it or None
+    without a cache) in job order, for derive."""
+    paths: dict[str, tuple[Path, Optional[str]]] = {}
+    with ThreadPoolExecutor(max_workers=max(len(jobs), 1)) as fetchers, \
+            ProcessPoolExecutor(max_workers=max(len(jobs), 1)) as builders:
+        builds = {}
+        if cache_dir is None:
+            for name, source, prepare, kwargs, _cache_source in jobs:
+                builds[builders.submit(prepare, out_dir, source=source, **kwargs)] = (name, None)
+        else:
+            fetches = {
+                (fetchers.submit(fetch_cached, source if "://" in source else Path(source).resolve().as_uri(),
+                                 cache_dir)
+                 if cache_source else fetchers.submit(probe_source, source)): (name, prepare, kwargs)
+                for name, source, prepare, kwargs, cache_source in jobs
+            }
+            for future in as_completed(fetches):
+                name, prepare, kwargs = fetches[future]
+                local, source_sha256 = future.result()
+                key = build_key(source_sha256, prepare, kwargs) if source_sha256 else None
+                path = output_path(out_dir, name)
+                if key and up_to_date(outputs, path, key):
+                    print(f"{path}: source and script unchanged, skipped", flush=True)
+                    paths[name] = (path, file_sha256(path))
+                    continue
+                builds[builders.submit(prepare, out_dir, source=str(local), **kwargs)] = (name, key)
+        for future in as_completed(builds):
+            name, key = builds[future]
+            path = future.result()
+            if key is not None:
+                record(outputs, path, key)
+            paths[name] = (path, file_sha256(path) if cache_dir else None)
+    return [paths[name] for name, *_ in jobs]
+
+
+def derive(outputs: dict, path: Path, text_sha256: Optional[str], write, text_path: Path, *params) -> Path:
+    """write(text_path, *params) — write_tokens, write_shards or write_windows,
+    which writes `path` — unless `outputs` records `path` as written from
+    these exact corpus bytes and params (text_sha256 None: always write)."""
+    key = build_key(text_sha256, write, {"params": list(params)}) if text_sha256 else None
+    if key and up_to_date(outputs, path, key):
+        print(f"{path}: corpus and script unchanged, skipped", flush=True)
+        return path
+    write(text_path, *params)
+    if key is not None:
+        record(outputs, path, key)
+    return path
 
 
 def main() -> int:
@@ -156,25 +710,86 @@ def main() -> int:
         help="output dir/file stem for the Gutenberg subset — e.g. gutenberg_poetry_xl "
              "for the 25MB tier (default: gutenberg_poetry)",
     )
+    parser.add_argument(
+        "--gutenberg-source", default=GUTENBERG_URL,
+        help="URL (http(s)://, file://) or local path of the gzipped ndjson corpus "
+             "(default: the decontextualize.com copy)",
+    )
+    parser.add_argument("--gutenberg-dedup", action="store_true",
+                        help="drop repeated lines and near-duplicate stanzas from the Gutenberg subset "
+                             "(changes which text fills the budget; default: off)")
+    parser.add_argument(
+        "--gutenberg-dedup-memory-mb", type=float, default=64.0,
+        help="memory cap of the dedup fingerprint tables, in MB of 10^6 bytes (default: 64); "
+             "a smaller cap only misses some duplicates",
+    )
+    parser.add_argument("--shakespeare-source", default=SHAKESPEARE_URL,
+                        help="URL (http(s)://, file://) or local path of Tiny Shakespeare")
+    parser.add_argument("--sonnets-source", default=SONNETS_URL,
+                        help="URL (http(s)://, file://) or local path of the Sonnets ebook")
+    parser.add_argument(
+        "--cache-dir", type=Path, default=Path.home() / ".cache" / "nnvp-datasets",
+        help="download cache + record of built outputs (default: ~/.cache/nnvp-datasets)",
+    )
+    parser.add_argument("--no-cache", action="store_true",
+                        help="no download cache, always rebuild")
+    parser.add_argument("--cache-gutenberg-source", action="store_true",
+                        help="download the whole Gutenberg corpus into the cache once and stream it from "
+                             "disk afterwards, instead of streaming only the budget from the source each build")
+    parser.add_argument(
+        "--shard-mb", type=float, default=0.0,
+        help="also cut each corpus into shards of about this size under a .shards.json "
+             "manifest, for streamed loading of the large tiers (default: 0, no shards)",
+    )
+    parser.add_argument(
+        "--window-seq-lens", default="",
+        help="comma-separated seqLens to emit pre-shuffled window tables for, e.g. 40,96 "
+             "(default: none)",
+    )
+    parser.add_argument("--window-seed", type=int, default=0, help="window shuffle seed (default: 0)")
+    parser.add_argument("--dedup-windows", action="store_true",
+                        help="leave out windows lying entirely inside repeated boilerplate lines")
     parser.add_argument("--skip-shakespeare", action="store_true")
     parser.add_argument("--skip-gutenberg", action="store_true")
     parser.add_argument("--skip-sonnets", action="store_true")
     args = parser.parse_args()
 
-    paths = []
+    jobs = []
     if not args.skip_shakespeare:
-        paths.append(prepare_shakespeare(args.out))
+        jobs.append(("tinyshakespeare", args.shakespeare_source, prepare_shakespeare, {}, True))
     if not args.skip_sonnets:
-        paths.append(prepare_sonnets(args.out))
+        jobs.append(("shakespeare_sonnets", args.sonnets_source, prepare_sonnets, {}, True))
     if not args.skip_gutenberg:
-        paths.append(prepare_gutenberg(
-            args.out, int(args.gutenberg_budget_mb * 1e6), args.gutenberg_name,
-        ))
+        jobs.append((args.gutenberg_name, args.gutenberg_source, prepare_gutenberg, {
+            "budget_bytes": int(args.gutenberg_budget_mb * 1e6), "name": args.gutenberg_name,
+            "dedup": args.gutenberg_dedup,
+            "dedup_memory_bytes": int(args.gutenberg_dedup_memory_mb * 1e6),
+        }, args.cache_gutenberg_source))
+    cache_dir = None if args.no_cache else args.cache_dir
+    outputs_path = cache_dir / "outputs.json" if cache_dir else None
+    outputs = json.loads(outputs_path.read_text()) if outputs_path and outputs_path.exists() else {}
+    built = build_all(jobs, args.out, cache_dir, outputs)
     print()
-    for path in paths:
+    for path, text_sha256 in built:
         report(path)
+        report(derive(outputs, tokens_path(path), text_sha256, write_tokens, path))
+        if args.shard_mb > 0:
+            manifest = derive(outputs, shards_path(path), text_sha256, write_shards, path,
+                              max(int(args.shard_mb * 1e6), 1))
+            report(manifest)
+            print(f"  shards:    {len(json.loads(manifest.read_text())['shards'])}")
+        for seq_len in (int(value) for value in args.window_seq_lens.split(",") if value.strip()):
+            windows = derive(outputs, windows_path(path, seq_len), text_sha256, write_windows, path,
+                             seq_len, args.window_seed, args.dedup_windows)
+            report(windows)
+            train, test = WINDOWS_HEADER.unpack(windows.read_bytes()[:WINDOWS_HEADER.size])[-2:]
+            print(f"  windows:   {train} train / {test} test")
+    if outputs_path:
+        outputs_path.parent.mkdir(parents=True, exist_ok=True)
+        outputs_path.write_text(json.dumps(outputs, indent=2))
     print("\nUpload the directories to the datasets CDN, then paste the integrity")
-    print("strings into datasets-sources.ts (textChecksum fields).")
+    print("strings into datasets-sources.ts (textChecksum, plus a tokensPath /")
+    print("shardsPath / windowsPath entry with its checksum per uploaded file).")
     return 0
 
 